@@ -0,0 +1,158 @@
+"""
+查询相关代码的性能测试，无需联网
+
+    python -m benchmarks                        运行并与 benchmarks/baseline.json 对比
+    python -m benchmarks --save-baseline        运行并保存为新的基准
+    python -m benchmarks --capture query.capture 同时使用录制的查询结果 (QUERY_RECORD_FILE)
+
+结果以 json 输出到标准输出，对比结果输出到标准错误，吞吐量低于基准超过允许范围时返回 1
+"""
+import argparse
+import os
+import platform
+import statistics
+import sys
+from contextlib import redirect_stdout
+from time import perf_counter
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__)) + '/'
+PROJECT_DIR = os.path.dirname(BENCHMARK_DIR.rstrip('/')) + '/'
+sys.path.insert(0, PROJECT_DIR)
+
+from py12306.config import Config
+from py12306.helpers.func import *
+
+RESULT_VERSION = 1
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='py12306 性能测试')
+    parser.add_argument('-c', '--config', default=PROJECT_DIR + 'env.py.example', help='配置文件，默认使用示例配置')
+    parser.add_argument('--capture', action='append', default=[], help='录制的查询结果文件，可指定多个')
+    parser.add_argument('-k', '--filter', default='', help='只运行名称包含该字符串的测试')
+    parser.add_argument('--repeat', type=int, default=5, help='每项测试重复次数，取最好的一次')
+    parser.add_argument('--min-time', type=float, default=0.2, help='每次测试的最短时间 (秒)')
+    parser.add_argument('--baseline', default=BENCHMARK_DIR + 'baseline.json', help='基准结果文件')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果保存为基准')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许低于基准的比例')
+    parser.add_argument('-o', '--output', help='结果输出文件，默认输出到标准输出')
+    return parser.parse_args()
+
+
+def measure(run, repeat, min_time):
+    """
+    先逐步增加循环次数直到单次耗时超过 min_time，再重复测试
+    :return: 每次测试的吞吐量 (单位 / 秒)
+    """
+    run()  # 预热
+    loops = 1
+    while True:
+        start_at = perf_counter()
+        units = sum(run() for _ in range(loops))
+        elapsed = perf_counter() - start_at
+        if elapsed >= min_time or loops >= 1 << 20: break
+        loops = loops * 2 if elapsed < min_time / 10 else max(loops + 1, int(loops * min_time / elapsed))
+    rates = [units / elapsed] if elapsed else []
+    for _ in range(repeat - 1):
+        start_at = perf_counter()
+        units = sum(run() for _ in range(loops))
+        elapsed = perf_counter() - start_at
+        if elapsed: rates.append(units / elapsed)
+    return loops, rates
+
+
+def run_cases(args):
+    from benchmarks.cases import cases, load_synthetic_contents, load_capture_contents
+    sources = {'synthetic': load_synthetic_contents()}
+    if args.capture:
+        contents = load_capture_contents(args.capture)
+        if contents:
+            sources['capture'] = contents
+        else:
+            print('录制文件中没有可用的余票查询结果', file=sys.stderr)
+
+    results = {}
+    for name, unit, per_source, setup in cases:
+        items = [('{}.{}'.format(name, source), (contents,)) for source, contents in
+                 sources.items()] if per_source else [(name, ())]
+        for full_name, setup_args in items:
+            if args.filter not in full_name: continue
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):  # 忽略测试中输出的日志
+                loops, rates = measure(setup(*setup_args), args.repeat, args.min_time)
+            results[full_name] = {
+                'unit': unit,
+                'per_second': round(max(rates), 2),
+                'median_per_second': round(statistics.median(rates), 2),
+                'loops': loops,
+                'repeat': len(rates),
+            }
+            print('{:<44} {:>14,.0f} {}/s'.format(full_name, max(rates), unit), file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    与基准对比
+    :return: 性能下降的测试项
+    """
+    regressions = []
+    baseline_results = baseline.get('results', {})
+    print('\n{:<44} {:>14} {:>14} {:>8}'.format('对比基准', '基准', '当前', '比例'), file=sys.stderr)
+    for name, result in results.items():
+        base = baseline_results.get(name)
+        if not base or not base.get('per_second'):
+            print('{:<44} {:>14} {:>14,.0f} {:>8}'.format(name, '-', result['per_second'], '新增'), file=sys.stderr)
+            continue
+        ratio = result['per_second'] / base['per_second']
+        result['baseline_ratio'] = round(ratio, 3)
+        is_regression = ratio < 1 - tolerance
+        if is_regression: regressions.append(name)
+        print('{:<44} {:>14,.0f} {:>14,.0f} {:>7.2f}x{}'.format(name, base['per_second'], result['per_second'], ratio,
+                                                               ' 下降' if is_regression else ''), file=sys.stderr)
+    return regressions
+
+
+def main():
+    args = parse_args()
+    Config.CONFIG_FILE = args.config
+    Config.OUT_PUT_LOG_TO_FILE_ENABLED = 0
+    Const.IS_TEST = True  # 有票时不下单
+
+    output = {
+        'version': RESULT_VERSION,
+        'created_at': time_now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'results': run_cases(args),
+    }
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+        print('\n基准已保存到 {}'.format(args.baseline), file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('version') != RESULT_VERSION:
+            print('\n基准文件版本不一致，跳过对比', file=sys.stderr)
+        else:
+            regressions = compare(output['results'], baseline, args.tolerance)
+        output['regressions'] = regressions
+    else:
+        print('\n未找到基准文件 {}，可使用 --save-baseline 生成'.format(args.baseline), file=sys.stderr)
+
+    content = json.dumps(output, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(content + '\n')
+    else:
+        print(content)
+    if regressions:
+        print('\n性能下降：{}'.format(', '.join(regressions)), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+import io
+import random
+from urllib.parse import urlsplit
+
+from py12306.config import Config
+from py12306.helpers.func import *
+from py12306.helpers.request import Response
+from py12306.helpers.type import SeatType
+
+cases = []
+
+
+def case(name, unit='ops', per_source=False):
+    """
+    注册测试项
+    :param name:
+    :param unit: 吞吐量单位
+    :param per_source: 是否对每组查询结果 (合成 / 录制) 分别测试
+    :return:
+    """
+
+    def decorator(setup):
+        cases.append((name, unit, per_source, setup))
+        return setup
+
+    return decorator
+
+
+class BenchmarkQuery:
+    """
+    任务初始化只需要查询间隔，避免创建 Query 时访问网络
+    """
+    interval = init_interval_by_number(1)
+    api_type = 'leftTicket/query'
+
+
+def make_response(content):
+    response = Response()
+    response.status_code = 200
+    response.url = 'https://kyfw.12306.cn/otn/leftTicket/query'
+    response.encoding = 'utf-8'
+    response._content = content
+    return response
+
+
+def make_results(num, seed=12306):
+    """
+    生成与余票查询接口字段一致的结果，大部分车次无票
+    """
+    rand = random.Random(seed)
+    seat_values = ['', '', '无', '无', '无', '*', '有', '1', '5', '12']
+    seat_indexes = set(SeatType.dicts.values())
+    results = []
+    for i in range(num):
+        number = rand.choice('GDCZTK') + str(rand.randint(1, 9999))
+        row = [''] * 38
+        row[0] = ''.join(rand.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789%') for _ in
+                         range(rand.randint(180, 260)))
+        row[1] = '预订'
+        row[2] = '{:012d}'.format(rand.randint(0, 10 ** 12 - 1))
+        row[3] = number
+        row[4], row[5], row[6], row[7] = 'BJP', 'SHH', 'VNP', 'AOH'
+        minute = rand.randint(0, 24 * 60 - 1)
+        row[8] = '{:02d}:{:02d}'.format(minute // 60, minute % 60)
+        row[9] = '{:02d}:{:02d}'.format((minute + 330) // 60 % 24, (minute + 330) % 60)
+        row[10] = '05:30'
+        row[11] = 'Y' if rand.random() < 0.3 else 'N'
+        row[12] = ''.join(rand.choice('0123456789ABCDEF') for _ in range(40))
+        row[13] = '20190101'
+        for index in seat_indexes:
+            row[index] = rand.choice(seat_values) if row[11] == 'Y' else rand.choice(('', '无', '*'))
+        results.append('|'.join(row))
+    return results
+
+
+def make_content(results):
+    return json.dumps({
+        'httpstatus': 200,
+        'data': {'result': results, 'flag': '1', 'map': {'VNP': '北京南', 'AOH': '上海虹桥'}},
+        'messages': '',
+        'status': True,
+    }, ensure_ascii=False).encode('utf-8')
+
+
+def load_synthetic_contents(response_num=20, row_num=80):
+    return [make_content(make_results(row_num, seed=i)) for i in range(response_num)]
+
+
+def load_capture_contents(files):
+    """
+    读取录制的余票查询结果
+    """
+    from py12306.helpers.capture import CaptureReader
+    contents = []
+    for file in files:
+        for frame in CaptureReader(file):
+            if frame.status_code != 200 or not urlsplit(frame.url).path.startswith('/otn/leftTicket/query'):
+                continue
+            if make_response(frame.content).json().get('data.result'):
+                contents.append(frame.content)
+    return contents
+
+
+def create_job():
+    from py12306.query.job import Job
+    return Job({
+        'job_name': 'benchmark',
+        'account_key': 0,
+        'left_dates': ['2019-01-01'],
+        'stations': {'left': '北京', 'arrive': '上海'},
+        'members': ['benchmark'],
+        'seats': ['二等座', '一等座', '硬卧'],
+        'train_numbers': [],
+    }, BenchmarkQuery())
+
+
+def count_rows(contents):
+    return sum(len(make_response(content).json().get('data.result')) for content in contents)
+
+
+@case('job.handle_response', unit='rows', per_source=True)
+def bench_handle_response(contents):
+    """
+    解析并筛选余票，每次使用新的请求结果，与查询时一致
+    """
+    from py12306.log.query_log import QueryLog
+    from py12306.query.fetcher import RouteFetch
+    job = create_job()
+    responses = [make_response(content) for content in contents]
+    row_num = count_rows(contents)
+
+    def run():
+        for i, response in enumerate(responses):
+            fetch = RouteFetch(('2019-01-01', 'VNP', 'AOH', i))
+            fetch.done(response)
+            job.handle_response(fetch)
+        QueryLog().empty_logs()
+        return row_num
+
+    return run
+
+
+@case('job.handle_response.unchanged', unit='rows', per_source=True)
+def bench_handle_response_unchanged(contents):
+    """
+    开启结果对比后，结果未变化时的处理速度
+    每组结果使用单独的线路，先处理一次记录摘要，之后重复处理相同的结果
+    """
+    from py12306.log.query_log import QueryLog
+    from py12306.query.fetcher import RouteFetch
+    job = create_job()
+    responses = [make_response(content) for content in contents]
+    row_num = count_rows(contents)
+
+    def handle_all():
+        config = Config()
+        config.QUERY_RESPONSE_DIFF_ENABLED = 1
+        try:
+            for i, response in enumerate(responses):
+                fetch = RouteFetch(('2019-01-01', 'VNP', 'AOH-{}'.format(i)))
+                fetch.done(response)
+                job.handle_response(fetch)
+        finally:
+            config.QUERY_RESPONSE_DIFF_ENABLED = 0
+        QueryLog().empty_logs()
+
+    handle_all()
+
+    def run():
+        handle_all()
+        return row_num
+
+    return run
+
+
+@case('request.json', unit='responses', per_source=True)
+def bench_request_json(contents):
+    responses = [make_response(content) for content in contents]
+
+    def run():
+        for response in responses:
+            response.json().get('data.result')
+        return len(responses)
+
+    return run
+
+
+@case('dict.get', unit='lookups', per_source=True)
+def bench_dict_get(contents):
+    results = [make_response(content).json() for content in contents]
+    keys = ['data.result', 'data.flag', 'data.map', 'data.map.VNP', 'status', 'httpstatus', 'messages',
+            'data.not_exists']
+
+    def run():
+        for result in results:
+            for key in keys:
+                result.get(key)
+        return len(results) * len(keys)
+
+    return run
+
+
+@case('station.lookup', unit='lookups')
+def bench_station_lookup():
+    from py12306.helpers.station import Station
+    stations = Station().stations
+    names = [station['name'] for station in stations[::max(1, len(stations) // 500)]]
+
+    def run():
+        for name in names:
+            Station.get_station_by_name(name)
+            key = Station.get_station_key_by_name(name)
+            Station.get_station_name_by_key(key)
+        return len(names) * 3
+
+    return run
+
+
+@case('station.search', unit='lookups')
+def bench_station_search():
+    from py12306.helpers.station import Station
+    stations = Station().stations
+    keywords = [station['pinyin'][:2] for station in stations[::max(1, len(stations) // 500)]]
+    Station.search('bj')  # 建立前缀索引
+
+    def run():
+        for keyword in keywords:
+            Station.search(keyword)
+        return len(keywords)
+
+    return run
+
+
+@case('cdn.get_unchecked_item', unit='items')
+def bench_cdn_unchecked_item():
+    from py12306.helpers.cdn import Cdn
+    cdn = Cdn()
+    items = ['10.{}.{}.{}'.format(i // 65536, i // 256 % 256, i % 256) for i in range(10000)]
+
+    def run():
+        cdn.unchecked_items.extend(items)
+        num = 0
+        while cdn.get_unchecked_item():
+            num += 1
+        return num
+
+    return run
+
+
+@case('query_log.flush', unit='lines')
+def bench_query_log_flush():
+    from py12306.log.query_log import QueryLog
+    lines = ['G{}'.format(i) for i in range(20)]
+    sink = io.StringIO()
+
+    def run():
+        for line in lines:
+            QueryLog.add_log(line)
+        QueryLog.flush(sep='\t\t', file=sink, publish=False)
+        sink.seek(0)
+        sink.truncate()
+        return len(lines)
+
+    return run
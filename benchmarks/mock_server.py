@@ -0,0 +1,467 @@
+"""
+本地模拟 12306 服务，用于压力测试以及完整的查询、下单流程测试
+
+    python -m benchmarks.mock_server --port 12306 --scenario benchmarks/mock_scenario.json --cookie your_user_name
+
+配置中设置 API_BASE_URL = 'http://127.0.0.1:12306' 后即可连接，--cookie 会为用户生成空的 cookie 文件以跳过登录
+访问 /mock/stats 查看请求数以及从查询到票到下单成功的耗时，POST /mock/scenario 可在运行中修改场景，POST /mock/reset 重置状态
+
+场景 (json)：
+    train_num        车次数量
+    ticket_num       每个车次的余票，所有线路、日期共用
+    release          [[开始后秒数, 可预订车次比例], ...]，按时间依次放票
+    latency          {路径前缀: [最短, 最长]} 响应耗时 (秒)，* 为默认
+    error_rate       {路径前缀: 概率} 返回 error_status 的概率
+    max_qps          {路径前缀: 每秒请求数} 超出时返回 throttle_status
+    queue_second     确认排队后多久出票
+    passengers       乘客姓名
+"""
+import argparse
+import math
+import os
+import pickle
+import sys
+from http import cookies as http_cookies
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/'
+sys.path.insert(0, PROJECT_DIR)
+
+from py12306.config import Config
+from py12306.helpers.func import *
+from py12306.helpers.type import SeatType
+from py12306.query.scheduler import TokenBucket
+
+DEFAULT_SCENARIO = {
+    'train_num': 30,
+    'ticket_num': 5,
+    'release': [[0, 0.1]],
+    'latency': {'*': [0.01, 0.05]},
+    'error_rate': {},
+    'error_status': 502,
+    'max_qps': {},
+    'throttle_status': 429,
+    'queue_second': 3,
+    'query_path': 'leftTicket/query',
+    'passengers': ['张三', '李四'],
+    'seed': 12306,
+}
+
+
+class MockTrain:
+    index = 0
+    train_no = ''
+    number = ''
+    left_time = ''
+    arrive_time = ''
+    rank = 0  # 放票顺序
+    ticket_num = 0
+    first_served_at = 0  # 第一次返回可预订的时间
+
+    def __init__(self, index, rand, ticket_num):
+        self.index = index
+        self.train_no = '{:012d}'.format(rand.randint(0, 10 ** 12 - 1))
+        self.number = rand.choice('GDCZTK') + str(index + 1)
+        minute = rand.randint(6 * 60, 22 * 60)
+        self.left_time = '{:02d}:{:02d}'.format(minute // 60, minute % 60)
+        self.arrive_time = '{:02d}:{:02d}'.format((minute + 330) // 60 % 24, (minute + 330) % 60)
+        self.ticket_num = ticket_num
+
+    def get_secret_str(self):
+        return 'MOCK{}'.format(self.index)
+
+
+class MockOrder:
+    train = None
+    token = ''
+    order_id = ''
+    submitted_at = 0
+    confirmed_at = 0
+    ordered_at = 0
+
+    def __init__(self, train, token):
+        self.train = train
+        self.token = token
+        self.submitted_at = time.time()
+
+
+class MockState:
+    """
+    模拟服务的运行状态，所有方法在锁内调用
+    """
+
+    def __init__(self, scenario):
+        self.scenario = dict(DEFAULT_SCENARIO, **scenario)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        scenario = self.scenario
+        rand = random.Random(scenario['seed'])
+        self.started_at = time.time()
+        self.trains = [MockTrain(i, rand, scenario['ticket_num']) for i in range(scenario['train_num'])]
+        ranks = list(range(len(self.trains)))
+        rand.shuffle(ranks)
+        for train, rank in zip(self.trains, ranks):
+            train.rank = rank
+        self.orders = {}  # session => MockOrder
+        self.order_num = 0
+        self.buckets = {prefix: TokenBucket(qps) for prefix, qps in scenario['max_qps'].items() if qps}
+        self.request_nums = {}
+        self.error_num = 0
+        self.throttled_num = 0
+        self.ticket_to_order = []
+        self.submit_to_order = []
+
+    def update_scenario(self, scenario):
+        self.scenario.update(scenario)
+        self.reset()
+
+    def get_release_rate(self):
+        second = time.time() - self.started_at
+        rate = 0
+        for at, value in sorted(self.scenario['release']):
+            if second >= at: rate = value
+        return rate
+
+    def is_bookable(self, train):
+        return train.ticket_num > 0 and train.rank < self.get_release_rate() * len(self.trains)
+
+    def get_train(self, secret_str):
+        if not secret_str.startswith('MOCK') or not secret_str[4:].isdigit(): return None
+        index = int(secret_str[4:])
+        return self.trains[index] if index < len(self.trains) else None
+
+    @staticmethod
+    def match(rules, path, default=None):
+        """
+        按最长的路径前缀匹配场景规则
+        """
+        prefix = max([key for key in rules if key != '*' and path.startswith(key)], key=len, default='*')
+        return rules.get(prefix, default)
+
+    def get_latency(self, path):
+        latency = self.match(self.scenario['latency'], path)
+        return random.uniform(*latency) if latency else 0
+
+    def is_error(self, path):
+        rate = self.match(self.scenario['error_rate'], path, 0)
+        if rate and random.random() < rate:
+            self.error_num += 1
+            return True
+        return False
+
+    def is_throttled(self, path):
+        prefix = max([key for key in self.buckets if key != '*' and path.startswith(key)], key=len, default='*')
+        bucket = self.buckets.get(prefix)
+        if not bucket: return False
+        if bucket.wait_time(time.monotonic()):
+            self.throttled_num += 1
+            return True
+        bucket.consume()
+        return False
+
+    def get_stats(self):
+        return {
+            'uptime': round(time.time() - self.started_at, 3),
+            'release_rate': self.get_release_rate(),
+            'requests': dict(self.request_nums),
+            'errors': self.error_num,
+            'throttled': self.throttled_num,
+            'orders': len(self.ticket_to_order),
+            'tickets_left': sum(train.ticket_num for train in self.trains),
+            'ticket_to_order': self.get_percentiles(self.ticket_to_order),
+            'submit_to_order': self.get_percentiles(self.submit_to_order),
+        }
+
+    @staticmethod
+    def get_percentiles(values):
+        if not values: return {'count': 0}
+        values = sorted(values)
+        result = {'count': len(values)}
+        for name, percentile in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+            result[name] = round(values[min(len(values) - 1, int(math.ceil(len(values) * percentile)) - 1)], 3)
+        result['max'] = round(values[-1], 3)
+        return result
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """
+    请求处理，(请求方式, 路径) => 处理方法
+    """
+    protocol_version = 'HTTP/1.1'
+    routes = {
+        ('GET', '/otn/leftTicket/init'): 'left_ticket_init',
+        ('POST', '/otn/leftTicket/submitOrderRequest'): 'submit_order_request',
+        ('POST', '/otn/confirmPassenger/initDc'): 'init_dc',
+        ('POST', '/otn/confirmPassenger/checkOrderInfo'): 'check_order_info',
+        ('POST', '/otn/confirmPassenger/getQueueCount'): 'get_queue_count',
+        ('POST', '/otn/confirmPassenger/confirmSingleForQueue'): 'confirm_single_for_queue',
+        ('GET', '/otn/confirmPassenger/queryOrderWaitTime'): 'query_order_wait_time',
+        ('POST', '/otn/confirmPassenger/getPassengerDTOs'): 'get_passengers',
+        ('GET', '/otn/login/conf'): 'login_conf',
+        ('POST', '/otn/login/conf'): 'login_conf',
+        ('GET', '/otn/modifyUser/initQueryUserInfoApi'): 'user_info',
+        ('POST', '/otn/modifyUser/initQueryUserInfoApi'): 'user_info',
+        ('GET', '/otn/HttpZF/logdevice'): 'log_device',
+        ('GET', '/mock/stats'): 'mock_stats',
+        ('POST', '/mock/scenario'): 'mock_scenario',
+        ('POST', '/mock/reset'): 'mock_reset',
+    }
+    cookie_name = 'mock_session'
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        self.body = self.rfile.read(length) if length else b''
+        self.form = {key: values[-1] for key, values in parse_qs(self.body.decode('utf-8', 'ignore')).items()}
+        self.set_cookie = None
+        state = self.server.state
+        path = url.path
+        name = self.routes.get((method, path))
+        if not name and path.startswith('/otn/leftTicket/query'): name = 'left_ticket_query'
+        if not name: return self.send(404, 'Not Found')
+        if path.startswith('/mock/'): return self.send(*getattr(self, name)(state))
+
+        with state.lock:
+            state.request_nums[path] = state.request_nums.get(path, 0) + 1
+            latency = state.get_latency(path)
+            is_throttled = state.is_throttled(path)
+            is_error = not is_throttled and state.is_error(path)
+        if latency: sleep(latency)
+        if is_throttled: return self.send(state.scenario['throttle_status'], '网络可能存在问题，请您重试一下！')
+        if is_error: return self.send(state.scenario['error_status'], '系统繁忙')
+        with state.lock:
+            status, content = getattr(self, name)(state)
+        self.send(status, content)
+
+    def send(self, status, content, content_type='text/html; charset=utf-8'):
+        if not isinstance(content, (str, bytes)):
+            content = json.dumps(content, ensure_ascii=False)
+            content_type = 'application/json;charset=UTF-8'
+        content = content.encode('utf-8') if isinstance(content, str) else content
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        if self.set_cookie: self.send_header('Set-Cookie', self.set_cookie)
+        self.end_headers()
+        self.wfile.write(content)
+
+    @staticmethod
+    def make_json(data, status=True, messages=None):
+        return 200, {'validateMessagesShowId': '_validatorMessage', 'status': status, 'httpstatus': 200,
+                     'data': data, 'messages': messages or [], 'validateMessages': {}}
+
+    def get_order(self, state):
+        cookie = http_cookies.SimpleCookie(self.headers.get('Cookie', ''))
+        session = cookie.get(self.cookie_name)
+        return state.orders.get(session.value) if session else None
+
+    def log_message(self, format, *args):
+        if self.server.verbose: super().log_message(format, *args)
+
+    # 查询
+    def left_ticket_init(self, state):
+        return 200, "<script>var CLeftTicketUrl = '{}';</script>".format(state.scenario['query_path'])
+
+    def left_ticket_query(self, state):
+        left_station = self.query.get('leftTicketDTO.from_station', '')
+        arrive_station = self.query.get('leftTicketDTO.to_station', '')
+        left_date = self.query.get('leftTicketDTO.train_date', '').replace('-', '')
+        now = time.time()
+        results = []
+        for train in state.trains:
+            is_bookable = state.is_bookable(train)
+            if is_bookable and not train.first_served_at: train.first_served_at = now
+            ticket = (str(train.ticket_num) if train.ticket_num < 20 else '有') if is_bookable else '无'
+            row = [''] * 38
+            row[0] = train.get_secret_str() if is_bookable else ''
+            row[1] = '预订'
+            row[2] = train.train_no
+            row[3] = train.number
+            row[4], row[5], row[6], row[7] = left_station, arrive_station, left_station, arrive_station
+            row[8], row[9], row[10] = train.left_time, train.arrive_time, '05:30'
+            row[11] = 'Y' if is_bookable else 'N'
+            row[12] = 'MOCK' + train.train_no
+            row[13] = left_date
+            row[15] = 'P2'
+            for index in set(SeatType.dicts.values()):
+                row[index] = ticket
+            results.append('|'.join(row))
+        return self.make_json({'result': results, 'flag': '1',
+                               'map': {left_station: left_station, arrive_station: arrive_station}})
+
+    # 下单
+    def submit_order_request(self, state):
+        train = state.get_train(self.form.get('secretStr', ''))
+        if not train or not state.is_bookable(train):
+            return self.make_json(None, False, ['车票信息已过期，请重新查询最新车票信息'])
+        state.order_num += 1
+        session = md5('{}{}'.format(state.order_num, time.time()))
+        state.orders[session] = MockOrder(train, md5(session))
+        self.set_cookie = '{}={}; Path=/'.format(self.cookie_name, session)
+        return self.make_json('0')
+
+    def init_dc(self, state):
+        order = self.get_order(state)
+        if not order: return 200, '<div>系统忙，请稍后重试</div>'
+        train = order.train
+        form = {
+            'queryLeftTicketRequestDTO': {'train_no': train.train_no, 'station_train_code': train.number,
+                                          'from_station': 'MOCK', 'to_station': 'MOCK'},
+            'leftTicketStr': 'MOCK' + train.train_no,
+            'purpose_codes': '00',
+            'train_location': 'P2',
+            'key_check_isChange': order.token.upper(),
+        }
+        html = '\n'.join([
+            '<script>',
+            "var globalRepeatSubmitToken = '{}';".format(order.token),
+            'var ticketInfoForPassengerForm={};'.format(json.dumps(form)),
+            'var orderRequestDTO={};'.format(json.dumps({'train_no': train.train_no})),
+            "var if_check_slide_passcode='0';",
+            '</script>',
+        ])
+        return 200, html
+
+    def check_order_info(self, state):
+        if not self.get_order(state):
+            return self.make_json({'submitStatus': False, 'errMsg': '订单已过期'})
+        return self.make_json({'ifShowPassCode': 'N', 'canChooseBeds': 'N', 'canChooseSeats': 'N',
+                               'submitStatus': True})
+
+    def get_queue_count(self, state):
+        order = self.get_order(state)
+        if not order: return self.make_json(None, False, ['订单已过期'])
+        return self.make_json({'count': '0', 'ticket': '{},0'.format(order.train.ticket_num), 'op_2': 'false',
+                               'countT': '0', 'op_1': 'false'})
+
+    def confirm_single_for_queue(self, state):
+        order = self.get_order(state)
+        if not order: return self.make_json({'submitStatus': False, 'errMsg': '订单已过期'})
+        if order.confirmed_at: return self.make_json({'submitStatus': True})
+        if order.train.ticket_num <= 0: return self.make_json({'submitStatus': False, 'errMsg': '余票不足'})
+        order.train.ticket_num -= 1
+        order.confirmed_at = time.time()
+        return self.make_json({'submitStatus': True})
+
+    def query_order_wait_time(self, state):
+        order = self.get_order(state)
+        if not order or not order.confirmed_at:
+            return self.make_json({'queryOrderWaitTimeStatus': True, 'count': 0, 'waitTime': -2, 'waitCount': 0,
+                                   'msg': '没有排队中的订单'})
+        wait_second = order.confirmed_at + state.scenario['queue_second'] - time.time()
+        if wait_second > 0:
+            return self.make_json({'queryOrderWaitTimeStatus': True, 'count': 0,
+                                   'waitTime': int(math.ceil(wait_second)), 'waitCount': 1, 'tourFlag': 'dc',
+                                   'orderId': None})
+        if not order.order_id:
+            order.ordered_at = time.time()
+            order.order_id = 'E{:09d}'.format(state.order_num)
+            state.submit_to_order.append(order.ordered_at - order.submitted_at)
+            state.ticket_to_order.append(order.ordered_at - (order.train.first_served_at or order.submitted_at))
+        return self.make_json({'queryOrderWaitTimeStatus': True, 'count': 0, 'waitTime': -1, 'waitCount': 0,
+                               'tourFlag': 'dc', 'orderId': order.order_id})
+
+    def get_passengers(self, state):
+        passengers = [{
+            'code': str(i + 1),
+            'passenger_name': name,
+            'passenger_id_type_code': '1',
+            'passenger_id_no': '11010119900101{:04d}'.format(i),
+            'mobile_no': '',
+            'passenger_type': '1',
+            'allEncStr': 'MOCK{}'.format(i),
+        } for i, name in enumerate(state.scenario['passengers'])]
+        return self.make_json({'isExist': True, 'normal_passengers': passengers})
+
+    # 用户
+    def login_conf(self, state):
+        return self.make_json({'is_login': 'Y'})
+
+    def user_info(self, state):
+        return self.make_json({'userDTO': {'loginUserDTO': {'name': 'mock', 'user_name': 'mock'}}})
+
+    def log_device(self, state):
+        expiration = time_int_ms() + 10 * 365 * 24 * 3600 * 1000
+        return 200, "callbackFunction('{}')".format(json.dumps({'exp': str(expiration), 'dfp': 'MOCK'}))
+
+    # 模拟服务管理
+    def mock_stats(self, state):
+        with state.lock:
+            return 200, state.get_stats()
+
+    def mock_scenario(self, state):
+        try:
+            scenario = json.loads(self.body.decode('utf-8') or '{}')
+        except ValueError:
+            return 400, 'Invalid scenario'
+        with state.lock:
+            state.update_scenario(scenario)
+            return 200, dict(state.scenario)
+
+    def mock_reset(self, state):
+        with state.lock:
+            state.reset()
+            return 200, state.get_stats()
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    verbose = False
+
+    def __init__(self, address, scenario=None, verbose=False):
+        super().__init__(address, MockHandler)
+        self.state = MockState(scenario or {})
+        self.verbose = verbose
+
+
+def create_cookie(user_name):
+    """
+    生成空的 cookie 文件，用户启动时直接检测登录状态
+    """
+    from requests.cookies import RequestsCookieJar
+    file = Config.USER_DATA_DIR + user_name + '.cookie'
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    with open(file, 'wb') as f:
+        pickle.dump(RequestsCookieJar(), f)
+    return file
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.mock_server', description='本地模拟 12306 服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=12306)
+    parser.add_argument('--scenario', help='场景文件 (json)')
+    parser.add_argument('--cookie', action='append', default=[], help='为用户生成 cookie 文件，可指定多个')
+    parser.add_argument('-v', '--verbose', action='store_true', help='输出请求日志')
+    args = parser.parse_args()
+
+    scenario = {}
+    if args.scenario:
+        with open(args.scenario, encoding='utf-8') as f:
+            scenario = json.load(f)
+    for user_name in args.cookie:
+        print('已生成 cookie 文件 {}'.format(create_cookie(user_name)))
+    server = MockServer((args.host, args.port), scenario, args.verbose)
+    print('模拟服务已启动 http://{}:{}'.format(args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        with server.state.lock:
+            print(json.dumps(server.state.get_stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,37 @@
 # -*- coding: utf-8 -*-
 import sys
 
+from py12306.helpers.profiler import StartupProfiler
+
+if '--profile-startup' in sys.argv: StartupProfiler.install()  # 需要在导入其它模块前开启
+
 from py12306.app import *
 from py12306.helpers.cdn import Cdn
 from py12306.log.common_log import CommonLog
 from py12306.query.query import Query
 from py12306.user.user import User
-from py12306.web.web import Web
 
 
 def main():
     load_argvs()
     CommonLog.print_welcome()
-    App.run()
+    with StartupProfiler.step('App.run'):
+        App.run()
     CommonLog.print_configs()
-    App.did_start()
+    with StartupProfiler.step('App.did_start'):
+        App.did_start()
 
-    App.run_check()
-    Query.check_before_run()
+    with StartupProfiler.step('App.run_check'):
+        App.run_check()
+    with StartupProfiler.step('Query.check_before_run'):
+        Query.check_before_run()
 
     ####### 运行任务
-    # Web.run()
+    # Web.run()  # 需要时在此导入 py12306.web.web，避免未开启 Web 时加载 flask
     # Cdn.run()
-    User.run()
+    with StartupProfiler.step('User.run'):
+        User.run()
+    StartupProfiler.report()  # 查询会一直运行，在此之前输出
     Query.run()
     if not Const.IS_TEST:
         while True:
@@ -75,6 +75,8 @@ class App:
         :param kwargs:
         :return:
         """
+        from py12306.log.query_log import QueryLog
+        QueryLog.save_data()  # 保存未提交的查询次数
         if Config.is_cluster_enabled():
             from py12306.cluster.cluster import Cluster
             Cluster().left_cluster()
@@ -152,19 +154,32 @@ class App:
 
 # Expand
 class Dict(dict):
+    """
+    接口返回结果
+    按 data.result 形式的路径取值，路径只解析一次，子字典在第一次访问时转换并保存，之后不再重复创建
+    """
+    paths = {}  # 路径 => 键列表
+
     def get(self, key, default=None, sep='.'):
-        keys = key.split(sep)
-        for i, key in enumerate(keys):
-            try:
-                value = self[key]
-                if len(keys[i + 1:]) and isinstance(value, Dict):
-                    return value.get(sep.join(keys[i + 1:]), default=default, sep=sep)
+        path = self.paths.get(key if sep == '.' else (key, sep))
+        if path is None:
+            path = self.paths[key if sep == '.' else (key, sep)] = tuple(key.split(sep))
+        value = self
+        for key in path:
+            if not isinstance(value, Dict):  # 中间值不是字典时直接返回
                 return value
+            try:
+                value = value[key]
             except:
                 return self.dict_to_dict(default)
+        return value
 
     def __getitem__(self, k):
-        return self.dict_to_dict(super().__getitem__(k))
+        value = super().__getitem__(k)
+        if type(value) is dict:
+            value = Dict(value)
+            super().__setitem__(k, value)
+        return value
 
     @staticmethod
     def dict_to_dict(value):
@@ -4,10 +4,6 @@ import pickle
 import sys
 import time
 
-import redis
-from redis.client import PubSub
-
-from py12306.cluster.redis import Redis
 from py12306.config import Config
 from py12306.helpers.func import *
 from py12306.log.cluster_log import ClusterLog
@@ -27,8 +23,11 @@ class Cluster():
     KEY_USER_LAST_HEARTBEAT = KEY_PREFIX + 'user_last_heartbeat'
     KEY_NODES_ALIVE_PREFIX = KEY_PREFIX + 'nodes_alive_'
 
-    KEY_CDN_AVAILABLE_ITEMS = KEY_PREFIX + 'cdn_available_items'
-    KEY_CDN_LAST_CHECK_AT = KEY_PREFIX + 'cdn_last_check_at'
+    KEY_CDN_HEALTH = KEY_PREFIX + 'cdn_health'  # cdn => 检测结果
+    KEY_CDN_HEALTH_UPDATES = KEY_PREFIX + 'cdn_health_updates'  # 检测结果更新记录 (Stream)，按写入顺序增量同步
+    KEY_CDN_SUSPECT_ITEMS = KEY_PREFIX + 'cdn_suspect_items'  # 查询时被熔断，等待重新检测的 cdn
+    KEY_CDN_STATS = KEY_PREFIX + 'cdn_stats'  # 节点|cdn => 实际查询的耗时与错误率
+    KEY_CDN_STATS_UPDATES = KEY_PREFIX + 'cdn_stats_updates'  # 查询耗时更新记录 (Stream)
 
     # 锁
     KEY_LOCK_INIT_USER = KEY_PREFIX + 'lock_init_user'  # 暂未使用
@@ -41,8 +40,8 @@ class Cluster():
     KEY_MASTER = 1
     KEY_SLAVE = 0
 
-    session: Redis = None
-    pubsub: PubSub = None
+    session = None  # py12306.cluster.redis.Redis
+    pubsub = None  # redis.client.PubSub
     refresh_channel_time = 0.5
     retry_time = 2
     keep_alive_time = 3  # 报告存活间隔
@@ -55,6 +54,7 @@ class Cluster():
 
     def __init__(self, *args):
         if Config.is_cluster_enabled():
+            from py12306.cluster.redis import Redis  # 未开启集群时不导入 redis
             self.session = Redis()
         return self
 
@@ -16,12 +16,37 @@ class Config:
     QUERY_JOBS = []
     # 查询间隔
     QUERY_INTERVAL = 1
+    # 查询调度 (每秒最大查询次数，0 为不限制)
+    QUERY_MAX_QPS = 0
+    QUERY_ENDPOINT_MAX_QPS = {}
+    QUERY_CDN_MAX_QPS = 0
+    # 起售时间调度
+    QUERY_SALE_BURST_ENABLED = 0
+    QUERY_SALE_PRESALE_DAYS = 15
+    QUERY_SALE_BURST_WINDOW = {'before': 10, 'after': 300}
+    QUERY_SALE_BURST_INTERVAL = {'min': 0.1, 'max': 0.3}
+    QUERY_SALE_BURST_PRIORITY = 10
+    QUERY_SALE_IDLE_INTERVAL = 10
     # 查询重试次数
     REQUEST_MAX_RETRY = 5
     # 用户心跳检测间隔
     USER_HEARTBEAT_INTERVAL = 120
     # 多线程查询
     QUERY_JOB_THREAD_ENABLED = 0
+    # 异步查询 (请求仍为阻塞请求，在线程池中执行)
+    QUERY_JOB_ASYNC_ENABLED = 0
+    QUERY_ASYNC_WORKER_NUM = 20
+    # 相同线路和日期的查询结果复用时间 (秒)
+    QUERY_FETCH_FRESH_SECOND = 0
+    # 跳过余票未变化的车次
+    QUERY_RESPONSE_DIFF_ENABLED = 0
+    # 查询次数统计的保存间隔 (秒)
+    QUERY_DATA_SAVE_INTERVAL = 5
+    # 查询记录与回放
+    QUERY_RECORD_FILE = ''
+    QUERY_RECORD_ORDER_ENABLED = 0
+    QUERY_REPLAY_FILE = ''
+    QUERY_REPLAY_SPEED = 1
     # 打码平台账号
     AUTO_CODE_PLATFORM = ''
     #用户打码平台地址
@@ -30,6 +55,11 @@ class Config:
     # 输出日志到文件
     OUT_PUT_LOG_TO_FILE_ENABLED = 0
     OUT_PUT_LOG_TO_FILE_PATH = 'runtime/12306.log'
+    OUT_PUT_LOG_TO_FILE_QUEUE_SIZE = 10000
+    OUT_PUT_LOG_TO_FILE_FLUSH_INTERVAL = 1
+    OUT_PUT_LOG_TO_FILE_FLUSH_SIZE = 64 * 1024
+    OUT_PUT_LOG_TO_FILE_MAX_SIZE = 0
+    OUT_PUT_LOG_TO_FILE_BACKUP_COUNT = 3
 
     SEAT_TYPES = {'特等座': 25, '商务座': 32, '一等座': 31, '二等座': 30, '软卧': 23, '硬卧': 28, '硬座': 29, '无座': 26, }
 
@@ -44,6 +74,8 @@ class Config:
     USER_PASSENGERS_FILE = RUNTIME_DIR + 'user/%s_passengers.json'
 
     STATION_FILE = PROJECT_DIR + 'data/stations.txt'
+    STATION_SALE_TIME_FILE = PROJECT_DIR + 'data/station_sales_time.txt'
+    STATION_CACHE_FILE = RUNTIME_DIR + 'station.cache'
     CONFIG_FILE = PROJECT_DIR + 'env.py'
 
     # 语音验证码
@@ -95,8 +127,23 @@ class Config:
     # CDN
     CDN_ENABLED = 0
     CDN_CHECK_TIME_OUT = 2
+    CDN_CHECK_CONCURRENCY = 200
+    CDN_REVALIDATE_TTL = 60 * 60 * 12
+    CDN_REVALIDATE_RATE = 1
+    CDN_CLUSTER_SHARD_ENABLED = 0
+    # CDN 熔断
+    CDN_BREAKER_FAILURE_NUM = 3
+    CDN_BREAKER_ERROR_RATE = 0.5
+    CDN_BREAKER_WINDOW_NUM = 20
+    CDN_BREAKER_OPEN_SECOND = 30
     CDN_ITEM_FILE = PROJECT_DIR + 'data/cdn.txt'
     CDN_ENABLED_AVAILABLE_ITEM_FILE = QUERY_DATA_DIR + 'available.json'
+    CDN_JOURNAL_FILE = QUERY_DATA_DIR + 'available.journal'
+    # CDN 对冲请求
+    CDN_HEDGE_ENABLED = 0
+    CDN_HEDGE_DELAY = 0.5
+    CDN_HEDGE_MIN_DELAY = 0.05
+    CDN_HEDGE_WORKER_NUM = 32
 
     CACHE_RAIL_ID_ENABLED = 0
     RAIL_EXPIRATION = ''
@@ -105,6 +152,13 @@ class Config:
     # Default time out
     TIME_OUT_OF_REQUEST = 5
 
+    # 接口地址，留空使用 12306 地址
+    API_BASE_URL = ''
+
+    # 连接池
+    REQUEST_POOL_CONNECTIONS = 100
+    REQUEST_POOL_MAXSIZE = 20
+
     envs = []
     retry_time = 5
     last_modify_time = 0
@@ -201,6 +255,8 @@ class Config:
                         Query().update_query_jobs(auto=True)  # 任务修改
                     elif key == 'QUERY_INTERVAL':
                         Query().update_query_interval(auto=True)
+                    elif key in ('QUERY_MAX_QPS', 'QUERY_ENDPOINT_MAX_QPS', 'QUERY_CDN_MAX_QPS'):
+                        Query().update_query_scheduler(auto=True)
                     elif key == 'CDN_ENABLED':
                         Cdn().update_cdn_status(auto=True)
 
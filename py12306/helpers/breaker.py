@@ -0,0 +1,87 @@
+import threading
+from collections import deque
+
+from py12306.helpers.func import *
+
+
+class CircuitBreaker:
+    """
+    熔断器
+    连续失败或错误率超过阈值时打开，一段时间后半开放行一次试探请求，成功则恢复
+    """
+    STATE_CLOSED = 'closed'
+    STATE_OPEN = 'open'
+    STATE_HALF_OPEN = 'half_open'
+
+    state = STATE_CLOSED
+    failure_num = 3  # 连续失败次数
+    error_rate = 0.5  # 错误率
+    window_num = 20  # 错误率统计的请求数
+    open_second = 30  # 打开后多久进入半开
+
+    consecutive_failures = 0
+    opened_at = 0
+    trial_at = 0  # 半开时试探请求的开始时间
+
+    def __init__(self, failure_num=3, error_rate=0.5, window_num=20, open_second=30):
+        self.failure_num = failure_num
+        self.error_rate = error_rate
+        self.window_num = window_num
+        self.open_second = open_second
+        self.results = deque(maxlen=window_num)
+        self.lock = threading.Lock()
+
+    def is_available(self):
+        """
+        是否可以接受请求，不占用试探机会
+        """
+        if self.state == self.STATE_CLOSED: return True
+        now = time.time()
+        if self.state == self.STATE_OPEN: return now - self.opened_at >= self.open_second
+        return now - self.trial_at >= self.open_second  # 试探请求超时未返回
+
+    def allow(self):
+        """
+        申请一次请求，半开时只放行一个试探请求
+        """
+        if self.state == self.STATE_CLOSED: return True
+        with self.lock:
+            if not self.is_available(): return False
+            self.state = self.STATE_HALF_OPEN
+            self.trial_at = time.time()
+            return True
+
+    def record(self, is_success):
+        """
+        记录请求结果
+        :return: 状态是否发生变化
+        """
+        with self.lock:
+            old_state = self.state
+            if self.state != self.STATE_CLOSED:
+                if is_success:
+                    self.reset()
+                else:
+                    self.open()
+                return old_state != self.state
+            self.results.append(is_success)
+            self.consecutive_failures = 0 if is_success else self.consecutive_failures + 1
+            if self.consecutive_failures >= self.failure_num or self.is_error_rate_exceeded():
+                self.open()
+            return old_state != self.state
+
+    def is_error_rate_exceeded(self):
+        if len(self.results) < self.window_num: return False
+        return self.results.count(False) / len(self.results) >= self.error_rate
+
+    def open(self):
+        self.state = self.STATE_OPEN
+        self.opened_at = time.time()
+
+    def reset(self):
+        self.state = self.STATE_CLOSED
+        self.consecutive_failures = 0
+        self.results.clear()
+
+    def is_open(self):
+        return self.state != self.STATE_CLOSED
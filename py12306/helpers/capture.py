@@ -0,0 +1,265 @@
+import struct
+import zlib
+from bisect import bisect_left
+from collections import deque
+from os import path
+from urllib.parse import urlsplit
+
+from py12306.config import Config
+from py12306.helpers.func import *
+from py12306.helpers.request import Request, Response
+
+
+class CaptureFrame:
+    """
+    单条请求记录
+    """
+    timestamp = 0
+    method = 'GET'
+    url = ''
+    status_code = 0
+    reason = ''
+    elapsed = 0
+    content = b''
+
+    def __init__(self, timestamp, method, url, status_code, reason, elapsed, content):
+        self.timestamp = timestamp
+        self.method = method
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.elapsed = elapsed
+        self.content = content
+
+    @classmethod
+    def from_response(cls, response):
+        return cls(time.time(), response.request.method if response.request else 'GET', response.url,
+                   response.status_code, response.reason, response.elapsed.total_seconds(), response.content or b'')
+
+    def to_bytes(self):
+        meta = [self.method, self.url, self.status_code, self.reason, self.elapsed]
+        return zlib.compress(json.dumps(meta).encode() + b'\n' + self.content)
+
+    @classmethod
+    def from_bytes(cls, timestamp, data):
+        meta, content = zlib.decompress(data).split(b'\n', 1)
+        return cls(timestamp, *json.loads(meta.decode()), content)
+
+    @staticmethod
+    def get_key(method, url):
+        """
+        回放时按请求方式以及地址匹配，忽略域名 (CDN)
+        """
+        url = urlsplit(url)
+        return method.upper(), url.path, url.query
+
+
+class Capture:
+    """
+    请求记录文件
+    每条记录为 (时间, 长度) 加压缩后的内容，索引文件保存 (时间, 偏移)，缺失时扫描记录文件重建
+
+    文件结构：
+        头部   标识, 版本
+        记录   时间 (double), 长度 (uint32), zlib (请求信息 json + \\n + 响应内容)
+    """
+    MAGIC = b'PY12306R'
+    VERSION = 1
+    HEADER = struct.Struct('<8sH6x')
+    FRAME_HEADER = struct.Struct('<dI')
+    INDEX_RECORD = struct.Struct('<dQ')
+
+    @staticmethod
+    def get_index_file(file):
+        return file + '.idx'
+
+
+class CaptureWriter(Capture):
+    """
+    记录请求结果
+    """
+    writer = None
+    writer_lock = threading.Lock()
+    query_url_prefix = '/otn/leftTicket/'  # 余票查询与查询页面
+
+    def __init__(self, file):
+        self.file = file
+        self.lock = threading.Lock()
+        is_new = not path.exists(file) or not path.getsize(file)
+        self.capture = open(file, 'ab')
+        self.index = open(self.get_index_file(file), 'ab')
+        if is_new:
+            self.capture.write(self.HEADER.pack(self.MAGIC, self.VERSION))
+            self.index.truncate(0)
+
+    @classmethod
+    def get(cls):
+        """
+        同一进程共用一个记录文件
+        :return: CaptureWriter
+        """
+        if not cls.writer:
+            with cls.writer_lock:
+                if not cls.writer:
+                    from py12306.log.common_log import CommonLog
+                    cls.writer = cls(Config().QUERY_RECORD_FILE)
+                    CommonLog.add_quick_log(CommonLog.MESSAGE_RECORD_START.format(Config().QUERY_RECORD_FILE)).flush()
+        return cls.writer
+
+    def write(self, frame: CaptureFrame):
+        data = frame.to_bytes()
+        with self.lock:
+            offset = self.capture.tell()
+            self.capture.write(self.FRAME_HEADER.pack(frame.timestamp, len(data)))
+            self.capture.write(data)
+            self.capture.flush()
+            self.index.write(self.INDEX_RECORD.pack(frame.timestamp, offset))
+            self.index.flush()
+
+    def query_hook(self, response, **kwargs):
+        """
+        只记录余票查询
+        """
+        if urlsplit(response.url).path.startswith(self.query_url_prefix):
+            self.write(CaptureFrame.from_response(response))
+
+    def hook(self, response, **kwargs):
+        self.write(CaptureFrame.from_response(response))
+
+
+class CaptureReader(Capture):
+    """
+    读取请求记录
+    """
+    indexes = []  # [(时间, 偏移)]
+
+    def __init__(self, file):
+        self.file = file
+        self.lock = threading.Lock()
+        self.capture = open(file, 'rb')
+        magic, version = self.HEADER.unpack(self.capture.read(self.HEADER.size))
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError('Invalid capture file {}'.format(file))
+        self.indexes = self.read_indexes()
+
+    def read_indexes(self):
+        """
+        读取索引文件，索引为空或最后一条记录的结尾与记录文件大小不一致 (索引未写完或记录被截断) 时重新扫描
+        """
+        size = path.getsize(self.file)
+        index_file = self.get_index_file(self.file)
+        if path.exists(index_file):
+            with open(index_file, 'rb') as f:
+                data = f.read()
+            data = data[:len(data) - len(data) % self.INDEX_RECORD.size]
+            indexes = list(self.INDEX_RECORD.iter_unpack(data))
+            if indexes and self.get_frame_end(indexes[-1][1], size) == size:
+                return indexes
+        return self.scan_indexes(size)
+
+    def get_frame_end(self, offset, size):
+        if offset < self.HEADER.size or offset + self.FRAME_HEADER.size > size: return None
+        with self.lock:
+            self.capture.seek(offset)
+            _, length = self.FRAME_HEADER.unpack(self.capture.read(self.FRAME_HEADER.size))
+        return offset + self.FRAME_HEADER.size + length
+
+    def scan_indexes(self, size):
+        """
+        扫描记录文件重建索引，忽略未写完整的最后一条
+        """
+        indexes = []
+        offset = self.HEADER.size
+        with self.lock:
+            while offset + self.FRAME_HEADER.size <= size:
+                self.capture.seek(offset)
+                timestamp, length = self.FRAME_HEADER.unpack(self.capture.read(self.FRAME_HEADER.size))
+                if offset + self.FRAME_HEADER.size + length > size: break
+                indexes.append((timestamp, offset))
+                offset += self.FRAME_HEADER.size + length
+        return indexes
+
+    def read_frame(self, offset) -> CaptureFrame:
+        with self.lock:
+            self.capture.seek(offset)
+            timestamp, length = self.FRAME_HEADER.unpack(self.capture.read(self.FRAME_HEADER.size))
+            data = self.capture.read(length)
+        return CaptureFrame.from_bytes(timestamp, data)
+
+    def seek(self, timestamp):
+        """
+        第一条不早于指定时间的记录位置
+        """
+        return bisect_left(self.indexes, (timestamp, 0))
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __iter__(self):
+        for timestamp, offset in self.indexes:
+            yield self.read_frame(offset)
+
+
+class ReplaySession(Request):
+    """
+    回放请求记录，不访问网络
+    相同请求按记录顺序依次返回，并按原始时间间隔 (除以速度) 返回，速度为 0 时不等待
+    """
+    reader = None
+    speed = 1
+    frames = {}  # (请求方式, 路径, 参数) => [(时间, 偏移)]
+    remain_num = 0
+    first_timestamp = 0
+    started_at = 0
+
+    def __init__(self, file, speed=1):
+        super().__init__()
+        from py12306.log.common_log import CommonLog
+        self.reader = CaptureReader(file)
+        self.speed = float(speed)
+        self.lock = threading.Lock()
+        self.frames = {}
+        for timestamp, offset in self.reader.indexes:
+            frame = self.reader.read_frame(offset)
+            self.frames.setdefault(CaptureFrame.get_key(frame.method, frame.url), deque()).append((timestamp, offset))
+        self.remain_num = len(self.reader)
+        self.first_timestamp = self.reader.indexes[0][0] if self.reader.indexes else 0
+        self.started_at = time.time()
+        CommonLog.add_quick_log(CommonLog.MESSAGE_REPLAY_START.format(file, self.remain_num, self.speed)).flush()
+
+    def request(self, method, url, **kwargs):
+        with self.lock:
+            frames = self.frames.get(CaptureFrame.get_key(method, url))
+            item = frames.popleft() if frames else None
+            if item:
+                self.remain_num -= 1
+                if not self.remain_num:
+                    from py12306.log.common_log import CommonLog
+                    CommonLog.add_quick_log(CommonLog.MESSAGE_REPLAY_FINISHED).flush()
+        if not item:
+            return self.get_missing_response(url)
+        timestamp, offset = item
+        if self.speed > 0:
+            delay = self.started_at + (timestamp - self.first_timestamp) / self.speed - time.time()
+            if delay > 0: sleep(delay)
+        return self.get_response(self.reader.read_frame(offset))
+
+    def cdn_request(self, url: str, cdn=None, method='GET', scheduler=None, **kwargs):
+        return self.request(method, url, **kwargs)
+
+    def get_response(self, frame: CaptureFrame):
+        response = Response()
+        response.status_code = frame.status_code
+        response.reason = frame.reason
+        response.url = frame.url
+        response.encoding = 'utf-8'
+        response._content = frame.content
+        response.elapsed = datetime.timedelta(seconds=frame.elapsed)
+        return response
+
+    def get_missing_response(self, url):
+        from py12306.log.common_log import CommonLog
+        response = Response()
+        response.url = url
+        response.reason = CommonLog.MESSAGE_REPLAY_MISSING
+        return response
@@ -1,17 +1,84 @@
+import asyncio
+import heapq
 import random
 import json
+import ssl
+import zlib
+from collections import deque
+from urllib.parse import urlsplit
 from datetime import timedelta
-from os import path
+from os import path, replace
 
 from py12306.cluster.cluster import Cluster
 from py12306.config import Config
 from py12306.app import app_available_check
 from py12306.helpers.api import API_CHECK_CDN_AVAILABLE, HOST_URL_OF_12306
+from py12306.helpers.breaker import CircuitBreaker
 from py12306.helpers.func import *
-from py12306.helpers.request import Request
 from py12306.log.common_log import CommonLog
 
 
+class CdnStat:
+    """
+    单个 CDN 的状态
+    耗时与错误率使用指数加权移动平均，同时由检测和实际查询更新
+    """
+    item = ''
+    latency = 0  # 平均耗时 (秒)
+    error_rate = 0
+    last_success_at = 0
+    checked_at = 0  # 上次检测时间
+    ttl = 0  # 检测结果有效期 (秒)
+
+    alpha = 0.2  # 新数据权重
+    merge_weight = 0.5  # 合并其它节点数据时的权重
+    error_penalty = 4  # 错误率对评分的放大系数
+
+    def __init__(self, item, latency=0, error_rate=0, last_success_at=0, checked_at=0, ttl=0):
+        self.item = item
+        self.latency = latency
+        self.error_rate = error_rate
+        self.last_success_at = last_success_at
+        self.checked_at = checked_at
+        self.ttl = ttl
+
+    def update(self, elapsed, is_success):
+        if is_success:
+            self.latency = elapsed if not self.latency else self.latency + self.alpha * (elapsed - self.latency)
+            self.last_success_at = time.time()
+        self.error_rate += self.alpha * ((0 if is_success else 1) - self.error_rate)
+
+    def merge(self, latency, error_rate, last_success_at):
+        """
+        合并其它节点的实际查询结果
+        """
+        if latency:
+            self.latency = latency if not self.latency else self.latency + self.merge_weight * (latency - self.latency)
+        self.error_rate += self.merge_weight * (error_rate - self.error_rate)
+        self.last_success_at = max(self.last_success_at, last_success_at)
+
+    def get_score(self, default_latency):
+        """
+        评分，越小越好
+        """
+        return (self.latency or default_latency) * (1 + self.error_penalty * self.error_rate)
+
+    def mark_checked(self, ttl):
+        self.checked_at = time.time()
+        self.ttl = ttl
+
+    def get_expire_at(self):
+        return self.checked_at + self.ttl
+
+    def to_list(self):
+        return [round(self.latency, 4), round(self.error_rate, 4), int(self.last_success_at),
+                round(self.checked_at, 3), int(self.ttl)]
+
+    @classmethod
+    def from_list(cls, item, data):
+        return cls(item, *data)
+
+
 @singleton
 class Cdn:
     """
@@ -20,26 +87,69 @@ class Cdn:
     items = []
     available_items = []
     unavailable_items = []
-    recheck_available_items = []
-    recheck_unavailable_items = []
     retry_time = 3
     is_ready = False
     is_finished = False
     is_ready_num = 10  # 当可用超过 10，已准备好
     is_alive = True
-    is_recheck = False
 
     safe_stay_time = 0.2
     retry_num = 1
-    thread_num = 5
+    check_concurrency = 200
     check_time_out = 3
+    checked_num = 0
+    check_total_num = 0
+    unchecked_items = None  # 待检测队列
+    progress_step = 200  # 每检测多少个输出一次进度
+    ssl_context = None
 
-    last_check_at = 0
+    last_check_at = 0  # 上次保存快照时间
     save_second = 5
-    check_keep_second = 60 * 60 * 24
+    journal = None  # 检测记录，追加写入，定期合并到快照
+    journal_num = 0
+    journal_compact_num = 500  # 记录数超过 cdn 总数 (至少 500) 时合并
+    journal_compact_second = 60 * 10
+
+    revalidate_ttl = 60 * 60 * 12
+    revalidate_rate = 1  # 每秒重新检测数量
+    revalidate_quota = 0
+    revalidate_interval = 1
+    min_ttl_ratio = 0.1  # 错误率高的 cdn 有效期缩短，最低为 ttl 的 10%
+    ttl_jitter = 0.1  # 有效期随机浮动，避免集中过期
+    is_checking = False
+
+    cluster_health = {}  # 待发布到集群的检测结果
+    cluster_stat_items = set()  # 有新的查询结果，待发布到集群的 cdn
+    cluster_stats_synced_id = None
+    cluster_synced_id = None  # 已同步到的集群更新记录 ID，为空时全量同步
+    cluster_update_max_num = 10000  # 更新记录保留数量，超过后裁剪旧记录
+    cluster_read_num = 1000
+    cluster_synced_at = 0
+    cluster_sync_second = 3
+    cluster_published_at = 0
+
+    stats = {}  # CDN => CdnStat
+    breakers = {}  # CDN => CircuitBreaker
+    latencies = None  # 近期查询耗时
+    latency_sample_num = 200
+    latency_count = 0  # 累计采样次数，样本队列满后长度不再变化
+    hedge_delay = 0
+    hedge_percentile = 0.9
+    hedge_min_sample_num = 20
+    hedge_refresh_num = 10  # 每采样多少次重新计算对冲延迟
+    pick_retry_num = 5  # 选取 CDN 最多尝试次数
 
     def __init__(self):
         self.cluster = Cluster()
+        self.latencies = deque(maxlen=self.latency_sample_num)
+        self.unchecked_items = deque()
+        self.stats = {}
+        self.breakers = {}
+        self.cluster_health = {}
+        self.cluster_stat_items = set()
+        self.stats_lock = threading.Lock()
+        self.items_lock = threading.Lock()
+        self.journal_lock = threading.Lock()
         self.init_config()
         create_thread_and_run(self, 'watch_cdn', False)
 
@@ -49,10 +159,12 @@ class Cdn:
         self.unavailable_items = []
         self.is_finished = False
         self.is_ready = False
-        self.is_recheck = False
 
     def init_config(self):
         self.check_time_out = Config().CDN_CHECK_TIME_OUT
+        self.check_concurrency = Config().CDN_CHECK_CONCURRENCY
+        self.revalidate_ttl = Config().CDN_REVALIDATE_TTL
+        self.revalidate_rate = Config().CDN_REVALIDATE_RATE
 
     def update_cdn_status(self, auto=False):
         if auto:
@@ -75,8 +187,22 @@ class Cdn:
         self.load_items()
         CommonLog.add_quick_log(CommonLog.MESSAGE_CDN_START_TO_CHECK.format(len(self.items))).flush()
         self.restore_items()
-        for i in range(self.thread_num):  # 多线程
-            create_thread_and_run(jobs=self, callback_name='check_available', wait=False)
+        if Config.is_cluster_enabled(): self.try_sync_with_cluster(self.sync_from_cluster)
+        if self.is_prober(): self.start_check()
+
+    def start_check(self):
+        """
+        将未检测的 CDN 加入队列，并启动异步检测
+        :return:
+        """
+        checked = set(self.available_items) | set(self.unavailable_items)
+        items = [item for item in self.get_own_items(self.items) if item not in checked]
+        random.shuffle(items)
+        self.unchecked_items = deque(items)
+        self.checked_num = 0
+        self.check_total_num = len(items)
+        self.is_checking = True
+        create_thread_and_run(jobs=self, callback_name='check_available', wait=False)
 
     def load_items(self):
         with open(Config().CDN_ITEM_FILE, encoding='utf-8') as f:
@@ -85,7 +211,7 @@ class Cdn:
 
     def restore_items(self):
         """
-        恢复已有数据
+        恢复已有数据，先读取快照，再重放之后的检测记录
         :return: bool
         """
         result = False
@@ -97,63 +223,325 @@ class Cdn:
                 except json.JSONDecodeError as e:
                     result = {}
 
-        # if Config.is_cluster_enabled(): # 集群不用同步 cdn
-        #     result = self.get_data_from_cluster()
-
+        states = {}  # CDN => 是否可用
         if result:
             self.last_check_at = result.get('last_check_at', '')
             if self.last_check_at: self.last_check_at = str_to_time(self.last_check_at)
-            self.available_items = result.get('items', [])
-            self.unavailable_items = result.get('fail_items', [])
+            states.update(dict.fromkeys(result.get('fail_items', []), False))
+            states.update(dict.fromkeys(result.get('items', []), True))
+            for item, data in result.get('stats', {}).items():
+                self.stats[item] = CdnStat.from_list(item, data)
             CommonLog.add_quick_log(CommonLog.MESSAGE_CDN_RESTORE_SUCCESS.format(self.last_check_at)).flush()
-            return True
-        return False
 
-    # def get_data_from_cluster(self):
-    #     available_items = self.cluster.session.smembers(Cluster.KEY_CDN_AVAILABLE_ITEMS)
-    #     last_time = self.cluster.session.get(Cluster.KEY_CDN_LAST_CHECK_AT, '')
-    #     if available_items and last_time:
-    #         return {'items': available_items, 'last_check_at': last_time}
-    #     return False
+        self.journal_num = 0
+        for item, is_available, data in self.read_journal():
+            states[item] = bool(is_available)
+            self.stats[item] = CdnStat.from_list(item, data)
+            self.journal_num += 1
+        if self.journal_num:
+            CommonLog.add_quick_log(CommonLog.MESSAGE_CDN_JOURNAL_RESTORED.format(self.journal_num)).flush()
+
+        self.available_items = [item for item, is_available in states.items() if is_available]
+        self.unavailable_items = [item for item, is_available in states.items() if not is_available]
+        return bool(states)
+
+    def read_journal(self):
+        """
+        读取检测记录，每行为 [cdn, 是否可用, 状态]
+        程序中断时最后一行可能不完整，直接跳过
+        :return:
+        """
+        if not path.exists(Config().CDN_JOURNAL_FILE): return
+        with open(Config().CDN_JOURNAL_FILE, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    item, is_available, data = json.loads(line)
+                except ValueError:
+                    continue
+                yield item, is_available, data
+
+    def append_journal(self, item, is_available, stat):
+        with self.journal_lock:
+            if not self.journal:
+                self.journal = open(Config().CDN_JOURNAL_FILE, 'a', encoding='utf-8')
+            self.journal.write(json.dumps([item, int(is_available), stat.to_list()]) + '\n')
+            self.journal.flush()
+            self.journal_num += 1
 
-    def is_need_to_recheck(self):
+    def is_compact_needed(self):
+        """
+        记录数与 cdn 总数相当，或距上次合并过久时合并
         """
-        是否需要重新检查 cdn
+        if not self.journal_num: return False
+        if self.journal_num >= max(self.journal_compact_num, len(self.items)): return True
+        return self.last_check_at and (time_now() - self.last_check_at).total_seconds() > self.journal_compact_second
+
+    def is_prober(self):
+        """
+        是否负责检测 cdn
+        集群模式下由主节点检测，开启分片后所有节点各检测一部分
         :return:
         """
-        if self.last_check_at and (
-                time_now() - self.last_check_at).seconds > self.check_keep_second:
+        if not Config.is_cluster_enabled() or Config().CDN_CLUSTER_SHARD_ENABLED: return True
+        return Config.is_master()
+
+    def get_own_items(self, items):
+        """
+        筛选当前节点负责检测的 cdn，按节点名排序后对 cdn 取模分片
+        :param items:
+        :return:
+        """
+        if not Config.is_cluster_enabled() or not Config().CDN_CLUSTER_SHARD_ENABLED: return items
+        nodes = sorted(self.cluster.nodes)
+        if self.cluster.node_name not in nodes: return []
+        index, total = nodes.index(self.cluster.node_name), len(nodes)
+        return [item for item in items if zlib.crc32(item.encode()) % total == index]
+
+    def sync_with_cluster(self):
+        """
+        同步集群中的检测结果，负责检测的节点处理其它节点上报的可疑 cdn
+        :return:
+        """
+        self.publish_to_cluster()
+        self.sync_from_cluster()
+        if not self.is_prober(): return
+        if not self.is_finished and not self.is_checking:  # 子节点提升为主节点
+            self.start_check()
+        items = self.get_own_items(self.cluster.session.zrange(Cluster.KEY_CDN_SUSPECT_ITEMS, 0, -1))
+        if items:
+            for item in items: self.get_stat(item).checked_at = 0
+            self.cluster.session.zrem(Cluster.KEY_CDN_SUSPECT_ITEMS, *items)
+
+    def try_sync_with_cluster(self, callback):
+        """
+        集群同步失败 (如 Redis 不可用) 时只记录日志，等待下次同步
+        :param callback:
+        :return: 是否成功
+        """
+        try:
+            callback()
             return True
-        return False
+        except Exception as e:
+            self.cluster_synced_at = self.cluster_published_at = time.time()
+            CommonLog.add_quick_log(CommonLog.MESSAGE_CDN_CLUSTER_SYNC_FAIL.format(e)).flush()
+            return False
 
-    def get_unchecked_item(self):
-        if not self.is_recheck:
-            items = list(set(self.items) - set(self.available_items) - set(self.unavailable_items))
+    def sync_from_cluster(self):
+        """
+        增量同步集群中的检测结果
+        本地已有查询耗时的 cdn 保留本地数据，只更新可用状态与有效期，耗时与错误率由其它节点的查询结果合并
+        :return:
+        """
+        self.sync_stats_from_cluster()
+        self.cluster_synced_at = time.time()
+        updates, self.cluster_synced_id = self.read_cluster_updates(Cluster.KEY_CDN_HEALTH_UPDATES,
+                                                                    Cluster.KEY_CDN_HEALTH, self.cluster_synced_id)
+        if not updates: return
+        passed, failed = [], []
+        for item, data in updates.items():
+            is_available, *stat_data = json.loads(data)
+            remote = CdnStat.from_list(item, stat_data)
+            stat = self.get_stat(item)
+            if remote.checked_at <= stat.checked_at: continue
+            stat.checked_at, stat.ttl = remote.checked_at, remote.ttl
+            if not stat.latency:
+                stat.latency, stat.error_rate, stat.last_success_at = \
+                    remote.latency, remote.error_rate, remote.last_success_at
+            (passed if is_available else failed).append(item)
+            self.append_journal(item, is_available, stat)
+        added, removed = self.update_items(passed, failed)
+        if added or removed:
+            CommonLog.add_quick_log(CommonLog.MESSAGE_CDN_CLUSTER_SYNCED.format(
+                len(added), len(removed), len(self.available_items))).flush()
+        if not self.is_ready: self.check_is_ready()
+        if self.is_compact_needed(): self.save_available_items()
+
+    def sync_stats_from_cluster(self):
+        """
+        增量合并其它节点发布的实际查询耗时与错误率
+        :return:
+        """
+        updates, self.cluster_stats_synced_id = self.read_cluster_updates(
+            Cluster.KEY_CDN_STATS_UPDATES, Cluster.KEY_CDN_STATS, self.cluster_stats_synced_id)
+        for data in updates.values():
+            node_name, item, latency, error_rate, last_success_at = json.loads(data)
+            if node_name == self.cluster.node_name: continue
+            self.get_stat(item).merge(latency, error_rate, last_success_at)
+
+    def read_cluster_updates(self, stream, key, last_id):
+        """
+        读取上次同步之后的更新
+        更新记录 ID 由 Redis 在写入时生成，单调递增，不受各节点时钟影响，也不会有晚写入的记录排在已读位置之前
+        首次同步或未读的记录已被裁剪时，读取全部数据，重复读取的结果按检测时间忽略
+        :param stream: 更新记录
+        :param key: 全部数据
+        :param last_id: 上次读取到的记录 ID
+        :return: ({field: data}, 新的记录 ID)
+        """
+        session = self.cluster.session
+        first = session.xrange(stream, count=1)
+        if last_id is None or (first and self.parse_update_id(first[0][0]) > self.parse_update_id(last_id)):
+            last = session.xrevrange(stream, count=1)  # 先取位置再读数据，期间写入的更新下次会再读一次
+            return session.hgetall(key), last[0][0] if last else '0-0'
+        updates = {}
+        while True:
+            result = session.xread({stream: last_id}, count=self.cluster_read_num)
+            entries = result[0][1] if result else []
+            for entry_id, fields in entries:
+                updates.update(fields)
+                last_id = entry_id
+            if len(entries) < self.cluster_read_num: break
+        return updates, last_id
+
+    @staticmethod
+    def parse_update_id(entry_id):
+        return tuple(int(part) for part in entry_id.split('-'))
+
+    def publish_to_cluster(self):
+        """
+        发布检测结果，以及本节点实际查询的耗时与错误率
+        全部数据与更新记录在同一事务中写入
+        :return:
+        """
+        health, self.cluster_health = self.cluster_health, {}
+        stat_items, self.cluster_stat_items = self.cluster_stat_items, set()
+        if not health and not stat_items: return
+        pipeline = self.cluster.session.pipeline()
+        if health:
+            pipeline.hmset(Cluster.KEY_CDN_HEALTH, health)
+            pipeline.xadd(Cluster.KEY_CDN_HEALTH_UPDATES, health, maxlen=self.cluster_update_max_num)
+        if stat_items:
+            stats = {}  # 各节点分别记录，合并时不会覆盖其它节点的数据
+            for item in stat_items:
+                stat = self.get_stat(item)
+                stats['{}|{}'.format(self.cluster.node_name, item)] = json.dumps(
+                    [self.cluster.node_name, item, round(stat.latency, 4), round(stat.error_rate, 4),
+                     int(stat.last_success_at)])
+            pipeline.hmset(Cluster.KEY_CDN_STATS, stats)
+            pipeline.xadd(Cluster.KEY_CDN_STATS_UPDATES, stats, maxlen=self.cluster_update_max_num)
+        try:
+            pipeline.execute()
+        except Exception:  # 发布失败，保留待发布数据，下次重新发布
+            for item, data in health.items(): self.cluster_health.setdefault(item, data)
+            self.cluster_stat_items.update(stat_items)
+            raise
+        self.cluster_published_at = time.time()
+
+    def report_suspect(self, item):
+        """
+        查询时被熔断的 cdn 尽快重新检测，集群模式下交由负责检测的节点处理
+        :param item:
+        :return:
+        """
+        if Config.is_cluster_enabled():
+            self.cluster.session.zadd(Cluster.KEY_CDN_SUSPECT_ITEMS, {item: time.time()})
         else:
-            items = list(set(self.items) - set(self.recheck_available_items) - set(self.recheck_unavailable_items))
-        if items: return random.choice(items)
-        return None
+            self.get_stat(item).checked_at = 0
+
+    def get_unchecked_item(self):
+        try:
+            return self.unchecked_items.popleft()
+        except IndexError:
+            return None
 
     def check_available(self):
-        while True and self.is_alive:
+        """
+        在单独的事件循环中并发检测
+        :return:
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.check_available_async())
+        finally:
+            loop.close()
+            self.is_checking = False
+        if self.is_alive: self.check_did_finished()
+
+    async def check_available_async(self):
+        workers = [self.check_worker() for i in range(max(1, self.check_concurrency))]
+        await asyncio.gather(*workers)
+
+    async def check_worker(self):
+        while self.is_alive:
             item = self.get_unchecked_item()
-            if not item: return self.check_did_finished()
-            self.check_item_available(item)
+            if not item: return
+            await self.check_item_available(item)
 
     def watch_cdn(self):
         """
-        监控 cdn 状态，自动重新检测
+        监控 cdn 状态，以较低的速率持续重新检测已过期的 cdn
         :return:
         """
+        loop = asyncio.new_event_loop()
         while True:
-            if self.is_alive and not self.is_recheck and self.is_need_to_recheck():  # 重新检测
-                self.is_recheck = True
-                self.is_finished = False
-                CommonLog.add_quick_log(
-                    CommonLog.MESSAGE_CDN_START_TO_RECHECK.format(len(self.items), time_now())).flush()
-                for i in range(self.thread_num):  # 多线程
-                    create_thread_and_run(jobs=self, callback_name='check_available', wait=False)
-            stay_second(self.retry_num)
+            if self.is_alive and Config.is_cluster_enabled() and \
+                    time.time() - self.cluster_synced_at >= self.cluster_sync_second:
+                self.try_sync_with_cluster(self.sync_with_cluster)
+            if self.is_alive and self.is_finished and self.revalidate_rate > 0 and self.is_prober():
+                try:
+                    self.revalidate(loop)
+                except Exception as e:  # 单次失败不影响后续检测
+                    CommonLog.add_quick_log(CommonLog.MESSAGE_CDN_REVALIDATE_FAIL.format(e)).flush()
+            stay_second(self.revalidate_interval)
+
+    def revalidate(self, loop):
+        """
+        按速率取出已过期的 cdn 重新检测
+        :param loop:
+        :return:
+        """
+        self.revalidate_quota = min(self.revalidate_quota + self.revalidate_rate * self.revalidate_interval,
+                                    max(1, self.revalidate_rate))
+        num = int(self.revalidate_quota)
+        items = self.get_expired_items(num) if num else []
+        if items:
+            self.revalidate_quota -= len(items)
+            loop.run_until_complete(self.revalidate_items(items))
+
+    def get_expired_items(self, num):
+        """
+        取最早过期的 cdn，错误率高的有效期短，会优先被选中
+        :param num:
+        :return:
+        """
+        now = time.time()
+        items = heapq.nsmallest(num, self.get_own_items(self.items),
+                                key=lambda item: self.get_stat(item).get_expire_at())
+        return [item for item in items if self.get_stat(item).get_expire_at() <= now]
+
+    async def revalidate_items(self, items):
+        """
+        重新检测，根据结果调整可用列表
+        :param items:
+        :return:
+        """
+        results = await asyncio.gather(*[self.check_item(item) for item in items])
+        added, removed = self.update_items([item for item, result in zip(items, results) if result],
+                                           [item for item, result in zip(items, results) if not result])
+        if added or removed:
+            CommonLog.add_quick_log(
+                CommonLog.MESSAGE_CDN_REVALIDATED.format(len(added), len(removed), len(self.available_items))).flush()
+        if Config.is_cluster_enabled(): self.publish_to_cluster()
+        if self.is_compact_needed(): self.save_available_items()
+
+    def update_items(self, passed, failed):
+        """
+        根据检测结果调整可用列表，整体替换列表，查询线程随时读取
+        与检测线程的追加互斥，避免替换时丢失新检测的结果
+        :param passed:
+        :param failed:
+        :return: (新增可用, 新增失效)
+        """
+        with self.items_lock:
+            available, unavailable = set(self.available_items), set(self.unavailable_items)
+            added = [item for item in passed if item not in available]
+            removed = [item for item in failed if item in available]
+            new_failed = [item for item in failed if item not in unavailable]
+            if added or removed or new_failed:
+                passed, failed = set(passed), set(failed)
+                self.available_items = [item for item in self.available_items if item not in failed] + added
+                self.unavailable_items = [item for item in self.unavailable_items if item not in passed] + new_failed
+        return added, removed
 
     def destroy(self):
         """
@@ -164,54 +552,111 @@ class Cdn:
         self.is_alive = False
         self.init_data()
 
-    def check_item_available(self, item, try_num=0):
-        session = Request()
-        response = session.get(API_CHECK_CDN_AVAILABLE.format(item), headers={'Host': HOST_URL_OF_12306},
-                               timeout=self.check_time_out,
-                               verify=False)
+    async def check_item_available(self, item):
+        is_available = await self.check_item(item)
+        with self.items_lock:
+            (self.available_items if is_available else self.unavailable_items).append(item)
+        if is_available and not self.is_ready: self.check_is_ready()
+        self.checked_num += 1
+        if self.checked_num % self.progress_step == 0:
+            CommonLog.add_quick_log(CommonLog.MESSAGE_CDN_CHECK_PROGRESS.format(
+                self.checked_num, self.check_total_num, len(self.available_items))).flush()
+        if Config.is_cluster_enabled() and time.time() - self.cluster_published_at > self.save_second:
+            self.try_sync_with_cluster(self.publish_to_cluster)
+        if self.is_compact_needed(): self.save_available_items()
 
-        if response.status_code == 200:
-            if not self.is_recheck:
-                self.available_items.append(item)
-            else:
-                self.recheck_available_items.append(item)
-            if not self.is_ready: self.check_is_ready()
-        elif try_num < self.retry_num:  # 重试
-            stay_second(self.safe_stay_time)
-            return self.check_item_available(item, try_num + 1)
-        else:
-            if not self.is_recheck:
-                self.unavailable_items.append(item)
-            else:
-                self.recheck_unavailable_items.append(item)
-        if not self.is_recheck and (
-                not self.last_check_at or (time_now() - self.last_check_at).seconds > self.save_second):
-            self.save_available_items()
-        stay_second(self.safe_stay_time)
+    async def check_item(self, item, try_num=0):
+        """
+        检测单个 cdn，并更新其有效期
+        :param item:
+        :param try_num:
+        :return: 是否可用
+        """
+        start_at = time.time()
+        status_code = await self.request_status_code(item)
+        stat = self.get_stat(item)
+        stat.update(time.time() - start_at, status_code == 200)
+        if status_code != 200 and try_num < self.retry_num:  # 重试
+            await asyncio.sleep(self.safe_stay_time)
+            return await self.check_item(item, try_num + 1)
+        stat.mark_checked(self.get_ttl(stat, status_code == 200))
+        self.append_journal(item, status_code == 200, stat)
+        if Config.is_cluster_enabled():
+            self.cluster_health[item] = json.dumps([int(status_code == 200)] + stat.to_list())
+        return status_code == 200
+
+    def get_ttl(self, stat, is_available):
+        ttl = self.revalidate_ttl
+        if is_available: ttl *= max(self.min_ttl_ratio, 1 - stat.error_rate)
+        return ttl * random.uniform(1 - self.ttl_jitter, 1 + self.ttl_jitter)
+
+    async def request_status_code(self, item):
+        """
+        请求检测地址，只读取状态行
+        每个 cdn 只检测一次，连接不复用，读取后即关闭
+        :param item:
+        :return: 状态码，失败返回 0
+        """
+        url = urlsplit(API_CHECK_CDN_AVAILABLE.format(item))
+        request = 'GET {} HTTP/1.1\r\nHost: {}\r\nConnection: close\r\n\r\n'.format(url.path, HOST_URL_OF_12306)
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(url.hostname, url.port or 443, ssl=self.get_ssl_context(),
+                                        server_hostname=HOST_URL_OF_12306), self.check_time_out)
+            writer.write(request.encode())
+            line = await asyncio.wait_for(reader.readline(), self.check_time_out)
+            parts = line.split()
+            return int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+        except (OSError, asyncio.TimeoutError, ssl.SSLError, ValueError):
+            return 0
+        finally:
+            if writer: await self.close_writer(writer)
+
+    async def close_writer(self, writer):
+        writer.close()
+        if not hasattr(writer, 'wait_closed'): return  # Python 3.7 以下没有 wait_closed
+        try:
+            await asyncio.wait_for(writer.wait_closed(), self.check_time_out)
+        except (OSError, asyncio.TimeoutError, ssl.SSLError):
+            pass
+
+    def get_ssl_context(self):
+        """
+        所有检测共用一个 SSL 上下文，不校验证书
+        """
+        if not self.ssl_context:
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            self.ssl_context = context
+        return self.ssl_context
 
     def check_did_finished(self):
         self.is_ready = True
         if not self.is_finished:
             self.is_finished = True
-            if self.is_recheck:
-                self.is_recheck = False
-                self.available_items = self.recheck_available_items
-                self.unavailable_items = self.recheck_unavailable_items
-                self.recheck_available_items = []
-                self.recheck_unavailable_items = []
             CommonLog.add_quick_log(CommonLog.MESSAGE_CDN_CHECKED_SUCCESS.format(len(self.available_items))).flush()
             self.save_available_items()
 
     def save_available_items(self):
-        self.last_check_at = time_now()
-        data = {'items': self.available_items, 'fail_items': self.unavailable_items,
-                'last_check_at': str(self.last_check_at)}
-        with open(Config().CDN_ENABLED_AVAILABLE_ITEM_FILE, 'w') as f:
-            f.write(json.dumps(data))
-
-        # if Config.is_master():
-        #     self.cluster.session.sadd(Cluster.KEY_CDN_AVAILABLE_ITEMS, self.available_items)
-        #     self.cluster.session.set(Cluster.KEY_CDN_LAST_CHECK_AT, time_now())
+        """
+        保存快照并清空检测记录
+        :return:
+        """
+        with self.journal_lock:
+            self.last_check_at = time_now()
+            data = {'items': self.available_items, 'fail_items': self.unavailable_items,
+                    'stats': {item: stat.to_list() for item, stat in list(self.stats.items())},
+                    'last_check_at': str(self.last_check_at)}
+            file = Config().CDN_ENABLED_AVAILABLE_ITEM_FILE
+            with open(file + '.tmp', 'w') as f:
+                f.write(json.dumps(data))
+            replace(file + '.tmp', file)
+            if self.journal: self.journal.close()
+            self.journal = open(Config().CDN_JOURNAL_FILE, 'w', encoding='utf-8')
+            self.journal_num = 0
+        if Config.is_cluster_enabled(): self.try_sync_with_cluster(self.publish_to_cluster)
 
     def check_is_ready(self):
         if len(self.available_items) > self.is_ready_num:
@@ -220,12 +665,89 @@ class Cdn:
             self.is_ready = False
 
     @classmethod
-    def get_cdn(cls):
+    def get_cdn(cls, exclude=None):
+        """
+        随机选取两个 CDN，返回评分较好的一个
+        已熔断的 CDN 不参与选取
+        """
         self = cls()
-        if self.is_ready and self.available_items:
-            return random.choice(self.available_items)
+        if not self.is_ready or not self.available_items: return None
+        for i in range(self.pick_retry_num):
+            items = [item for item in (random.choice(self.available_items), random.choice(self.available_items))
+                     if item != exclude and self.get_breaker(item).is_available()]
+            if not items: continue
+            item = items[0]
+            if len(items) == 2 and items[0] != items[1]:
+                default_latency = self.get_default_latency()
+                item = min(items, key=lambda item: self.get_stat(item).get_score(default_latency))
+            if self.get_breaker(item).allow(): return item
         return None
 
+    def get_breaker(self, item) -> CircuitBreaker:
+        breaker = self.breakers.get(item)
+        if not breaker:
+            with self.stats_lock:
+                breaker = self.breakers.get(item)
+                if not breaker:
+                    breaker = self.breakers[item] = CircuitBreaker(
+                        failure_num=Config().CDN_BREAKER_FAILURE_NUM, error_rate=Config().CDN_BREAKER_ERROR_RATE,
+                        window_num=Config().CDN_BREAKER_WINDOW_NUM, open_second=Config().CDN_BREAKER_OPEN_SECOND)
+        return breaker
+
+    def get_stat(self, item) -> CdnStat:
+        stat = self.stats.get(item)
+        if not stat:
+            with self.stats_lock:
+                stat = self.stats.get(item)
+                if not stat:
+                    stat = self.stats[item] = CdnStat(item)
+        return stat
+
+    def get_default_latency(self):
+        """
+        无耗时数据的 CDN 按近期 p90 耗时计算
+        """
+        return self.hedge_delay if self.hedge_delay else self.check_time_out
+
+    @classmethod
+    def report(cls, item, elapsed, is_success):
+        """
+        记录实际查询结果
+        :param item:
+        :param elapsed: 耗时 (秒)
+        :param is_success:
+        :return:
+        """
+        self = cls()
+        self.get_stat(item).update(elapsed, is_success)
+        if Config.is_cluster_enabled(): self.cluster_stat_items.add(item)
+        breaker = self.get_breaker(item)
+        if breaker.record(is_success):
+            if breaker.is_open():
+                CommonLog.add_quick_log(CommonLog.MESSAGE_CDN_BREAKER_OPEN.format(item, breaker.open_second)).flush()
+                self.report_suspect(item)
+            else:
+                CommonLog.add_quick_log(CommonLog.MESSAGE_CDN_BREAKER_CLOSE.format(item)).flush()
+        if not is_success: return
+        self.latencies.append(elapsed)
+        self.latency_count += 1
+        if self.latency_count % self.hedge_refresh_num == 0 or not self.hedge_delay:
+            self.refresh_hedge_delay()
+
+    def refresh_hedge_delay(self):
+        latencies = sorted(self.latencies)
+        if len(latencies) < self.hedge_min_sample_num: return
+        self.hedge_delay = latencies[int(len(latencies) * self.hedge_percentile) - 1]
+
+    @classmethod
+    def get_hedge_delay(cls):
+        """
+        对冲请求前等待的时间，取近期查询耗时的 p90
+        """
+        self = cls()
+        delay = self.hedge_delay if self.hedge_delay else Config().CDN_HEDGE_DELAY
+        return max(delay, Config().CDN_HEDGE_MIN_DELAY)
+
 
 if __name__ == '__main__':
     # Const.IS_TEST = True
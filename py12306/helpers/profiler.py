@@ -0,0 +1,114 @@
+import sys
+import threading
+from contextlib import contextmanager
+from importlib.abc import MetaPathFinder
+from time import perf_counter
+
+
+class ImportTimer(MetaPathFinder):
+    """
+    记录每个模块的导入耗时
+    查找仍交给原有的 finder，只替换 loader 实例上的 exec_module，内置和冻结模块不记录
+    """
+
+    def __init__(self):
+        self.records = {}  # 模块 => [累计耗时, 自身耗时]
+        self.local = threading.local()
+
+    def find_spec(self, fullname, path=None, target=None):
+        spec = None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'): continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec: break
+        if not spec: return None
+        loader = spec.loader
+        if loader is not None and not isinstance(loader, type) and hasattr(loader, 'exec_module'):
+            loader.exec_module = self.wrap(fullname, loader.exec_module)
+        return spec
+
+    def wrap(self, fullname, exec_module):
+        def timed_exec_module(module):
+            stack = self.local.__dict__.setdefault('stack', [])
+            stack.append(0)  # 子模块累计耗时
+            start_at = perf_counter()
+            try:
+                return exec_module(module)
+            finally:
+                elapsed = perf_counter() - start_at
+                children = stack.pop()
+                if stack: stack[-1] += elapsed
+                self.records[fullname] = [elapsed, elapsed - children]
+
+        return timed_exec_module
+
+
+class StartupProfiler:
+    """
+    启动耗时分析 (--profile-startup)
+    统计每个模块的导入耗时以及各部分的初始化耗时，启动完成后输出
+    """
+    timer = None
+    steps = []  # [(名称, 耗时)]
+    started_at = 0
+
+    @classmethod
+    def install(cls):
+        if cls.timer: return
+        cls.started_at = perf_counter()
+        cls.timer = ImportTimer()
+        sys.meta_path.insert(0, cls.timer)
+
+    @classmethod
+    def uninstall(cls):
+        if cls.timer in sys.meta_path:
+            sys.meta_path.remove(cls.timer)
+
+    @classmethod
+    def is_enabled(cls):
+        return cls.timer is not None
+
+    @classmethod
+    @contextmanager
+    def step(cls, name):
+        """
+        记录初始化耗时，未开启时不做任何处理
+        """
+        if not cls.timer:
+            yield
+            return
+        start_at = perf_counter()
+        try:
+            yield
+        finally:
+            cls.steps.append((name, perf_counter() - start_at))
+
+    @classmethod
+    def report(cls, limit=30, file=None):
+        """
+        输出分析结果并停止记录
+        :param limit: 导入耗时输出的模块数
+        """
+        if not cls.timer: return
+        cls.uninstall()
+        file = file or sys.stdout
+        total = perf_counter() - cls.started_at
+        records = cls.timer.records
+
+        packages = {}
+        for name, (_, self_time) in records.items():
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0) + self_time
+
+        print('\n# 启动耗时分析，共 {:.1f} ms，导入 {} 个模块 #'.format(total * 1000, len(records)), file=file)
+        print('\n初始化耗时 (ms)', file=file)
+        for name, elapsed in cls.steps:
+            print('{:>10.1f}  {}'.format(elapsed * 1000, name), file=file)
+        print('\n导入耗时 (按包汇总, ms)', file=file)
+        for package, elapsed in sorted(packages.items(), key=lambda item: -item[1])[:limit]:
+            print('{:>10.1f}  {}'.format(elapsed * 1000, package), file=file)
+        print('\n导入耗时 (前 {} 个模块, ms)'.format(limit), file=file)
+        print('{:>10}  {:>10}  {}'.format('累计', '自身', '模块'), file=file)
+        for name, (elapsed, self_time) in sorted(records.items(), key=lambda item: -item[1][0])[:limit]:
+            print('{:>10.1f}  {:>10.1f}  {}'.format(elapsed * 1000, self_time * 1000, name), file=file)
+        print('', file=file, flush=True)
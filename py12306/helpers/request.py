@@ -1,18 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import *
 
 from py12306.helpers.func import *
-from requests_html import HTMLSession, HTMLResponse
 
 requests.packages.urllib3.disable_warnings()
 
+try:  # 安装了 orjson 或 ujson 时使用更快的解析
+    from orjson import loads as json_loads
+except ImportError:
+    try:
+        from ujson import loads as json_loads
+    except ImportError:
+        json_loads = json.loads
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_12_6) AppleWebKit/603.3.8 (KHTML, like Gecko) Version/10.1.2 Safari/603.3.8'
 
-class Request(HTMLSession):
+
+class Response(requests.Response):
+    """
+    响应，重写 json 方法
+    """
+
+    def json(self, default={}):
+        """
+        重写 json 方法，拦截错误
+        直接解析响应内容，不经过 requests 的编码检测
+        :return:
+        """
+        from py12306.app import Dict
+        try:
+            return Dict(json_loads(self.content))
+        except:
+            return Dict(default)
+
+
+class ResponseAdapter(HTTPAdapter):
+    """
+    创建响应时直接使用 Response，不需要再为每个响应绑定方法
+    """
+
+    def build_response(self, req, resp):
+        response = super().build_response(req, resp)
+        response.__class__ = Response
+        return response
+
+
+class Request(requests.Session):
     """
     请求处理类
     """
 
     # session = {}
+    hedge_executor = None
+    hedge_lock = threading.Lock()
+
+    def __init__(self):
+        from py12306.config import Config
+        super().__init__()
+        self.headers['User-Agent'] = DEFAULT_USER_AGENT
+        # 连接池按 host 区分，CDN 请求每个 IP 都是一个 host
+        adapter = ResponseAdapter(pool_connections=Config().REQUEST_POOL_CONNECTIONS,
+                                  pool_maxsize=Config().REQUEST_POOL_MAXSIZE)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
     def save_to_file(self, url, path):
         response = self.get(url, stream=True)
         with open(path, 'wb') as f:
@@ -20,18 +74,6 @@ class Request(HTMLSession):
                 f.write(chunk)
         return response
 
-    @staticmethod
-    def _handle_response(response, **kwargs) -> HTMLResponse:
-        """
-        扩充 response
-        :param response:
-        :param kwargs:
-        :return:
-        """
-        response = HTMLSession._handle_response(response, **kwargs)
-        expand_class(response, 'json', Request.json)
-        return response
-
     def add_response_hook(self, hook):
         hooks = self.hooks['response']
         if not isinstance(hooks, list):
@@ -40,43 +82,102 @@ class Request(HTMLSession):
         self.hooks['response'] = hooks
         return self
 
-    def json(self, default={}):
-        """
-        重写 json 方法，拦截错误
-        :return:
-        """
-        from py12306.app import Dict
-        try:
-            result = self.old_json()
-            return Dict(result)
-        except:
-            return Dict(default)
-
-    def request(self, *args, **kwargs):  # 拦截所有错误
+    def request(self, method, url, *args, **kwargs):  # 拦截所有错误
         try:
+            from py12306.config import Config
             if not 'timeout' in kwargs:
-                from py12306.config import Config
                 kwargs['timeout'] = Config().TIME_OUT_OF_REQUEST
-            response = super().request(*args, **kwargs)
+            if Config().API_BASE_URL: url = self.rewrite_url(url, Config().API_BASE_URL)
+            response = super().request(method, url, *args, **kwargs)
             return response
         except RequestException as e:
             from py12306.log.common_log import CommonLog
             if e.response:
                 response = e.response
             else:
-                response = HTMLResponse(HTMLSession)
+                response = Response()
                 # response.status_code = 500
-                expand_class(response, 'json', Request.json)
             response.reason = response.reason if response.reason else CommonLog.MESSAGE_RESPONSE_EMPTY_ERROR
             return response
 
-    def cdn_request(self, url: str, cdn=None, method='GET', **kwargs):
-        from py12306.helpers.api import HOST_URL_OF_12306
+    @staticmethod
+    def rewrite_url(url, base_url):
+        """
+        将 12306 地址替换为指定地址，用于连接本地模拟服务
+        """
+        from py12306.helpers.api import BASE_URL_OF_12306
+        if url.startswith(BASE_URL_OF_12306):
+            return base_url.rstrip('/') + url[len(BASE_URL_OF_12306):]
+        return url
+
+    def cdn_request(self, url: str, cdn=None, method='GET', scheduler=None, **kwargs):
+        """
+        :param scheduler: 查询调度，对冲请求需要从中获取查询机会
+        """
+        from py12306.config import Config
         from py12306.helpers.cdn import Cdn
+        if Config().API_BASE_URL:  # 不使用 CDN
+            return self.request(method, url, **kwargs)
         if not cdn: cdn = Cdn.get_cdn()
-        url = url.replace(HOST_URL_OF_12306, cdn)
+        if not cdn:  # 没有可用的 CDN (如全部熔断)，直接请求
+            return self.request(method, url, **kwargs)
+        if Config().CDN_HEDGE_ENABLED:
+            return self.hedged_cdn_request(url, cdn, method, scheduler, **kwargs)
+        return self.send_cdn_request(url, cdn, method, **kwargs)
+
+    def send_cdn_request(self, url: str, cdn, method='GET', **kwargs):
+        from py12306.helpers.api import HOST_URL_OF_12306
+        from py12306.helpers.cdn import Cdn
+        start_at = time.time()
+        response = self.request(method, url.replace(HOST_URL_OF_12306, cdn), headers={'Host': HOST_URL_OF_12306},
+                                verify=False, **kwargs)
+        Cdn.report(cdn, time.time() - start_at, response.status_code == 200)
+        return response
 
-        return self.request(method, url, headers={'Host': HOST_URL_OF_12306}, verify=False, **kwargs)
+    def hedged_cdn_request(self, url: str, cdn, method='GET', scheduler=None, **kwargs):
+        """
+        对冲请求
+        第一个请求在当前线程发出，超过近期 p90 耗时仍未返回或请求失败时，由线程池向另一个 CDN 再发一次请求
+        对冲请求同样受查询调度限制，没有查询机会时不再对冲
+        """
+        from py12306.helpers.cdn import Cdn
+        hedge_at = time.time() + Cdn.get_hedge_delay()
+        primary_done = threading.Event()
+        primary = []
+
+        def send_hedge():
+            primary_done.wait(max(0, hedge_at - time.time()))
+            if primary and primary[0].status_code == 200: return None
+            hedge_cdn = Cdn.get_cdn(exclude=cdn)
+            if not hedge_cdn or (scheduler and not scheduler.try_acquire(cdn=hedge_cdn)): return None
+            return self.send_cdn_request(url, hedge_cdn, method, **kwargs)
+
+        future = self.get_hedge_executor().submit(send_hedge)
+        try:
+            primary.append(self.send_cdn_request(url, cdn, method, **kwargs))
+        finally:
+            primary_done.set()
+        if primary[0].status_code == 200:
+            future.add_done_callback(self.close_future_response)
+            return primary[0]
+        response = future.result()
+        return response if response is not None and response.status_code == 200 else primary[0]
+
+    @classmethod
+    def get_hedge_executor(cls):
+        if not cls.hedge_executor:
+            with cls.hedge_lock:
+                if not cls.hedge_executor:
+                    from py12306.config import Config
+                    cls.hedge_executor = ThreadPoolExecutor(max_workers=Config().CDN_HEDGE_WORKER_NUM)
+        return cls.hedge_executor
+
+    @staticmethod
+    def close_future_response(future):
+        try:
+            future.result().close()
+        except Exception:
+            pass
 
     def dump_cookies(self):
         cookies = []
@@ -1,27 +1,56 @@
-from os import path
+from types import MappingProxyType
 
-from py12306.config import Config
 from py12306.helpers.func import *
+from py12306.helpers.station_cache import StationCache
 
 
 @singleton
 class Station:
+    """
+    车站
+    从二进制缓存加载，按代码、名称查找为常数时间
+    前缀索引在第一次搜索时建立
+    """
     stations = []
-    station_kvs = {}
+    station_rows = []
+    station_kvs = {}  # 名称 => 代码
+    station_by_key = MappingProxyType({})
+    station_by_name = MappingProxyType({})
+    station_prefixes = None  # 名称、拼音、简拼前缀 => 车站列表
+
+    search_limit = 10
 
     def __init__(self):
-        if path.exists(Config().STATION_FILE):
-            result = open(Config().STATION_FILE, encoding='utf-8').read()
-            result = result.lstrip('@').split('@')
-            for i in result:
-                tmp_info = i.split('|')
-                self.stations.append({
-                    'key': tmp_info[2],
-                    'name': tmp_info[1],
-                    'pinyin': tmp_info[3],
-                    'id': tmp_info[5]
-                })
-                self.station_kvs[tmp_info[1]] = tmp_info[2]
+        self.stations = []
+        self.station_rows = StationCache.get().station_rows
+        self.lock = threading.Lock()
+        by_key, by_name = {}, {}
+        for tmp_info in self.station_rows:
+            station = {
+                'key': tmp_info[2],
+                'name': tmp_info[1],
+                'pinyin': tmp_info[3],
+                'id': tmp_info[5]
+            }
+            self.stations.append(station)
+            by_key.setdefault(station['key'], station)
+            by_name.setdefault(station['name'], station)
+        self.station_kvs = {name: station['key'] for name, station in by_name.items()}
+        self.station_by_key = MappingProxyType(by_key)
+        self.station_by_name = MappingProxyType(by_name)
+
+    def get_prefixes(self):
+        if self.station_prefixes is None:
+            with self.lock:
+                if self.station_prefixes is None:
+                    prefixes = {}
+                    for tmp_info, station in zip(self.station_rows, self.stations):
+                        words = {station['name'], station['pinyin'], tmp_info[0], tmp_info[4]}
+                        for prefix in {word[:i] for word in words for i in range(1, len(word) + 1)}:
+                            prefixes.setdefault(prefix.lower(), []).append(station)
+                    self.station_prefixes = MappingProxyType(
+                        {prefix: tuple(items) for prefix, items in prefixes.items()})
+        return self.station_prefixes
 
     @classmethod
     def get_station_by_name(cls, name):
@@ -30,6 +59,8 @@ class Station:
     @classmethod
     def get_station_by(cls, value, field):
         self = cls()
+        if field == 'key': return self.station_by_key.get(value)
+        if field == 'name': return self.station_by_name.get(value)
         for station in self.stations:
             if station.get(field) == value:
                 return station
@@ -44,3 +75,54 @@ class Station:
     def get_station_name_by_key(cls, key):
         return cls.get_station_by(key, 'key').get('name')
 
+    @classmethod
+    def search(cls, keyword, limit=None):
+        """
+        按名称、拼音或简拼前缀搜索车站
+        :param keyword:
+        :param limit:
+        :return:
+        """
+        self = cls()
+        stations = self.get_prefixes().get(str(keyword).strip().lower(), ())
+        return list(stations[:limit or self.search_limit])
+
+    @classmethod
+    def suggest(cls, keyword, limit=None):
+        """
+        搜索相似车站，未找到时逐步缩短关键字
+        :param keyword:
+        :param limit:
+        :return:
+        """
+        keyword = str(keyword).strip()
+        while keyword:
+            stations = cls.search(keyword, limit)
+            if stations: return stations
+            keyword = keyword[:-1]
+        return []
+
+
+@singleton
+class StationSaleTime:
+    """
+    车站起售时间
+    """
+    sale_times = {}  # 车站代码 => 起售时间 (当天的分钟数)，按天缓存查询结果
+    sale_date = 0
+
+    def __init__(self):
+        self.cache = StationCache.get()
+        self.sale_times = {}
+
+    @classmethod
+    def get_sale_minute_by_key(cls, key, default=None):
+        self = cls()
+        today = int(time_now().strftime('%Y%m%d'))
+        if today != self.sale_date:
+            self.sale_times = {}
+            self.sale_date = today
+        if key not in self.sale_times:
+            self.sale_times[key] = self.cache.get_sale_minute(key, today)
+        minute = self.sale_times[key]
+        return default if minute is None else minute
@@ -0,0 +1,182 @@
+import mmap
+import struct
+import sys
+from array import array
+from os import path
+
+from py12306.config import Config
+from py12306.helpers.func import *
+
+
+class StationCache:
+    """
+    车站与起售时间二进制缓存
+    源文件修改时间或大小变化时自动重建，起售时间通过内存映射按车站代码二分查找
+
+    文件结构：
+        头部       标识, 版本, 字节序, 源文件 (修改时间, 大小) * 2, 车站数, 车站数据长度, 起售时间数
+        车站数据   原始字段以 | 分隔，每个车站一行
+        起售时间   开始日期 (uint32) * n, 结束日期 (uint32) * n, 时间 (uint16) * n, 车站代码 (3 字节) * n
+    """
+    MAGIC = b'PY12306S'
+    VERSION = 1
+    HEADER = struct.Struct('<8sHc5x4q3I4x')
+    CODE_SIZE = 3
+    STATION_FIELD_NUM = 6
+    DATE_MAX = 99991231
+
+    instance = None
+
+    station_rows = []
+    sale_num = 0
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        header = self.HEADER.unpack_from(buffer)
+        station_num, station_size, self.sale_num = header[7:]
+        offset = self.HEADER.size
+        self.station_rows = []
+        if station_num:
+            rows = bytes(buffer[offset:offset + station_size]).decode('utf-8').split('\n')
+            self.station_rows = [row.split('|') for row in rows]
+        offset += self.align(station_size)
+
+        view = memoryview(buffer)
+        num = self.sale_num
+        self.sale_start_dates = view[offset:offset + num * 4].cast('I')
+        offset += num * 4
+        self.sale_stop_dates = view[offset:offset + num * 4].cast('I')
+        offset += num * 4
+        self.sale_minutes = view[offset:offset + num * 2].cast('H')
+        offset += num * 2
+        self.sale_code_offset = offset
+
+    @classmethod
+    def get(cls):
+        """
+        获取缓存，进程内只加载一次
+        :return: StationCache
+        """
+        if not cls.instance: cls.instance = cls.load()
+        return cls.instance
+
+    @classmethod
+    def load(cls):
+        """
+        读取缓存文件，不存在或已过期时重建
+        :return: StationCache
+        """
+        cache = cls.open(Config().STATION_CACHE_FILE)
+        if cache: return cache
+        return cls(cls.build())
+
+    @classmethod
+    def open(cls, file):
+        if not path.exists(file): return None
+        try:
+            with open(file, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(buffer) < cls.HEADER.size or cls.HEADER.unpack_from(buffer)[:7] != cls.get_header_prefix():
+            buffer.close()
+            return None
+        return cls(buffer)
+
+    @classmethod
+    def build(cls, file=None):
+        """
+        编译源文件并写入缓存，无法写入时只返回数据
+        :param file:
+        :return: bytes
+        """
+        file = file if file else Config().STATION_CACHE_FILE
+        rows = []
+        if path.exists(Config().STATION_FILE):
+            with open(Config().STATION_FILE, encoding='utf-8') as f:
+                content = f.read().strip().lstrip('@')
+            rows = [row.split('|')[:cls.STATION_FIELD_NUM] for row in content.split('@')] if content else []
+
+        sales = []
+        if path.exists(Config().STATION_SALE_TIME_FILE):
+            with open(Config().STATION_SALE_TIME_FILE, encoding='utf-8') as f:
+                items = json.load(f)
+            for item in items:
+                code = item.get('station_telecode', '')
+                sale_time = item.get('sale_time', '')
+                if len(code.encode()) != cls.CODE_SIZE or len(sale_time) != 4 or not sale_time.isdigit(): continue
+                start_date, stop_date = item.get('start_date', ''), item.get('stop_date', '')
+                sales.append((code, int(sale_time[:2]) * 60 + int(sale_time[2:]),
+                              int(start_date) if start_date.isdigit() else 0,
+                              int(stop_date) if stop_date.isdigit() else cls.DATE_MAX))
+        sales.sort(key=lambda sale: sale[0])  # 同一车站保持原有顺序
+
+        station_data = '\n'.join(['|'.join(row) for row in rows]).encode('utf-8')
+        data = b''.join([
+            cls.HEADER.pack(*cls.get_header_prefix(), len(rows), len(station_data), len(sales)),
+            station_data,
+            b'\0' * (cls.align(len(station_data)) - len(station_data)),
+            array('I', [sale[2] for sale in sales]).tobytes(),
+            array('I', [sale[3] for sale in sales]).tobytes(),
+            array('H', [sale[1] for sale in sales]).tobytes(),
+            ''.join([sale[0] for sale in sales]).encode(),
+        ])
+        try:
+            os.makedirs(path.dirname(file), exist_ok=True)
+            with open(file + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(file + '.tmp', file)
+        except OSError:
+            pass
+        return data
+
+    @classmethod
+    def get_header_prefix(cls):
+        byteorder = b'<' if sys.byteorder == 'little' else b'>'
+        return (cls.MAGIC, cls.VERSION, byteorder) + cls.get_file_signature(
+            Config().STATION_FILE) + cls.get_file_signature(Config().STATION_SALE_TIME_FILE)
+
+    @staticmethod
+    def get_file_signature(file):
+        try:
+            stat = os.stat(file)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return 0, -1
+
+    @staticmethod
+    def align(size):
+        return (size + 3) // 4 * 4
+
+    def get_sale_code(self, index):
+        offset = self.sale_code_offset + index * self.CODE_SIZE
+        return bytes(self.buffer[offset:offset + self.CODE_SIZE])
+
+    def get_sale_minute(self, key, date):
+        """
+        查询车站在指定日期的起售时间
+        :param key: 车站代码
+        :param date: 日期，如 20190101
+        :return: 当天的分钟数，未找到返回 None
+        """
+        code = str(key).encode()
+        low, high = 0, self.sale_num
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_sale_code(middle) < code:
+                low = middle + 1
+            else:
+                high = middle
+        minute = None
+        while low < self.sale_num and self.get_sale_code(low) == code:
+            if self.sale_start_dates[low] <= date <= self.sale_stop_dates[low]:
+                minute = self.sale_minutes[low]
+            low += 1
+        return minute
+
+
+if __name__ == '__main__':
+    data = StationCache.build()
+    cache = StationCache(data)
+    print('{} 车站 {} 个，起售时间 {} 条，共 {} 字节'.format(Config().STATION_CACHE_FILE, len(cache.station_rows),
+                                                  cache.sale_num, len(data)))
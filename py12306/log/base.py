@@ -6,68 +6,108 @@ from contextlib import redirect_stdout
 from py12306.config import Config
 from py12306.helpers.func import *
 
+try:  # python 3.7 以上每个协程单独缓冲
+    from contextvars import ContextVar
+except ImportError:
+    ContextVar = None
+
+
+class LogBuffer:
+    """
+    日志缓冲，每个线程 (支持 contextvars 时为每个协程) 单独保存，互不影响
+    取出时直接换下整个列表，之后的日志写入新的列表
+    协程会复制创建时的上下文，创建协程前应先输出当前的日志
+    """
+
+    def __init__(self, name):
+        if ContextVar:
+            self.var = ContextVar(name, default=None)
+        else:
+            self.local = threading.local()
+
+    def get(self):
+        if ContextVar: return self.var.get()
+        return getattr(self.local, 'lines', None)
+
+    def set(self, lines):
+        if ContextVar:
+            self.var.set(lines)
+        else:
+            self.local.lines = lines
+
+    def append(self, content):
+        lines = self.get()
+        if lines is None:
+            lines = []
+            self.set(lines)
+        lines.append(content)
+
+    def take(self):
+        lines = self.get()
+        if lines: self.set(None)
+        return lines or []
+
 
 class BaseLog:
-    logs = []
-    thread_logs = {}
-    quick_log = []
+    buffer = LogBuffer('BaseLog.logs')
+    quick_buffer = LogBuffer('BaseLog.quick_log')
+    droppable = False
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        每个日志类使用单独的缓冲
+        """
+        super().__init_subclass__(**kwargs)
+        cls.buffer = LogBuffer(cls.__name__ + '.logs')
+        cls.quick_buffer = LogBuffer(cls.__name__ + '.quick_log')
 
     @classmethod
     def add_log(cls, content=''):
         self = cls()
-        # print('添加 Log 主进程{} 进程ID{}'.format(is_main_thread(), current_thread_id()))
-        if is_main_thread():
-            self.logs.append(content)
-        else:
-            tmp_log = self.thread_logs.get(current_thread_id(), [])
-            tmp_log.append(content)
-            self.thread_logs[current_thread_id()] = tmp_log
+        self.buffer.append(content)
         return self
 
     @classmethod
     def flush(cls, sep='\n', end='\n', file=None, exit=False, publish=True):
         from py12306.cluster.cluster import Cluster
         self = cls()
-        logs = self.get_logs()
-        # 输出到文件
-        if file == None and Config().OUT_PUT_LOG_TO_FILE_ENABLED and not Const.IS_TEST:  # TODO 文件无法写入友好提示
-            file = open(Config().OUT_PUT_LOG_TO_FILE_PATH, 'a', encoding='utf-8')
+        is_quick = bool(self.quick_buffer.get())
+        logs = self.take_logs()
+        # 输出到文件，由 LogSink 在单独的线程中写入
+        to_sink = file == None and Config().OUT_PUT_LOG_TO_FILE_ENABLED and not Const.IS_TEST
         if not file: file = None
         # 输出日志到各个节点
-        if publish and self.quick_log and Config().is_cluster_enabled() and Cluster().is_ready:  #
+        if publish and is_quick and Config().is_cluster_enabled() and Cluster().is_ready:  #
             f = io.StringIO()
             with redirect_stdout(f):
                 print(*logs, sep=sep, end='' if end == '\n' else end)
             out = f.getvalue()
             Cluster().publish_log_message(out)
+        elif to_sink:
+            from py12306.log.sink import LogSink
+            priority = LogSink.PRIORITY_LOW if self.droppable and not is_quick else LogSink.PRIORITY_HIGH
+            LogSink().write(sep.join(map(str, logs)) + end, priority)
         else:
             print(*logs, sep=sep, end=end, file=file)
-        self.empty_logs(logs)
-        if exit: sys.exit()
+        if exit: sys.exit()  # 退出时 LogSink 会写入剩余的日志
 
     def get_logs(self):
-        if self.quick_log:
-            logs = self.quick_log
-        else:
-            if is_main_thread():
-                logs = self.logs
-            else:
-                logs = self.thread_logs.get(current_thread_id())
-        return logs
-
-    def empty_logs(self, logs=None):
-        if self.quick_log:
-            self.quick_log = []
-        else:
-            if is_main_thread():
-                self.logs = []
-            else:
-                if logs and self.thread_logs.get(current_thread_id()): del self.thread_logs[current_thread_id()]
+        return self.quick_buffer.get() or self.buffer.get() or []
+
+    def take_logs(self):
+        """
+        取出当前线程待输出的日志，有 quick_log 时只输出 quick_log
+        """
+        return self.quick_buffer.take() or self.buffer.take()
+
+    def empty_logs(self):
+        self.quick_buffer.take()
+        self.buffer.take()
 
     @classmethod
     def add_quick_log(cls, content=''):
         self = cls()
-        self.quick_log.append(content)
+        self.quick_buffer.append(content)
         return self
 
     def notification(self, title, content=''):
@@ -4,11 +4,6 @@ from py12306.helpers.func import *
 
 @singleton
 class ClusterLog(BaseLog):
-    # 这里如果不声明，会出现重复打印，目前不知道什么原因
-    logs = []
-    thread_logs = {}
-    quick_log = []
-
     MESSAGE_JOIN_CLUSTER_SUCCESS = '# 节点 {} 成功加入到集群，当前节点列表 {} #'
 
     MESSAGE_LEFT_CLUSTER = '# 节点 {} 已离开集群，当前节点列表 {} #'
@@ -5,11 +5,6 @@ from py12306.helpers.func import *
 
 @singleton
 class CommonLog(BaseLog):
-    # 这里如果不声明，会出现重复打印，目前不知道什么原因
-    logs = []
-    thread_logs = {}
-    quick_log = []
-
     MESSAGE_12306_IS_CLOSED = '当前时间: {}     |       12306 休息时间，程序将在明天早上 6 点自动运行'
     MESSAGE_RETRY_AUTH_CODE = '{} 秒后重新获取验证码'
 
@@ -56,11 +51,23 @@ class CommonLog(BaseLog):
     MESSAGE_RESPONSE_EMPTY_ERROR = '网络错误'
 
     MESSAGE_CDN_START_TO_CHECK = '正在筛选 {} 个 CDN...'
-    MESSAGE_CDN_START_TO_RECHECK = '正在重新筛选 {} 个 CDN...当前时间 {}\n'
+    MESSAGE_CDN_REVALIDATED = 'CDN 重新检测完成，新增可用 {} 个，失效 {} 个，当前可用 {} 个'
+    MESSAGE_CDN_JOURNAL_RESTORED = '恢复 CDN 检测记录 {} 条'
+    MESSAGE_CDN_CLUSTER_SYNC_FAIL = 'CDN 集群同步失败，稍后重试，错误原因 {}'
+    MESSAGE_CDN_REVALIDATE_FAIL = 'CDN 重新检测失败，错误原因 {}'
+    MESSAGE_CDN_CLUSTER_SYNCED = 'CDN 已从集群同步，新增可用 {} 个，失效 {} 个，当前可用 {} 个'
     MESSAGE_CDN_RESTORE_SUCCESS = 'CDN 恢复成功，上次检测 {}\n'
     MESSAGE_CDN_CHECKED_SUCCESS = '# CDN 检测完成，可用 CDN {} #\n'
+    MESSAGE_CDN_CHECK_PROGRESS = 'CDN 检测进度 {} / {}，可用 {}'
+    MESSAGE_CDN_BREAKER_OPEN = 'CDN {} 请求失败过多，暂停使用 {} 秒'
+    MESSAGE_CDN_BREAKER_CLOSE = 'CDN {} 已恢复使用'
     MESSAGE_CDN_CLOSED = '# CDN 已关闭 #'
 
+    MESSAGE_RECORD_START = '正在记录查询结果到 {}'
+    MESSAGE_REPLAY_START = '正在回放 {}，共 {} 条记录，速度 {} 倍'
+    MESSAGE_REPLAY_FINISHED = '回放已结束'
+    MESSAGE_REPLAY_MISSING = '回放记录中没有该请求'
+
     def __init__(self):
         super().__init__()
         self.init_data()
@@ -94,6 +101,7 @@ class CommonLog(BaseLog):
         disable = '未开启'
         self.add_quick_log('**** 当前配置 ****')
         self.add_quick_log('多线程查询: {}'.format(get_true_false_text(Config().QUERY_JOB_THREAD_ENABLED, enable, disable)))
+        self.add_quick_log('异步查询: {}'.format(get_true_false_text(Config().QUERY_JOB_ASYNC_ENABLED, enable, disable)))
         self.add_quick_log('CDN 状态: {}'.format(get_true_false_text(Config().CDN_ENABLED, enable, disable))).flush()
         self.add_quick_log('通知状态:')
         if Config().NOTIFICATION_BY_VOICE_CODE:
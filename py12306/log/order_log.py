@@ -4,11 +4,6 @@ from py12306.helpers.func import *
 
 @singleton
 class OrderLog(BaseLog):
-    # 这里如果不声明，会出现重复打印，目前不知道什么原因
-    logs = []
-    thread_logs = {}
-    quick_log = []
-
     MESSAGE_REQUEST_INIT_DC_PAGE_FAIL = '请求初始化订单页面失败'
 
     MESSAGE_SUBMIT_ORDER_REQUEST_FAIL = '提交订单失败，错误原因 {} \n'
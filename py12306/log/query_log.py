@@ -12,16 +12,17 @@ from py12306.helpers.func import *
 
 @singleton
 class QueryLog(BaseLog):
-    # 这里如果不声明，会出现重复打印，目前不知道什么原因
-    logs = []
-    thread_logs = {}
-    quick_log = []
+    droppable = True  # 逐条的查询日志写入文件不及时时可以丢弃
 
     data = {
         'query_count': 0,
         'last_time': '',
     }
     data_path = None
+    data_lock = None
+    save_lock = None  # 保证保存按顺序进行
+    unsaved_count = 0  # 未保存的查询次数
+    saved_at = 0
 
     LOG_INIT_JOBS = ''
 
@@ -33,11 +34,16 @@ class QueryLog(BaseLog):
     MESSAGE_JOBS_DID_CHANGED = '任务已更新，正在重新加载...\n'
 
     MESSAGE_SKIP_ORDER = '跳过本次请求，节点 {} 用户 {} 正在处理该订单\n'
+    MESSAGE_SKIP_ORDER_WHEN_REPLAY = '回放模式下不会提交订单\n'
 
     MESSAGE_QUERY_JOB_BEING_DESTROY = '查询任务 {} 已结束\n'
+    MESSAGE_TICKET_ROWS_DROPPED = '余票数据中有 {} / {} 条字段少于 {} 个，已忽略，接口格式可能已变化\n'
+    MESSAGE_QUERY_JOB_ERROR = '查询任务 {} 出现错误 {}，{} 秒后重新启动\n'
 
     MESSAGE_INIT_PASSENGERS_SUCCESS = '初始化乘客成功'
     MESSAGE_CHECK_PASSENGERS = '查询任务 {} 正在验证乘客信息'
+    MESSAGE_STATION_NOT_FOUND = '查询任务 {} 未找到车站 {}，你要找的是不是：{}'
+    MESSAGE_STATION_NOT_FOUND_WITHOUT_SUGGESTION = '查询任务 {} 未找到车站 {}'
 
     MESSAGE_USER_IS_EMPTY_WHEN_DO_ORDER = '未配置自动下单账号，{} 秒后继续查询\n'
     MESSAGE_ORDER_USER_IS_EMPTY = '未找到下单账号，{} 秒后继续查询'
@@ -48,6 +54,8 @@ class QueryLog(BaseLog):
         super().__init__()
         self.data_path = Config().QUERY_DATA_DIR + 'status.json'
         self.cluster = Cluster()
+        self.data_lock = threading.RLock()  # 退出信号可能在持有锁时到达
+        self.save_lock = threading.RLock()
 
     @classmethod
     def init_data(cls):
@@ -78,11 +86,16 @@ class QueryLog(BaseLog):
             return {'query_count': query_count, 'last_time': last_time}
         return False
 
-    def refresh_data_of_cluster(self):
-        return {
-            'query_count': self.cluster.session.incr(Cluster.KEY_QUERY_COUNT),
-            'last_time': self.cluster.session.set(Cluster.KEY_QUERY_LAST_TIME, time_now()),
-        }
+    def save_data_to_cluster(self, count, last_time):
+        """
+        将本节点累计的查询次数一次提交到集群
+        """
+        pipeline = self.cluster.session.pipeline()
+        pipeline.incrby(Cluster.KEY_QUERY_COUNT, count)
+        pipeline.set(Cluster.KEY_QUERY_LAST_TIME, last_time)
+        query_count, _ = pipeline.execute()
+        with self.data_lock:
+            self.data['query_count'] = int(query_count) + self.unsaved_count  # 加上提交期间新增的次数
 
     @classmethod
     def print_init_jobs(cls, jobs):
@@ -102,10 +115,11 @@ class QueryLog(BaseLog):
             self.add_log('坐席：{}'.format('，'.join(job.allow_seats)))
             self.add_log('乘车人：{}'.format('，'.join(job.members)))
             if job.except_train_numbers:
-                train_number_message = '排除 ' + '，'.join(job.allow_train_numbers)
+                train_number_message = '排除 ' + '，'.join(job.except_train_numbers)
             else:
                 train_number_message = '，'.join(job.allow_train_numbers if job.allow_train_numbers else ['不筛选'])
             self.add_log('筛选车次：{}'.format(train_number_message))
+            if job.train_types: self.add_log('车次类型：{}'.format('，'.join(job.train_types)))
             self.add_log('任务名称：{}'.format(job.job_name))
             # 乘车日期：['2019-01-24', '2019-01-25', '2019-01-26', '2019-01-27']
             self.add_log('')
@@ -170,8 +184,8 @@ class QueryLog(BaseLog):
         return self
 
     @classmethod
-    def add_query_time_log(cls, time, is_cdn):
-        return cls().add_log(('*' if is_cdn else '') + '耗时 %.2f' % time)
+    def add_query_time_log(cls, time, is_cdn, is_shared=False):
+        return cls().add_log(('*' if is_cdn else '') + ('共享' if is_shared else '') + '耗时 %.2f' % time)
 
     @classmethod
     def add_stay_log(cls, second):
@@ -188,13 +202,40 @@ class QueryLog(BaseLog):
         return self
 
     def refresh_data(self):
-        if Config.is_cluster_enabled():
-            self.data = {**self.data, **self.refresh_data_of_cluster()}
-        else:
-            self.data['query_count'] += 1
+        """
+        查询次数先在内存中累计，每隔 QUERY_DATA_SAVE_INTERVAL 秒保存一次
+        """
+        with self.data_lock:
+            self.data['query_count'] = int(self.data.get('query_count', 0)) + 1
             self.data['last_time'] = str(datetime.datetime.now())
-            self.save_data()
+            self.unsaved_count += 1
+            if time.time() - self.saved_at < Config().QUERY_DATA_SAVE_INTERVAL: return
+        self.save_data(wait=False)
 
-    def save_data(self):
-        with open(self.data_path, 'w') as file:
-            file.write(json.dumps(self.data))
+    @classmethod
+    def save_data(cls, wait=True):
+        """
+        保存累计的查询次数，程序退出时也会调用
+        保存失败时次数计入下次保存
+        :param wait: 其它线程正在保存时是否等待，不等待时由下次保存一并处理
+        """
+        self = cls()
+        if not self.save_lock.acquire(blocking=wait): return
+        try:
+            with self.data_lock:
+                if not self.unsaved_count: return
+                count, self.unsaved_count = self.unsaved_count, 0
+                self.saved_at = time.time()
+                data = dict(self.data)
+            try:
+                if Config.is_cluster_enabled():
+                    self.save_data_to_cluster(count, data['last_time'])
+                else:
+                    with open(self.data_path, 'w') as file:
+                        file.write(json.dumps(data))
+            except Exception:
+                with self.data_lock:
+                    self.unsaved_count += count
+                raise
+        finally:
+            self.save_lock.release()
@@ -0,0 +1,174 @@
+import atexit
+import os
+from queue import Queue, Empty, Full
+
+from py12306.config import Config
+from py12306.helpers.func import *
+
+
+@singleton
+class LogSink:
+    """
+    日志文件写入
+    日志放入队列后由单独的线程写入，文件只打开一次，按大小或时间刷新到磁盘
+    队列满时丢弃查询日志等低优先级的内容，其它日志等待写入
+    """
+    PRIORITY_LOW = 0
+    PRIORITY_HIGH = 1
+
+    MESSAGE_DROPPED = '[日志写入过慢，已丢弃 {} 条查询日志]\n'
+    MESSAGE_OPEN_FAIL = '日志文件 {} 无法写入，日志将输出到控制台，错误原因 {}'
+
+    queue: Queue = None
+    lock = None
+    is_running = False
+    stopped = None
+
+    file = None
+    path = None
+    failed_path = None  # 无法写入的路径，不再重试
+    size = 0  # 当前文件大小
+    buffered_size = 0  # 未刷新到磁盘的大小
+    flushed_at = 0
+    dropped_num = 0
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.queue = Queue(maxsize=Config().OUT_PUT_LOG_TO_FILE_QUEUE_SIZE)
+
+    def write(self, content, priority=PRIORITY_HIGH):
+        if not self.is_running: self.start()
+        if priority == self.PRIORITY_LOW:
+            try:
+                self.queue.put_nowait(content)
+            except Full:
+                with self.lock:
+                    self.dropped_num += 1
+        else:
+            self.queue.put(content)
+
+    def start(self):
+        with self.lock:
+            if self.is_running: return
+            self.is_running = True
+        atexit.register(self.close)
+        create_thread_and_run(self, 'run', wait=False)
+
+    def close(self, timeout=5):
+        """
+        写入队列中剩余的日志后关闭文件
+        """
+        if not self.is_running: return
+        self.queue.put(None)
+        self.stopped.wait(timeout)
+
+    def run(self):
+        while True:
+            try:
+                content = self.queue.get(timeout=Config().OUT_PUT_LOG_TO_FILE_FLUSH_INTERVAL)
+            except Empty:
+                content = ''
+            if content is None: break
+            try:
+                if content: self.write_content(content)
+                if not content or self.need_flush(): self.flush()  # 空闲时也检查文件是否被移动
+            except OSError as e:
+                self.fail(self.path, e)
+                if content: print(content, end='')
+        try:
+            if self.dropped_num: self.write_content('')
+            self.flush()
+        except OSError:
+            pass
+        self.close_file()
+        with self.lock:
+            self.is_running = False
+        self.stopped.set()
+
+    def write_content(self, content):
+        if not self.file: self.open_file()
+        if self.dropped_num:
+            with self.lock:
+                dropped_num, self.dropped_num = self.dropped_num, 0
+            content = self.MESSAGE_DROPPED.format(dropped_num) + content
+        data = content.encode('utf-8')
+        if self.file:
+            self.file.write(data)
+            self.size += len(data)
+            self.buffered_size += len(data)
+            max_size = Config().OUT_PUT_LOG_TO_FILE_MAX_SIZE
+            if max_size and self.size >= max_size: self.rotate()
+        else:
+            print(content, end='')
+
+    def need_flush(self):
+        if not self.buffered_size: return False
+        return self.buffered_size >= Config().OUT_PUT_LOG_TO_FILE_FLUSH_SIZE or \
+               time.time() - self.flushed_at >= Config().OUT_PUT_LOG_TO_FILE_FLUSH_INTERVAL
+
+    def flush(self):
+        if self.file: self.file.flush()
+        self.buffered_size = 0
+        self.flushed_at = time.time()
+        self.check_file()
+
+    def open_file(self):
+        path = Config().OUT_PUT_LOG_TO_FILE_PATH
+        if path == self.failed_path: return
+        try:
+            dir_name = os.path.dirname(path)
+            if dir_name: os.makedirs(dir_name, exist_ok=True)
+            self.file = open(path, 'ab', buffering=Config().OUT_PUT_LOG_TO_FILE_FLUSH_SIZE)
+            self.path = path
+            self.size = self.file.tell()
+            self.flushed_at = time.time()
+        except OSError as e:
+            self.fail(path, e)
+
+    def fail(self, path, e):
+        self.close_file()
+        self.path = None
+        self.failed_path = path
+        print(self.MESSAGE_OPEN_FAIL.format(path, e))
+
+    def close_file(self):
+        if self.file:
+            try:
+                self.file.close()
+            except OSError:
+                pass
+        self.file = None
+
+    def check_file(self):
+        """
+        配置中的路径改变，或文件被外部移动、删除 (如 logrotate) 时重新打开
+        """
+        if not self.file: return
+        try:
+            reopen = self.path != Config().OUT_PUT_LOG_TO_FILE_PATH or \
+                     os.stat(self.path).st_ino != os.fstat(self.file.fileno()).st_ino
+        except OSError:
+            reopen = True
+        if reopen:
+            self.close_file()
+            self.open_file()
+
+    def rotate(self):
+        """
+        文件超过大小后依次重命名为 .1 .2 ...，保留 OUT_PUT_LOG_TO_FILE_BACKUP_COUNT 个
+        """
+        self.close_file()
+        backup_count = Config().OUT_PUT_LOG_TO_FILE_BACKUP_COUNT
+        try:
+            if backup_count > 0:
+                for i in range(backup_count - 1, 0, -1):
+                    source = '{}.{}'.format(self.path, i)
+                    if os.path.exists(source): os.replace(source, '{}.{}'.format(self.path, i + 1))
+                os.replace(self.path, self.path + '.1')
+            else:
+                os.remove(self.path)
+        except OSError:
+            pass
+        self.open_file()
+        self.buffered_size = 0
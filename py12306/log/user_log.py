@@ -4,11 +4,6 @@ from py12306.helpers.func import *
 
 @singleton
 class UserLog(BaseLog):
-    # 这里如果不声明，会出现重复打印，目前不知道什么原因
-    logs = []
-    thread_logs = {}
-    quick_log = []
-
     MESSAGE_DOWNLAOD_AUTH_CODE_FAIL = '验证码下载失败 错误原因: {} {} 秒后重试'
     MESSAGE_DOWNLAODING_THE_CODE = '正在下载验证码...'
     MESSAGE_CODE_AUTH_FAIL = '验证码验证失败 错误原因: {}'
@@ -2,7 +2,6 @@ import asyncio
 import urllib
 
 # from py12306.config import UserType
-from pyppeteer import launch
 
 from py12306.config import Config
 from py12306.helpers.api import *
@@ -39,6 +38,7 @@ class Browser:
 
     async def __request_init_slide(self, session, html):
         """ 异步获取 """
+        from pyppeteer import launch
         browser = await launch(headless=True, autoClose=True, handleSIGINT=False, handleSIGTERM=False,
                                handleSIGHUP=False)
         page = await browser.newPage()
@@ -93,6 +93,7 @@ class Browser:
 
     async def __request_init_slide2(self, data):
         from random import randint
+        from pyppeteer import launch
         """ 异步获取 """
         try:
             browser = await launch(headless=True, autoClose=True, handleSIGINT=False, handleSIGTERM=False,
@@ -0,0 +1,93 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from py12306.config import Config
+from py12306.helpers.func import *
+from py12306.helpers.request import ResponseAdapter
+from py12306.log.query_log import QueryLog
+
+
+class AsyncEngine:
+    """
+    异步查询
+    所有任务作为协程运行在同一个事件循环中，共享一个线程池与连接池
+    请求仍由 requests 在线程池中阻塞执行，事件循环只负责任务调度与等待间隔，并发请求数受 QUERY_ASYNC_WORKER_NUM 限制
+    """
+    query = None
+    executor = None
+    tasks = {}
+    retry_time = 3
+    max_retry_time = 300  # 任务连续出错时重启间隔翻倍，最长间隔
+    restarts = {}  # 任务 => [连续出错次数, 下次启动时间]
+    started_at = {}
+
+    def __init__(self, query):
+        self.query = query
+        self.tasks = {}
+        self.restarts = {}
+        self.started_at = {}
+        worker_num = Config().QUERY_ASYNC_WORKER_NUM
+        self.executor = ThreadPoolExecutor(max_workers=worker_num)
+        adapter = ResponseAdapter(pool_connections=max(worker_num, Config().REQUEST_POOL_CONNECTIONS),
+                                  pool_maxsize=max(worker_num, Config().REQUEST_POOL_MAXSIZE))
+        self.query.session.mount('https://', adapter)
+        self.query.session.mount('http://', adapter)
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self.start())
+        finally:
+            self.executor.shutdown(wait=False)
+            loop.close()
+
+    async def start(self):
+        while True:
+            self.refresh_tasks()
+            if Const.IS_TEST:
+                await asyncio.gather(*self.tasks.values())
+                return
+            await asyncio.sleep(self.retry_time)
+
+    def refresh_tasks(self):
+        """
+        为新任务创建协程，清理已结束的任务
+        出错的任务按 retry_time 翻倍的间隔重新启动
+        :return:
+        """
+        jobs = {id(job): job for job in self.query.jobs}
+        now = time.time()
+        for key in [key for key, task in self.tasks.items() if task.done() or key not in jobs]:
+            task = self.tasks.pop(key)
+            if not task.done():
+                task.cancel()
+                continue
+            if task.cancelled(): continue
+            exception = task.exception()  # 取出异常，避免事件循环提示 Task exception was never retrieved
+            if not exception:
+                self.restarts.pop(key, None)
+                continue
+            retry_time = self.get_retry_time(key, now)
+            if key in jobs:
+                QueryLog.add_quick_log(
+                    QueryLog.MESSAGE_QUERY_JOB_ERROR.format(jobs[key].job_name, repr(exception), retry_time)).flush()
+        for records in (self.restarts, self.started_at):
+            for key in [key for key in records if key not in jobs]:
+                del records[key]
+        for key, job in jobs.items():
+            if key in self.tasks or not job.is_alive: continue
+            if self.restarts.get(key, [0, 0])[1] > now: continue
+            self.started_at[key] = now
+            self.tasks[key] = asyncio.ensure_future(job.start_async(self.executor))
+
+    def get_retry_time(self, key, now):
+        """
+        记录一次出错并返回重启间隔，上次启动后正常运行超过最长间隔时重新计数
+        """
+        error_num = self.restarts.get(key, [0])[0]
+        if now - self.started_at.get(key, now) > self.max_retry_time: error_num = 0
+        error_num += 1
+        retry_time = min(self.retry_time * 2 ** (error_num - 1), self.max_retry_time)
+        self.restarts[key] = [error_num, now + retry_time]
+        return retry_time
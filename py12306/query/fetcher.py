@@ -0,0 +1,149 @@
+import threading
+
+from py12306.config import Config
+from py12306.helpers.api import LEFT_TICKETS
+from py12306.helpers.func import *
+from py12306.query.parser import TicketParser
+
+
+class RouteFetch:
+    """
+    单次余票请求
+    同一线路、日期的任务共享请求结果以及解析结果
+    """
+    key = None
+    response = None
+    is_cdn = False
+    sent_at = 0
+    fetched_at = 0
+    results = None  # data.result，为空时为 False
+    batch = None
+    digest = None
+
+    def __init__(self, key):
+        self.key = key
+        self.event = threading.Event()
+        self.sent_event = threading.Event()
+        self.lock = threading.Lock()
+
+    def send(self):
+        """
+        已获取查询机会，开始请求
+        """
+        self.sent_at = time.time()
+        self.sent_event.set()
+
+    def done(self, response, is_cdn=False):
+        self.response = response
+        self.is_cdn = is_cdn
+        self.fetched_at = time.time()
+        if not self.sent_event.is_set(): self.send()
+        self.event.set()
+
+    def is_done(self):
+        return self.event.is_set()
+
+    def is_fresh(self, second):
+        return self.is_done() and self.response is not None and time.time() - self.fetched_at <= second
+
+    def wait(self, timeout=None):
+        """
+        等待请求完成
+        超时时间从请求实际发出时开始计算，请求在调度器中排队期间不计时
+        """
+        if timeout is None: return self.event.wait()
+        self.sent_event.wait()
+        return self.event.wait(max(0, self.sent_at + timeout - time.time()))
+
+    def get_digest(self):
+        if self.digest is None:
+            self.digest = hash(self.response.content)
+        return self.digest
+
+    def get_results(self):
+        """
+        解析响应中的 data.result，同一请求只解析一次
+        """
+        if self.results is None:
+            with self.lock:
+                if self.results is None:
+                    results = self.response.json().get('data.result')
+                    self.results = results if results else False
+        return self.results
+
+    def get_batch(self):
+        """
+        解析结果，同一请求只解析一次
+        """
+        if self.batch is None:
+            results = self.get_results()
+            with self.lock:
+                if self.batch is None:
+                    self.batch = TicketParser.parse(results or [])
+        return self.batch
+
+
+class QueryFetcher:
+    """
+    余票请求合并
+    (日期, 出发站, 到达站, 查询地址) 相同的请求在进行中或未过期时直接复用
+    """
+    query = None
+    fetches = {}
+    max_fetch_num = 256  # 超出后清理过期请求
+    wait_margin = 1  # 等待共享请求时在请求超时时间之外多等待的时间
+
+    def __init__(self, query):
+        self.query = query
+        self.fetches = {}
+        self.lock = threading.Lock()
+
+    def fetch(self, date, left_station_code, arrive_station_code, time_out, priority=0):
+        """
+        获取余票，返回 (RouteFetch, 是否为复用结果)
+        只有实际发出请求时才占用调度器的查询机会
+        """
+        key = (date, left_station_code, arrive_station_code, self.query.api_type)
+        fresh_second = Config().QUERY_FETCH_FRESH_SECOND
+        with self.lock:
+            fetch = self.fetches.get(key)
+            if fetch and (not fetch.is_done() or fetch.is_fresh(fresh_second)):
+                is_owner = False
+            else:
+                if len(self.fetches) >= self.max_fetch_num: self.clean_fetches(fresh_second)
+                fetch = self.fetches[key] = RouteFetch(key)
+                is_owner = True
+
+        if not is_owner:
+            fetch.wait(time_out + self.wait_margin)
+            if fetch.response is not None:
+                return fetch, True
+            # 共享请求失败或超时未返回，单独请求
+            fetch = RouteFetch(key)
+        try:
+            self.query.scheduler.acquire(priority)
+            fetch.send()
+            is_cdn, response = self.request(key, time_out)
+        except Exception:
+            fetch.done(None)
+            raise
+        fetch.done(response, is_cdn)
+        return fetch, False
+
+    def request(self, key, time_out):
+        from py12306.helpers.cdn import Cdn
+        date, left_station_code, arrive_station_code, api_type = key
+        url = LEFT_TICKETS.get('url').format(left_date=date, left_station=left_station_code,
+                                             arrive_station=arrive_station_code, type=api_type)
+        if Config.is_cdn_enabled() and Cdn().is_ready:
+            cdn = self.query.scheduler.pick_cdn(Cdn.get_cdn)
+            if cdn:
+                return True, self.query.session.cdn_request(url, cdn=cdn, scheduler=self.query.scheduler,
+                                                            timeout=time_out, allow_redirects=False)
+            # 没有可用的 CDN (如全部熔断)，直接请求
+        return False, self.query.session.get(url, timeout=time_out, allow_redirects=False)
+
+    def clean_fetches(self, fresh_second):
+        for key in [key for key, fetch in self.fetches.items() if
+                    fetch.is_done() and not fetch.is_fresh(fresh_second)]:
+            del self.fetches[key]
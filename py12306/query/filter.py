@@ -0,0 +1,64 @@
+class JobFilter:
+    """
+    任务车次筛选
+    任务初始化时编译筛选条件，对解析结果按列批量筛选
+    """
+    DAY_MINUTES = 24 * 60
+
+    from_minute = 0
+    to_minute = DAY_MINUTES
+    allow_train_numbers = None  # frozenset，已转为大写
+    except_train_numbers = None
+    train_types = None  # 车次前缀，如 ('G', 'D')
+
+    def __init__(self, from_minute=0, to_minute=DAY_MINUTES, allow_train_numbers=None, except_train_numbers=None,
+                 train_types=None):
+        self.from_minute = from_minute
+        self.to_minute = to_minute
+        self.allow_train_numbers = self.compile_set(allow_train_numbers)
+        self.except_train_numbers = self.compile_set(except_train_numbers)
+        self.train_types = tuple(sorted(self.compile_set(train_types))) if train_types else None
+        self.is_number_valid = self.compile_number_filter()
+
+    @staticmethod
+    def compile_set(values):
+        return frozenset(str(value).strip().upper() for value in values) if values else None
+
+    def compile_number_filter(self):
+        """
+        排除车次优先于指定车次，与原有逻辑一致
+        :return: 车次是否有效的判断方法，无需筛选时返回 None
+        """
+        train_types = self.train_types
+        if self.except_train_numbers:
+            numbers = self.except_train_numbers
+            if train_types: return lambda number: number.startswith(train_types) and number not in numbers
+            return lambda number: number not in numbers
+        if self.allow_train_numbers:
+            numbers = self.allow_train_numbers
+            if train_types: return lambda number: number.startswith(train_types) and number in numbers
+            return numbers.__contains__
+        if train_types:
+            return lambda number: number.startswith(train_types)
+        return None
+
+    def is_valid(self, train_number, left_minute):
+        if left_minute < self.from_minute or left_minute > self.to_minute:
+            return False
+        return not self.is_number_valid or self.is_number_valid(train_number)
+
+    def select(self, batch):
+        """
+        筛选有效车次
+        :param batch: TicketBatch
+        :return: 有效车次的下标
+        """
+        from_minute, to_minute = self.from_minute, self.to_minute
+        is_number_valid = self.is_number_valid
+        if from_minute <= 0 and to_minute >= self.DAY_MINUTES:
+            indexes = range(batch.size)
+        else:
+            indexes = [index for index, minute in enumerate(batch.left_minutes) if from_minute <= minute <= to_minute]
+        if not is_number_valid: return list(indexes)
+        numbers = batch.train_number_keys
+        return [index for index in indexes if is_number_valid(numbers[index])]
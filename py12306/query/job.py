@@ -1,16 +1,18 @@
-from datetime import timedelta
+import asyncio
 from datetime import datetime
 
 from py12306.app import app_available_check
 from py12306.cluster.cluster import Cluster
 from py12306.config import Config
-from py12306.helpers.api import LEFT_TICKETS
 from py12306.helpers.station import Station
 from py12306.helpers.type import OrderSeatType, SeatType
 from py12306.log.query_log import QueryLog
 from py12306.helpers.func import *
 from py12306.log.user_log import UserLog
 from py12306.order.order import Order
+from py12306.query.filter import JobFilter
+from py12306.query.parser import TicketParser
+from py12306.query.scheduler import QueryScheduler
 from py12306.user.user import User
 from py12306.helpers.event import Event
 
@@ -29,8 +31,8 @@ class Job:
     arrive_station = ''
     left_station_code = ''
     arrive_station_code = ''
-    from_time = timedelta(hours=0)
-    to_time = timedelta(hours=24)
+    from_minute = 0
+    to_minute = 24 * 60
 
     account_key = 0
     allow_seats = []
@@ -39,12 +41,15 @@ class Job:
     current_order_seat = None
     allow_train_numbers = []
     except_train_numbers = []
+    train_types = []
+    train_filter = None
     members = []
     member_num = 0
     member_num_take = 0  # 最终提交的人数
     passengers = []
     allow_less_member = False
     retry_time = 3
+    priority = 0
 
     interval = {}
     interval_additional = 0
@@ -54,6 +59,10 @@ class Job:
     cluster = None
     ticket_info = {}
     is_cdn = False
+    is_shared = False  # 本次查询是否复用了其它任务的结果
+    response_digests = {}  # (日期, 出发站, 到达站) => 上次结果摘要
+    row_digests = {}  # (日期, 出发站, 到达站) => {车次: 余票摘要}
+    order_try_num = 0
     query_time_out = 3
     INDEX_TICKET_NUM = 11
     INDEX_TRAIN_NUMBER = 3
@@ -87,22 +96,22 @@ class Job:
         self.allow_seats = info.get('seats')
         self.allow_train_numbers = info.get('train_numbers')
         self.except_train_numbers = info.get('except_train_numbers')
+        self.train_types = info.get('train_types')
         self.members = list(map(str, info.get('members')))
         self.member_num = len(self.members)
         self.member_num_take = self.member_num
         self.allow_less_member = bool(info.get('allow_less_member'))
+        self.priority = int(info.get('priority', 0))
         period = info.get('period')
         if isinstance(period, dict):
-            if 'from' in period:
-                parts = period['from'].split(':')
-                if len(parts) == 2:
-                    self.from_time = timedelta(
-                        hours=int(parts[0]), seconds=int(parts[1]))
+            if 'from' in period:  # 格式错误时不限制
+                self.from_minute = TicketParser.decode_minute(period['from'], 0)
             if 'to' in period:
-                parts = period['to'].split(':')
-                if len(parts) == 2:
-                    self.to_time = timedelta(
-                        hours=int(parts[0]), seconds=int(parts[1]))
+                self.to_minute = TicketParser.decode_minute(period['to'], JobFilter.DAY_MINUTES)
+        self.train_filter = JobFilter(self.from_minute, self.to_minute, self.allow_train_numbers,
+                                      self.except_train_numbers, self.train_types)
+        self.response_digests = {}  # 筛选条件可能变化
+        self.row_digests = {}
 
     def update_interval(self):
         self.interval = self.query.interval
@@ -123,10 +132,7 @@ class Job:
             for station in self.stations:
                 self.refresh_station(station)
                 for date in self.left_dates:
-                    self.left_date = date
-                    response = self.query_by_date(date)
-                    self.handle_response(response)
-                    QueryLog.add_query_time_log(time=response.elapsed.total_seconds(), is_cdn=self.is_cdn)
+                    self.query_date(date)
                     if not self.is_alive: return
                     self.safe_stay()
                     if is_main_thread():
@@ -138,6 +144,50 @@ class Job:
                 QueryLog.add_log('\n').flush(sep='\t\t', publish=False)
             if Const.IS_TEST: return
 
+    async def start_async(self, executor):
+        """
+        异步处理单个任务
+        等待间隔在事件循环中完成，请求及下单在共享的线程池中执行
+        :param executor:
+        :return:
+        """
+        loop = asyncio.get_event_loop()
+        while self.is_alive:
+            is_round_start = True
+            for station in self.stations:
+                self.refresh_station(station)
+                for date in self.left_dates:
+                    interval = await loop.run_in_executor(executor, self.query_date_in_worker, date, is_round_start)
+                    is_round_start = False
+                    if not self.is_alive: return
+                    await asyncio.sleep(interval)
+            if Const.IS_TEST: return
+
+    def query_date(self, date):
+        """
+        查询单个日期并处理结果
+        :param date:
+        :return:
+        """
+        self.left_date = date
+        fetch, is_shared = self.query_by_date(date)
+        self.handle_response(fetch)
+        QueryLog.add_query_time_log(time=fetch.response.elapsed.total_seconds(), is_cdn=self.is_cdn,
+                                    is_shared=is_shared)
+
+    def query_date_in_worker(self, date, is_round_start=False):
+        """
+        在线程池中查询单个日期，日志在当前线程输出完毕
+        :return: 下次查询前需要等待的时间
+        """
+        if is_round_start:
+            app_available_check()
+            QueryLog.print_job_start(self.job_name)
+        self.query_date(date)
+        interval = self.get_stay_interval() if self.is_alive else 0
+        QueryLog.add_log('\n').flush(sep='\t\t', publish=False)
+        return interval
+
     def judge_date_legal(self, date):
         date_now = datetime.datetime.now()
         date_query = datetime.datetime.strptime(str(date), "%Y-%m-%d")
@@ -158,58 +208,81 @@ class Job:
     def query_by_date(self, date):
         """
         通过日期进行查询
-        :return:
+        相同线路和日期的任务共享同一次请求
+        :return: (RouteFetch, 是否为复用结果)
         """
         date = self.judge_date_legal(date)
-        from py12306.helpers.cdn import Cdn
         QueryLog.add_log(('\n' if not is_main_thread() else '') + QueryLog.MESSAGE_QUERY_START_BY_DATE.format(date,
                                                                                                               self.left_station,
                                                                                                               self.arrive_station))
-        url = LEFT_TICKETS.get('url').format(left_date=date, left_station=self.left_station_code,
-                                             arrive_station=self.arrive_station_code, type=self.query.api_type)
-        if Config.is_cdn_enabled() and Cdn().is_ready:
-            self.is_cdn = True
-            return self.query.session.cdn_request(url, timeout=self.query_time_out, allow_redirects=False)
-        self.is_cdn = False
-        return self.query.session.get(url, timeout=self.query_time_out, allow_redirects=False)
-
-    def handle_response(self, response):
+        fetch, is_shared = self.query.fetcher.fetch(date, self.left_station_code, self.arrive_station_code,
+                                                    self.query_time_out, priority=self.get_query_priority())
+        self.is_cdn = fetch.is_cdn
+        self.is_shared = is_shared
+        return fetch, is_shared
+
+    def handle_response(self, fetch):
         """
         错误判断
         余票判断
         小黑屋判断
         座位判断
         乘车人判断
-        :param result:
+        :param fetch:
         :return:
         """
-        results = self.get_results(response)
-        if not results:
+        if not self.check_response(fetch.response):
             return False
-        for result in results:
-            self.ticket_info = ticket_info = result.split('|')
-            if not self.is_trains_number_valid():  # 车次是否有效
-                continue
-            QueryLog.add_log(QueryLog.MESSAGE_QUERY_LOG_OF_EVERY_TRAIN.format(self.get_info_of_train_number()))
-            if not self.is_has_ticket(ticket_info):
-                continue
-            allow_seats = self.allow_seats if self.allow_seats else list(
-                Config.SEAT_TYPES.values())  # 未设置 则所有可用 TODO  合法检测
-            self.handle_seats(allow_seats, ticket_info)
+        if not Config().QUERY_RESPONSE_DIFF_ENABLED:
+            return self.handle_batch(fetch.get_batch()) if fetch.get_results() else False
+        key = fetch.key[:3]
+        digest = fetch.get_digest()
+        if self.response_digests.get(key) == digest:  # 结果未变化，按原始内容判断，不需要解析
+            return
+        if not fetch.get_results():
+            return False
+        order_try_num = self.order_try_num
+        self.handle_batch(fetch.get_batch(), self.row_digests.setdefault(key, {}))
+        # 尝试过下单的结果不记录，下次继续处理
+        self.response_digests[key] = digest if order_try_num == self.order_try_num else None
+
+    def handle_batch(self, batch, digests=None):
+        """
+        :param batch:
+        :param digests: 上次的余票摘要，传入时跳过余票未变化的车次
+        :return:
+        """
+        # 未设置 则所有可用 TODO  合法检测
+        # set_seat 按座位名称查找，这里需要的是名称 (keys)，values 为余票数据的下标，传入时查找不到座位
+        allow_seats = self.allow_seats if self.allow_seats else list(Config.SEAT_TYPES.keys())
+        row_digests = batch.get_digests() if digests is not None else None
+        for index in self.train_filter.select(batch):  # 车次是否有效
+            if digests is not None:
+                train_no = batch.train_nos[index]
+                if digests.get(train_no) == row_digests[index]: continue
+            QueryLog.add_log(QueryLog.MESSAGE_QUERY_LOG_OF_EVERY_TRAIN.format(batch.train_numbers[index]))
+            order_try_num = self.order_try_num
+            if self.is_has_ticket(batch, index):
+                self.ticket_info = batch.rows[index]
+                self.handle_seats(allow_seats, batch, index)
+            if digests is not None and order_try_num == self.order_try_num:
+                digests[train_no] = row_digests[index]
             if not self.is_alive: return
 
-    def handle_seats(self, allow_seats, ticket_info):
+    def handle_seats(self, allow_seats, batch, index):
         for seat in allow_seats:  # 检查座位是否有票
             self.set_seat(seat)
-            ticket_of_seat = ticket_info[self.current_seat]
-            if not self.is_has_ticket_by_seat(ticket_of_seat):  # 座位是否有效
+            seat_nums = batch.seats.get(self.current_seat)
+            if seat_nums is None or not self.is_has_ticket_by_seat(seat_nums[index]):  # 座位是否有效
                 continue
+            ticket_num = seat_nums[index]
+            ticket_of_seat = self.ticket_info[self.current_seat]
             QueryLog.print_ticket_seat_available(left_date=self.get_info_of_left_date(),
                                                  train_number=self.get_info_of_train_number(), seat_type=seat,
                                                  rest_num=ticket_of_seat)
-            if not self.is_member_number_valid(ticket_of_seat):  # 乘车人数是否有效
+            if not self.is_member_number_valid(ticket_num):  # 乘车人数是否有效
                 if self.allow_less_member:
-                    self.member_num_take = int(ticket_of_seat)
+                    self.member_num_take = ticket_num
                     QueryLog.print_ticket_num_less_than_specified(ticket_of_seat, self)
                 else:
                     QueryLog.add_quick_log(
@@ -217,9 +290,13 @@ class Job:
                     continue
             if Const.IS_TEST: return
             # 检查完成 开始提交订单
+            self.order_try_num += 1
             QueryLog.print_ticket_available(left_date=self.get_info_of_left_date(),
                                             train_number=self.get_info_of_train_number(),
                                             rest_num=ticket_of_seat)
+            if Config().QUERY_REPLAY_FILE:  # 回放的是记录的数据，不能用来下单
+                QueryLog.add_quick_log(QueryLog.MESSAGE_SKIP_ORDER_WHEN_REPLAY).flush()
+                return
             if User.is_empty():
                 QueryLog.add_quick_log(QueryLog.MESSAGE_USER_IS_EMPTY_WHEN_DO_ORDER.format(self.retry_time))
                 return stay_second(self.retry_time)
@@ -254,43 +331,28 @@ class Job:
         order = Order(user=user, query=self)
         return order.order()
 
-    def get_results(self, response):
+    def check_response(self, response):
         """
-        解析查询返回结果
+        检查请求状态，失败时增加查询间隔
         :param response:
-        :return:
+        :return: 是否成功
         """
         if response.status_code != 200:
             QueryLog.print_query_error(response.reason, response.status_code)
             if self.interval_additional < self.interval_additional_max:
                 self.interval_additional += self.interval.get('min')
-        else:
-            self.interval_additional = 0
-        result = response.json().get('data.result')
-        return result if result else False
-
-    def is_has_ticket(self, ticket_info):
-        return self.get_info_of_ticket_num() == 'Y' and self.get_info_of_order_text() == '预订'
-
-    def is_has_ticket_by_seat(self, seat):
-        return seat != '' and seat != '无' and seat != '*'
-
-    def is_trains_number_valid(self):
-        train_left_time = self.get_info_of_train_left_time()
-        time_parts = train_left_time.split(':')
-        left_time = timedelta(
-            hours=int(time_parts[0]), seconds=int(time_parts[1]))
-        if left_time < self.from_time or left_time > self.to_time:
             return False
-
-        if self.except_train_numbers:
-            return self.get_info_of_train_number().upper() not in map(str.upper, self.except_train_numbers)
-        if self.allow_train_numbers:
-            return self.get_info_of_train_number().upper() in map(str.upper, self.allow_train_numbers)
+        self.interval_additional = 0
         return True
 
-    def is_member_number_valid(self, seat):
-        return seat == '有' or self.member_num <= int(seat)
+    def is_has_ticket(self, batch, index):
+        return batch.can_buys[index]
+
+    def is_has_ticket_by_seat(self, ticket_num):
+        return ticket_num > 0
+
+    def is_member_number_valid(self, ticket_num):
+        return self.member_num <= ticket_num
 
     def destroy(self):
         """
@@ -306,11 +368,30 @@ class Job:
         Query().jobs.pop(index)
 
     def safe_stay(self):
-        origin_interval = get_interval_num(self.interval)
+        stay_second(self.get_stay_interval())
+
+    def get_sale_stage(self):
+        return self.query.scheduler.get_sale_stage(self.left_station_code, self.left_dates)
+
+    def get_query_priority(self):
+        if self.get_sale_stage() == QueryScheduler.SALE_STAGE_BURST:
+            return self.priority + Config().QUERY_SALE_BURST_PRIORITY
+        return self.priority
+
+    def get_stay_interval(self):
+        sale_stage = self.get_sale_stage()
+        if sale_stage == QueryScheduler.SALE_STAGE_IDLE:  # 未起售 降低频率
+            origin_interval = get_interval_num(init_interval_by_number(Config().QUERY_SALE_IDLE_INTERVAL))
+        elif self.query.scheduler.is_enabled() and not self.is_shared:  # 由调度器控制频率，复用结果时没有经过调度器
+            origin_interval = 0
+        elif sale_stage == QueryScheduler.SALE_STAGE_BURST:  # 起售时间窗口内 加快频率
+            origin_interval = get_interval_num(init_interval_by_number(Config().QUERY_SALE_BURST_INTERVAL))
+        else:
+            origin_interval = get_interval_num(self.interval)
         interval = origin_interval + self.interval_additional
         QueryLog.add_stay_log(
             '%s + %s' % (origin_interval, self.interval_additional) if self.interval_additional else origin_interval)
-        stay_second(interval)
+        return interval
 
     def set_passengers(self, passengers):
         UserLog.print_user_passenger_init_success(passengers)
@@ -338,6 +419,24 @@ class Job:
                 self.destroy()
         return True
 
+    def check_stations(self):
+        """
+        验证车站名称，不存在时给出相似的车站
+        :return:
+        """
+        for station in self.stations:
+            for name in (station.get('left'), station.get('arrive')):
+                if Station.get_station_by_name(name): continue
+                suggestions = [item.get('name') for item in Station.suggest(name)]
+                if suggestions:
+                    QueryLog.add_quick_log(
+                        QueryLog.MESSAGE_STATION_NOT_FOUND.format(self.job_name, name, '、'.join(suggestions))).flush()
+                else:
+                    QueryLog.add_quick_log(
+                        QueryLog.MESSAGE_STATION_NOT_FOUND_WITHOUT_SUGGESTION.format(self.job_name, name)).flush()
+                return False
+        return True
+
     def refresh_station(self, station):
         self.left_station = station.get('left')
         self.arrive_station = station.get('arrive')
@@ -0,0 +1,133 @@
+from py12306.helpers.type import SeatType
+from py12306.log.query_log import QueryLog
+
+
+class TicketBatch:
+    """
+    余票查询结果 (按列存储)
+    每一列为一个 list，下标对应同一趟车次
+    """
+    size = 0
+    rows = []  # 原始字段，下单时使用
+    secret_strs = []
+    order_texts = []
+    train_nos = []
+    train_numbers = []
+    train_number_keys = []  # 大写车次，用于筛选
+    left_stations = []
+    arrive_stations = []
+    left_times = []
+    arrive_times = []
+    left_dates = []
+    left_minutes = []  # 出发时间 (分钟)
+    can_buys = []  # 是否可预订
+    seats = {}  # 座位下标 => 余票数量列
+    digests = None  # 余票相关字段的摘要，用于判断是否变化
+
+    def __init__(self):
+        self.rows = []
+        self.secret_strs = []
+        self.order_texts = []
+        self.train_nos = []
+        self.train_numbers = []
+        self.train_number_keys = []
+        self.left_stations = []
+        self.arrive_stations = []
+        self.left_times = []
+        self.arrive_times = []
+        self.left_dates = []
+        self.left_minutes = []
+        self.can_buys = []
+        self.seats = {index: [] for index in TicketParser.SEAT_INDEXES}
+
+    def get_digests(self):
+        if self.digests is None:
+            indexes = TicketParser.DIGEST_INDEXES
+            self.digests = [hash(tuple([row[index] for index in indexes])) for row in self.rows]
+        return self.digests
+
+
+class TicketParser:
+    """
+    余票查询结果解析
+    一次遍历将 data.result 解析为 TicketBatch
+    """
+    INDEX_SECRET_STR = 0
+    INDEX_ORDER_TEXT = 1  # 下单文字
+    INDEX_TRAIN_NO = 2
+    INDEX_TRAIN_NUMBER = 3
+    INDEX_LEFT_STATION = 6  # 4 5 始发 终点
+    INDEX_ARRIVE_STATION = 7
+    INDEX_LEFT_TIME = 8
+    INDEX_ARRIVE_TIME = 9
+    INDEX_TICKET_NUM = 11
+    INDEX_LEFT_DATE = 13
+
+    SEAT_INDEXES = tuple(sorted(set(SeatType.dicts.values())))
+    SEAT_NUM_PLENTY = 999  # 余票为 "有" 时的数量
+
+    ORDER_TEXT_AVAILABLE = '预订'
+
+    # 解析缓存，取值范围有限
+    seat_nums = {'': 0, '无': 0, '*': 0, '有': SEAT_NUM_PLENTY}
+    minutes = {}
+    is_short_row_warned = False  # 字段不足的数据只提示一次
+
+    MIN_FIELD_NUM = max(SEAT_INDEXES) + 1
+    DIGEST_INDEXES = (INDEX_ORDER_TEXT, INDEX_LEFT_TIME, INDEX_TICKET_NUM) + SEAT_INDEXES
+
+    @classmethod
+    def parse(cls, results):
+        batch = TicketBatch()
+        seat_columns = [(index, batch.seats[index]) for index in cls.SEAT_INDEXES]
+        decode_seat_num = cls.decode_seat_num
+        decode_minute = cls.decode_minute
+        short_num = 0
+        for result in results:
+            row = result.split('|')
+            if len(row) < cls.MIN_FIELD_NUM:
+                short_num += 1
+                continue
+            order_text = row[1]
+            batch.rows.append(row)
+            batch.secret_strs.append(row[0])
+            batch.order_texts.append(order_text)
+            batch.train_nos.append(row[2])
+            batch.train_numbers.append(row[3])
+            batch.train_number_keys.append(row[3].upper())
+            batch.left_stations.append(row[6])
+            batch.arrive_stations.append(row[7])
+            batch.left_times.append(row[8])
+            batch.arrive_times.append(row[9])
+            batch.left_dates.append(row[13])
+            batch.left_minutes.append(decode_minute(row[8]))
+            batch.can_buys.append(row[11] == 'Y' and order_text == cls.ORDER_TEXT_AVAILABLE)
+            for index, column in seat_columns:
+                column.append(decode_seat_num(row[index]))
+        batch.size = len(batch.rows)
+        if short_num and not cls.is_short_row_warned:
+            cls.is_short_row_warned = True
+            QueryLog.add_quick_log(
+                QueryLog.MESSAGE_TICKET_ROWS_DROPPED.format(short_num, len(results), cls.MIN_FIELD_NUM)).flush()
+        return batch
+
+    @classmethod
+    def decode_seat_num(cls, value):
+        num = cls.seat_nums.get(value)
+        if num is None:
+            num = int(value) if value.isdigit() else 0
+            cls.seat_nums[value] = num
+        return num
+
+    @classmethod
+    def decode_minute(cls, value, default=0):
+        """
+        将 HH:MM 转为分钟数
+        :param default: 格式错误时返回的值
+        """
+        minute = cls.minutes.get(value)
+        if minute is None:
+            parts = str(value).split(':')
+            if len(parts) != 2 or not parts[0].isdigit() or not parts[1].isdigit(): return default
+            minute = cls.minutes[value] = int(parts[0]) * 60 + int(parts[1])
+        return minute
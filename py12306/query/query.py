@@ -4,8 +4,12 @@ from py12306.cluster.cluster import Cluster
 from py12306.app import app_available_check
 from py12306.helpers.func import *
 from py12306.helpers.request import Request
+from py12306.helpers.station import StationSaleTime
 from py12306.log.query_log import QueryLog
+from py12306.query.engine import AsyncEngine
+from py12306.query.fetcher import QueryFetcher
 from py12306.query.job import Job
+from py12306.query.scheduler import QueryScheduler
 from py12306.helpers.api import API_QUERY_INIT_PAGE, API_GET_BROWSER_DEVICE_ID
 
 
@@ -18,6 +22,8 @@ class Query:
     jobs = []
     query_jobs = []
     session = {}
+    fetcher = None
+    scheduler = None
 
     # 查询间隔
     interval = {}
@@ -29,18 +35,40 @@ class Query:
     api_type = None  # Query api url, Current know value  leftTicket/queryX | leftTicket/queryZ
 
     def __init__(self):
-        self.session = Request()
+        self.session = self.create_session()
+        self.scheduler = QueryScheduler()
+        self.fetcher = QueryFetcher(self)
         # self.request_device_id()
         self.cluster = Cluster()
         self.update_query_interval()
         self.update_query_jobs()
+        if Config().QUERY_SALE_BURST_ENABLED:  # 提前加载起售时间
+            StationSaleTime()
         self.get_query_api_type()
 
+    def create_session(self):
+        """
+        设置了回放文件时使用回放数据，不访问网络
+        :return:
+        """
+        if Config().QUERY_REPLAY_FILE:
+            from py12306.helpers.capture import ReplaySession
+            session = ReplaySession(Config().QUERY_REPLAY_FILE, Config().QUERY_REPLAY_SPEED)
+        else:
+            session = Request()
+        if Config().QUERY_RECORD_FILE:
+            from py12306.helpers.capture import CaptureWriter
+            session.add_response_hook(CaptureWriter.get().query_hook)
+        return session
+
     def update_query_interval(self, auto=False):
         self.interval = init_interval_by_number(Config().QUERY_INTERVAL)
         if auto:
             jobs_do(self.jobs, 'update_interval')
 
+    def update_query_scheduler(self, auto=False):
+        self.scheduler.update_config(auto=auto)
+
     def update_query_jobs(self, auto=False):
         self.query_jobs = Config().QUERY_JOBS
         if auto:
@@ -60,12 +88,16 @@ class Query:
     def check_before_run(cls):
         self = cls()
         self.init_jobs()
+        for job in list(self.jobs):  # 车站错误时只退出该任务，其它任务继续运行
+            if not job.check_stations(): job.destroy()
         self.is_ready = True
 
     def start(self):
         # return # DEBUG
         QueryLog.init_data()
         stay_second(3)
+        if Config().QUERY_JOB_ASYNC_ENABLED:  # 异步
+            return AsyncEngine(self).run()
         # 多线程
         while True:
             if Config().QUERY_JOB_THREAD_ENABLED:  # 多线程
@@ -100,7 +132,10 @@ class Query:
             job_ins = objects_find_object_by_key_value(self.jobs, 'id', id)  # [1 ,2]
             if not job_ins:
                 job_ins = self.init_job(job)
-                if Config().QUERY_JOB_THREAD_ENABLED:  # 多线程重新添加
+                if not job_ins.check_stations():
+                    job_ins.destroy()
+                    continue
+                if Config().QUERY_JOB_THREAD_ENABLED and not Config().QUERY_JOB_ASYNC_ENABLED:  # 多线程重新添加
                     create_thread_and_run(jobs=job_ins, callback_name='run', wait=Const.IS_TEST)
             allow_jobs.append(job_ins)
 
@@ -0,0 +1,203 @@
+import heapq
+import itertools
+import threading
+
+from py12306.config import Config
+from py12306.helpers.func import *
+
+
+class TokenBucket:
+    """
+    令牌桶
+    非线程安全，由 QueryScheduler 加锁调用
+    """
+    rate = 0
+    capacity = 1
+    tokens = 0
+    updated_at = 0
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity else max(1, rate))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now):
+        if now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+    def wait_time(self, now):
+        self.refill(now)
+        if self.tokens >= 1: return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+
+class QueryScheduler:
+    """
+    查询调度
+    全局 / 接口 / CDN 三级令牌桶，按优先级分配查询机会，相同优先级先到先得
+    """
+    ENDPOINT_LEFT_TICKET = 'left_ticket'
+
+    SALE_STAGE_BURST = 'burst'  # 起售时间窗口内
+    SALE_STAGE_IDLE = 'idle'  # 未起售
+    SALE_STAGE_NORMAL = 'normal'
+
+    max_qps = 0
+    endpoint_max_qps = {}
+    cdn_max_qps = 0
+    cdn_pick_num = 3  # 选取 CDN 时最多尝试次数
+
+    global_bucket = None
+    endpoint_buckets = {}
+    cdn_buckets = {}
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.waiters = []
+        self.counter = itertools.count()
+        self.init_config()
+
+    def init_config(self):
+        with self.lock:
+            self.max_qps = float(Config().QUERY_MAX_QPS or 0)
+            self.endpoint_max_qps = dict(Config().QUERY_ENDPOINT_MAX_QPS or {})
+            self.cdn_max_qps = float(Config().QUERY_CDN_MAX_QPS or 0)
+            self.global_bucket = TokenBucket(self.max_qps) if self.max_qps > 0 else None
+            self.endpoint_buckets = {key: TokenBucket(qps) for key, qps in self.endpoint_max_qps.items() if qps}
+            self.cdn_buckets = {}
+            self.condition.notify_all()
+
+    def update_config(self, auto=False):
+        if auto: self.init_config()
+
+    def is_enabled(self):
+        return self.global_bucket is not None or bool(self.endpoint_buckets)
+
+    def acquire(self, priority=0, endpoint=ENDPOINT_LEFT_TICKET):
+        """
+        获取一次查询机会，未获取到时阻塞
+        :param priority: 数值越大越优先
+        :param endpoint:
+        :return:
+        """
+        if not self.is_enabled(): return True
+        with self.condition:
+            ticket = [-priority, next(self.counter)]
+            heapq.heappush(self.waiters, ticket)
+            while True:
+                if self.waiters[0] is ticket:
+                    wait = self.get_wait_time(endpoint)
+                    if not wait:
+                        self.consume(endpoint)
+                        heapq.heappop(self.waiters)
+                        self.condition.notify_all()
+                        return True
+                    self.condition.wait(wait)
+                else:
+                    self.condition.wait()
+
+    def try_acquire(self, endpoint=ENDPOINT_LEFT_TICKET, cdn=None):
+        """
+        获取一次查询机会，不阻塞，用于对冲等可以放弃的请求
+        有其它请求在排队或任一令牌桶 (全局 / 接口 / CDN) 没有令牌时返回 False
+        """
+        with self.lock:
+            if self.waiters: return False
+            if self.get_wait_time(endpoint): return False
+            cdn_bucket = self.get_cdn_bucket(cdn) if self.cdn_max_qps and cdn else None
+            if cdn_bucket and cdn_bucket.wait_time(time.monotonic()): return False
+            self.consume(endpoint)
+            if cdn_bucket: cdn_bucket.consume()
+            return True
+
+    def get_sale_stage(self, station_code, dates):
+        """
+        根据出发站起售时间判断任务所处阶段
+        任一日期处于起售窗口内为 burst，全部日期未起售为 idle
+        :param station_code:
+        :param dates:
+        :return:
+        """
+        if not Config().QUERY_SALE_BURST_ENABLED: return self.SALE_STAGE_NORMAL
+        from py12306.helpers.station import StationSaleTime
+        sale_minute = StationSaleTime.get_sale_minute_by_key(station_code)
+        if sale_minute is None: return self.SALE_STAGE_NORMAL
+        window = Config().QUERY_SALE_BURST_WINDOW
+        before = datetime.timedelta(seconds=window.get('before', 0))
+        after = datetime.timedelta(seconds=window.get('after', 0))
+        presale = datetime.timedelta(days=Config().QUERY_SALE_PRESALE_DAYS - 1)
+        now = time_now()
+        stage = self.SALE_STAGE_IDLE
+        for date in dates:
+            try:
+                sale_at = datetime.datetime.strptime(str(date), '%Y-%m-%d') - presale + datetime.timedelta(
+                    minutes=sale_minute)
+            except ValueError:
+                return self.SALE_STAGE_NORMAL
+            if sale_at - before <= now <= sale_at + after: return self.SALE_STAGE_BURST
+            if now > sale_at + after: stage = self.SALE_STAGE_NORMAL
+        return stage
+
+    def get_wait_time(self, endpoint):
+        now = time.monotonic()
+        wait = 0
+        for bucket in (self.global_bucket, self.endpoint_buckets.get(endpoint)):
+            if bucket: wait = max(wait, bucket.wait_time(now))
+        return wait
+
+    def consume(self, endpoint):
+        for bucket in (self.global_bucket, self.endpoint_buckets.get(endpoint)):
+            if bucket: bucket.consume()
+
+    def get_cdn_bucket(self, cdn):
+        bucket = self.cdn_buckets.get(cdn)
+        if not bucket:
+            bucket = self.cdn_buckets[cdn] = TokenBucket(self.cdn_max_qps)
+        return bucket
+
+    def try_acquire_cdn(self, cdn):
+        """
+        CDN 是否还有查询机会，不阻塞
+        """
+        if not self.cdn_max_qps or not cdn: return True
+        with self.lock:
+            bucket = self.get_cdn_bucket(cdn)
+            if bucket.wait_time(time.monotonic()): return False
+            bucket.consume()
+            return True
+
+    def get_cdn_wait_time(self, cdn):
+        if not self.cdn_max_qps or not cdn: return 0
+        with self.lock:
+            return self.get_cdn_bucket(cdn).wait_time(time.monotonic())
+
+    def acquire_cdn(self, cdn):
+        """
+        获取 CDN 的查询机会，未获取到时阻塞
+        """
+        while not self.try_acquire_cdn(cdn):
+            time.sleep(max(self.get_cdn_wait_time(cdn), 0.01))
+        return True
+
+    def pick_cdn(self, get_cdn):
+        """
+        选取仍有查询机会的 CDN
+        尝试的 CDN 都没有查询机会时，等待其中最快恢复的一个
+        :param get_cdn: 获取候选 CDN 的方法
+        :return: 没有可用的 CDN (如全部熔断) 时返回 None
+        """
+        tried = []
+        for i in range(self.cdn_pick_num):
+            cdn = get_cdn()
+            if not cdn: return None
+            if self.try_acquire_cdn(cdn): return cdn
+            tried.append(cdn)
+        cdn = min(tried, key=self.get_cdn_wait_time)
+        self.acquire_cdn(cdn)
+        return cdn
@@ -54,6 +54,9 @@ class UserJob:
     def init_data(self, info):
         self.session = Request()
         self.session.add_response_hook(self.response_login_check)
+        if Config().QUERY_RECORD_FILE and Config().QUERY_RECORD_ORDER_ENABLED:
+            from py12306.helpers.capture import CaptureWriter
+            self.session.add_response_hook(CaptureWriter.get().hook)
         self.key = str(info.get('key'))
         self.user_name = info.get('user_name')
         self.password = info.get('password')
@@ -3,6 +3,7 @@ from flask.json import jsonify
 from flask_jwt_extended import (jwt_required)
 
 from py12306.config import Config
+from py12306.helpers.station import Station
 from py12306.query.job import Job
 from py12306.query.query import Query
 
@@ -21,6 +22,18 @@ def query_lists():
     return jsonify(result)
 
 
+@query.route('/query/stations', methods=['GET'])
+@jwt_required
+def search_stations():
+    """
+    搜索车站，支持名称、拼音、简拼前缀
+    :return:
+    """
+    keyword = request.args.get('keyword', '')
+    result = Station.search(keyword) if keyword else []
+    return jsonify(result)
+
+
 def convert_job_to_info(job: Job):
     return {
         'name': job.job_name,
@@ -31,6 +44,7 @@ def convert_job_to_info(job: Job):
         'allow_seats': job.allow_seats,
         'allow_train_numbers': job.allow_train_numbers,
         'except_train_numbers': job.except_train_numbers,
+        'train_types': job.train_types,
         'allow_less_member': job.allow_less_member,
         'passengers': job.passengers,
     }
@@ -0,0 +1,67 @@
+import sys
+from os import path
+
+import pytest
+
+PROJECT_DIR = path.dirname(path.dirname(path.abspath(__file__)))
+if PROJECT_DIR not in sys.path: sys.path.insert(0, PROJECT_DIR)
+
+from py12306.config import Config
+
+Config.CONFIG_FILE = path.join(PROJECT_DIR, 'env.py.example')  # 测试使用默认配置
+
+
+@pytest.fixture
+def config(monkeypatch):
+    """
+    修改配置，测试结束后恢复
+    """
+
+    def set_config(**items):
+        for name, value in items.items():
+            monkeypatch.setattr(Config(), name, value)
+        return Config()
+
+    return set_config
+
+
+@pytest.fixture
+def cdn(monkeypatch):
+    """
+    独立的 Cdn 实例，不启动监控线程，测试结束后恢复单例
+    """
+    from py12306.helpers import cdn as cdn_module
+    monkeypatch.setattr(cdn_module, 'create_thread_and_run', lambda *args, **kwargs: None)
+    instance = cdn_module.Cdn.__new_original__(cdn_module.Cdn)
+    instance.__init_original__()
+    monkeypatch.setattr(cdn_module.Cdn, '__it__', instance, raising=False)
+    return instance
+
+
+class FakeQuery:
+    """
+    任务只需要查询间隔与查询地址，不创建 Query 以免访问网络
+    """
+    api_type = 'leftTicket/query'
+
+    def __init__(self):
+        from py12306.helpers.func import init_interval_by_number
+        self.interval = init_interval_by_number(1)
+
+
+@pytest.fixture
+def job(monkeypatch):
+    """
+    查询任务，有票时不下单
+    """
+    from py12306.helpers.func import Const
+    from py12306.query.job import Job
+    monkeypatch.setattr(Const, 'IS_TEST', True)
+    return Job({
+        'job_name': 'test',
+        'account_key': 0,
+        'left_dates': ['2026-10-21'],
+        'stations': {'left': '北京', 'arrive': '上海'},
+        'members': ['张三'],
+        'seats': ['二等座'],
+    }, FakeQuery())
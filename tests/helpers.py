@@ -0,0 +1,28 @@
+import json
+
+from py12306.query.parser import TicketParser
+
+
+def make_row(train_number='G1', left_time='08:00', seats=None, can_buy='Y', order_text='预订'):
+    row = [''] * TicketParser.MIN_FIELD_NUM
+    row[0], row[1], row[2], row[3] = 'secret', order_text, '240000' + train_number, train_number
+    row[6], row[7], row[8], row[9] = 'VNP', 'AOH', left_time, '12:00'
+    row[11], row[13] = can_buy, '20261021'
+    for index, value in (seats or {}).items():
+        row[index] = value
+    return '|'.join(row)
+
+
+def make_content(results):
+    return json.dumps({'httpstatus': 200, 'data': {'result': results, 'flag': '1'}, 'status': True},
+                      ensure_ascii=False).encode('utf-8')
+
+
+def make_response(content, status_code=200):
+    from py12306.helpers.request import Response
+    response = Response()
+    response.status_code = status_code
+    response.reason = 'OK' if status_code == 200 else 'Error'
+    response.url = 'https://kyfw.12306.cn/otn/leftTicket/query'
+    response._content = content
+    return response
@@ -0,0 +1,86 @@
+from py12306.helpers.breaker import CircuitBreaker
+
+
+def create_breaker(**kwargs):
+    options = {'failure_num': 3, 'error_rate': 0.5, 'window_num': 10, 'open_second': 30}
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+
+def expire(breaker):
+    breaker.opened_at -= breaker.open_second
+    breaker.trial_at -= breaker.open_second
+
+
+def test_opens_after_consecutive_failures():
+    breaker = create_breaker()
+    assert not breaker.record(False)
+    assert not breaker.record(False)
+    assert breaker.record(False)
+    assert breaker.state == CircuitBreaker.STATE_OPEN
+    assert breaker.is_open()
+    assert not breaker.is_available()
+    assert not breaker.allow()
+
+
+def test_success_resets_consecutive_failures():
+    breaker = create_breaker()
+    for is_success in (False, False, True, False, False):
+        assert not breaker.record(is_success)
+    assert breaker.state == CircuitBreaker.STATE_CLOSED
+
+
+def test_opens_when_error_rate_exceeded():
+    breaker = create_breaker(failure_num=100, window_num=4)
+    for is_success in (True, False, True):
+        assert not breaker.record(is_success)
+    assert breaker.record(False)  # 窗口满 4 次，错误率 50%
+    assert breaker.state == CircuitBreaker.STATE_OPEN
+
+
+def test_error_rate_needs_full_window():
+    breaker = create_breaker(failure_num=100, window_num=4)
+    assert not breaker.record(False)
+    assert breaker.state == CircuitBreaker.STATE_CLOSED
+
+
+def test_half_open_allows_one_trial():
+    breaker = create_breaker(failure_num=1)
+    breaker.record(False)
+    expire(breaker)
+    assert breaker.is_available()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.STATE_HALF_OPEN
+    assert not breaker.allow()
+    assert not breaker.is_available()
+
+
+def test_half_open_trial_timeout_allows_another():
+    breaker = create_breaker(failure_num=1)
+    breaker.record(False)
+    expire(breaker)
+    assert breaker.allow()
+    expire(breaker)
+    assert breaker.allow()
+
+
+def test_trial_success_closes():
+    breaker = create_breaker(failure_num=1)
+    breaker.record(False)
+    expire(breaker)
+    breaker.allow()
+    assert breaker.record(True)
+    assert breaker.state == CircuitBreaker.STATE_CLOSED
+    assert breaker.consecutive_failures == 0
+    assert not breaker.results
+    assert breaker.allow()
+
+
+def test_trial_failure_reopens():
+    breaker = create_breaker(failure_num=1)
+    breaker.record(False)
+    expire(breaker)
+    breaker.allow()
+    assert breaker.record(False)
+    assert breaker.state == CircuitBreaker.STATE_OPEN
+    assert not breaker.allow()
@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+from py12306.helpers.capture import Capture, CaptureFrame, CaptureReader, CaptureWriter
+
+
+def write_frames(file, num, start=0):
+    writer = CaptureWriter(file)
+    for i in range(start, start + num):
+        writer.write(CaptureFrame(1000 + i, 'GET', 'https://1.2.3.4/otn/leftTicket/query?i={}'.format(i), 200, 'OK',
+                                  0.1, 'content {}'.format(i).encode()))
+    writer.capture.close()
+    writer.index.close()
+
+
+def read_contents(file):
+    reader = CaptureReader(file)
+    try:
+        return [frame.content.decode() for frame in reader]
+    finally:
+        reader.capture.close()
+
+
+@pytest.fixture
+def capture_file(tmp_path):
+    return str(tmp_path / 'query.capture')
+
+
+def test_write_and_read(capture_file):
+    write_frames(capture_file, 3)
+    reader = CaptureReader(capture_file)
+    frames = list(reader)
+    reader.capture.close()
+    assert len(reader) == 3
+    assert [frame.timestamp for frame in frames] == [1000, 1001, 1002]
+    assert frames[1].url.endswith('?i=1')
+    assert frames[1].content == b'content 1'
+    assert (frames[1].status_code, frames[1].reason, frames[1].elapsed) == (200, 'OK', 0.1)
+
+
+def test_valid_index_is_used(capture_file, monkeypatch):
+    write_frames(capture_file, 3)
+
+    def scan_indexes(self, size):
+        raise AssertionError('index should be used')
+
+    monkeypatch.setattr(CaptureReader, 'scan_indexes', scan_indexes)
+    assert read_contents(capture_file) == ['content 0', 'content 1', 'content 2']
+
+
+def test_missing_index_is_rebuilt(capture_file):
+    write_frames(capture_file, 3)
+    os.remove(Capture.get_index_file(capture_file))
+    assert read_contents(capture_file) == ['content 0', 'content 1', 'content 2']
+
+
+def test_empty_index_is_rebuilt(capture_file):
+    write_frames(capture_file, 3)
+    open(Capture.get_index_file(capture_file), 'wb').close()
+    assert read_contents(capture_file) == ['content 0', 'content 1', 'content 2']
+
+
+def test_stale_index_is_rebuilt(capture_file):
+    write_frames(capture_file, 2)
+    index_file = Capture.get_index_file(capture_file)
+    with open(index_file, 'rb') as f:
+        index = f.read()
+    write_frames(capture_file, 2, start=2)
+    with open(index_file, 'wb') as f:  # 索引只写到了前两条
+        f.write(index)
+    assert read_contents(capture_file) == ['content 0', 'content 1', 'content 2', 'content 3']
+
+
+def test_partial_index_record_is_ignored(capture_file):
+    write_frames(capture_file, 2)
+    with open(Capture.get_index_file(capture_file), 'ab') as f:
+        f.write(b'\0' * (Capture.INDEX_RECORD.size - 1))
+    assert read_contents(capture_file) == ['content 0', 'content 1']
+
+
+def test_truncated_frame_is_ignored(capture_file):
+    write_frames(capture_file, 3)
+    size = os.path.getsize(capture_file)
+    with open(capture_file, 'r+b') as f:
+        f.truncate(size - 3)
+    assert read_contents(capture_file) == ['content 0', 'content 1']
+
+
+def test_append_to_existing_capture(capture_file):
+    write_frames(capture_file, 2)
+    write_frames(capture_file, 1, start=2)
+    reader = CaptureReader(capture_file)
+    reader.capture.close()
+    assert len(reader) == 3
+    assert reader.seek(1001) == 1
+    assert reader.seek(1001.5) == 2
+
+
+def test_invalid_file_is_rejected(capture_file):
+    with open(capture_file, 'wb') as f:
+        f.write(b'\0' * Capture.HEADER.size)
+    with pytest.raises(ValueError):
+        CaptureReader(capture_file)
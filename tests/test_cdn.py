@@ -0,0 +1,291 @@
+import json
+import threading
+import time
+
+import pytest
+
+from py12306.helpers.api import HOST_URL_OF_12306, LEFT_TICKETS
+from py12306.helpers.cdn import Cdn, CdnStat
+from py12306.helpers.request import Request, Response
+from py12306.query.fetcher import QueryFetcher
+from py12306.query.scheduler import QueryScheduler
+
+ITEMS = ['1.1.1.{}'.format(i) for i in range(12)]
+
+
+def make_ready(cdn):
+    cdn.available_items = list(ITEMS)
+    cdn.is_ready = True
+
+
+def open_all_breakers(cdn):
+    for item in ITEMS:
+        breaker = cdn.get_breaker(item)
+        while not breaker.is_open(): breaker.record(False)
+
+
+def test_get_cdn_skips_open_breakers(cdn):
+    make_ready(cdn)
+    open_all_breakers(cdn)
+    cdn.get_breaker(ITEMS[0]).reset()
+    picked = {Cdn.get_cdn() for i in range(50)}  # 随机抽样，可能抽不到未熔断的
+    assert ITEMS[0] in picked and picked <= {ITEMS[0], None}
+
+
+def test_get_cdn_returns_none_when_all_breakers_open(cdn):
+    make_ready(cdn)
+    open_all_breakers(cdn)
+    assert Cdn.get_cdn() is None
+
+
+def test_pick_cdn_passes_none_through(cdn, config):
+    config(QUERY_CDN_MAX_QPS=1)
+    make_ready(cdn)
+    open_all_breakers(cdn)
+    assert QueryScheduler().pick_cdn(Cdn.get_cdn) is None
+
+
+def test_cdn_request_without_cdn_requests_directly(cdn, config, monkeypatch):
+    config(API_BASE_URL='', CDN_HEDGE_ENABLED=0)
+    make_ready(cdn)
+    open_all_breakers(cdn)
+    urls = []
+
+    def request(self, method, url, **kwargs):
+        urls.append(url)
+        return Response()
+
+    monkeypatch.setattr(Request, 'request', request)
+    Request().cdn_request('https://{}/otn/leftTicket/query'.format(HOST_URL_OF_12306))
+    assert urls == ['https://{}/otn/leftTicket/query'.format(HOST_URL_OF_12306)]
+
+
+class FakeSession:
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, **kwargs):
+        self.requests.append(('get', url))
+        return Response()
+
+    def cdn_request(self, url, cdn=None, **kwargs):
+        self.requests.append(('cdn', cdn))
+        return Response()
+
+
+class FakeQuery:
+    api_type = 'query'
+
+    def __init__(self):
+        self.session = FakeSession()
+        self.scheduler = QueryScheduler()
+
+
+def test_fetcher_falls_back_to_direct_request_when_all_breakers_open(cdn, config):
+    config(CDN_ENABLED=1, QUERY_CDN_MAX_QPS=0)
+    make_ready(cdn)
+    open_all_breakers(cdn)
+    query = FakeQuery()
+    fetch, is_shared = QueryFetcher(query).fetch('2026-10-21', 'BJP', 'SHH', 3)
+    assert not fetch.is_cdn
+    assert query.session.requests == [('get', LEFT_TICKETS.get('url').format(
+        left_date='2026-10-21', left_station='BJP', arrive_station='SHH', type='query'))]
+
+
+def test_fetcher_uses_cdn_when_available(cdn, config):
+    config(CDN_ENABLED=1, QUERY_CDN_MAX_QPS=0)
+    make_ready(cdn)
+    query = FakeQuery()
+    fetch, _ = QueryFetcher(query).fetch('2026-10-21', 'BJP', 'SHH', 3)
+    assert fetch.is_cdn
+    assert query.session.requests[0][0] == 'cdn' and query.session.requests[0][1] in ITEMS
+
+
+def make_status_response(status_code):
+    response = Response()
+    response.status_code = status_code
+    return response
+
+
+def patch_send_cdn_request(monkeypatch, delays, status_codes=None):
+    """
+    按 CDN 指定耗时与状态码，记录请求的 CDN 与线程
+    """
+    sent = []
+
+    def send_cdn_request(self, url, cdn, method='GET', **kwargs):
+        sent.append((cdn, threading.current_thread()))
+        time.sleep(delays.get(cdn, 0))
+        return make_status_response((status_codes or {}).get(cdn, 200))
+
+    monkeypatch.setattr(Request, 'send_cdn_request', send_cdn_request)
+    return sent
+
+
+def test_hedge_primary_is_sent_on_calling_thread(cdn, config, monkeypatch):
+    config(API_BASE_URL='', CDN_HEDGE_ENABLED=1, CDN_HEDGE_DELAY=0.2)
+    make_ready(cdn)
+    sent = patch_send_cdn_request(monkeypatch, {})
+    response = Request().cdn_request('https://{}/otn/leftTicket/query'.format(HOST_URL_OF_12306), ITEMS[0])
+    time.sleep(0.3)
+    assert response.status_code == 200
+    assert sent == [(ITEMS[0], threading.current_thread())]
+
+
+def test_hedge_is_sent_when_primary_is_slow(cdn, config, monkeypatch):
+    config(API_BASE_URL='', CDN_HEDGE_ENABLED=1, CDN_HEDGE_DELAY=0.05)
+    make_ready(cdn)
+    sent = patch_send_cdn_request(monkeypatch, {ITEMS[0]: 0.2})
+    response = Request().cdn_request('https://{}/otn/leftTicket/query'.format(HOST_URL_OF_12306), ITEMS[0])
+    assert response.status_code == 200
+    assert len(sent) == 2
+    assert sent[1][0] != ITEMS[0] and sent[1][1] is not threading.current_thread()
+
+
+def test_hedge_result_is_used_when_primary_fails(cdn, config, monkeypatch):
+    config(API_BASE_URL='', CDN_HEDGE_ENABLED=1, CDN_HEDGE_DELAY=1)
+    make_ready(cdn)
+    sent = patch_send_cdn_request(monkeypatch, {}, {ITEMS[0]: 502})
+    start_at = time.time()
+    response = Request().cdn_request('https://{}/otn/leftTicket/query'.format(HOST_URL_OF_12306), ITEMS[0])
+    assert response.status_code == 200
+    assert len(sent) == 2 and time.time() - start_at < 1  # 失败后立即对冲，不等待对冲延迟
+
+
+def test_hedge_executor_size_from_config(config, monkeypatch):
+    config(CDN_HEDGE_WORKER_NUM=3)
+    monkeypatch.setattr(Request, 'hedge_executor', None)
+    assert Request.get_hedge_executor()._max_workers == 3
+
+
+def test_hedge_delay_refreshes_every_refresh_num_samples(cdn, monkeypatch):
+    refreshes = []
+    refresh_hedge_delay = Cdn.refresh_hedge_delay
+
+    def counted(self):
+        refreshes.append(True)
+        refresh_hedge_delay(self)
+
+    monkeypatch.setattr(Cdn, 'refresh_hedge_delay', counted)
+    for i in range(cdn.latency_sample_num): Cdn.report(ITEMS[0], 0.1, True)
+    del refreshes[:]
+    for i in range(cdn.hedge_refresh_num * 3): Cdn.report(ITEMS[0], 0.1, True)  # 样本队列已满
+    assert len(refreshes) == 3
+
+
+class BrokenPipeline:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def execute(self):
+        raise ConnectionError('redis down')
+
+
+class BrokenSession:
+    def pipeline(self):
+        return BrokenPipeline()
+
+
+class BrokenCluster:
+    node_name = 'node'
+    session = BrokenSession()
+
+
+def test_publish_failure_keeps_pending_data(cdn):
+    cdn.cluster = BrokenCluster()
+    cdn.cluster_health = {ITEMS[0]: '[1]'}
+    cdn.cluster_stat_items = {ITEMS[1]}
+    assert not cdn.try_sync_with_cluster(cdn.publish_to_cluster)
+    assert cdn.cluster_health == {ITEMS[0]: '[1]'}
+    assert cdn.cluster_stat_items == {ITEMS[1]}
+
+
+class WatchStopped(Exception):
+    pass
+
+
+def test_watch_cdn_keeps_running_after_errors(cdn, config, monkeypatch):
+    from py12306.helpers import cdn as cdn_module
+    from py12306.config import Config
+    monkeypatch.setattr(Config, 'is_cluster_enabled', staticmethod(lambda: True))
+    config(CDN_CLUSTER_SHARD_ENABLED=1)  # 所有节点都负责检测
+    calls = {'sync': 0, 'revalidate': 0, 'tick': 0}
+
+    def fail(name):
+        def call(*args):
+            calls[name] += 1
+            raise ConnectionError('redis down')
+
+        return call
+
+    def stay_second(second):
+        calls['tick'] += 1
+        cdn.cluster_synced_at = 0
+        if calls['tick'] >= 3: raise WatchStopped()
+
+    monkeypatch.setattr(cdn, 'sync_with_cluster', fail('sync'))
+    monkeypatch.setattr(cdn, 'revalidate', fail('revalidate'))
+    monkeypatch.setattr(cdn_module, 'stay_second', stay_second)
+    cdn.is_finished, cdn.revalidate_rate = True, 1
+    try:
+        cdn.watch_cdn()
+    except WatchStopped:
+        pass
+    assert calls == {'sync': 3, 'revalidate': 3, 'tick': 3}
+
+
+class FakeCluster:
+    def __init__(self, session, node_name):
+        self.session = session
+        self.node_name = node_name
+
+
+@pytest.fixture
+def cluster_nodes(cdn, config, tmp_path):
+    """
+    共用同一个 Redis 的两个节点
+    """
+    fakeredis = pytest.importorskip('fakeredis')
+    config(CDN_JOURNAL_FILE=str(tmp_path / 'available.journal'))
+    session = fakeredis.FakeRedis(decode_responses=True)
+    other = Cdn.__new_original__(Cdn)
+    other.__init_original__()
+    cdn.cluster, other.cluster = FakeCluster(session, 'master'), FakeCluster(session, 'slave')
+    return cdn, other
+
+
+def publish_health(node, item, is_available, checked_at):
+    node.cluster_health[item] = json.dumps([int(is_available)] + CdnStat(item, checked_at=checked_at).to_list())
+    node.publish_to_cluster()
+
+
+def test_cluster_sync_reads_updates_in_write_order(cluster_nodes):
+    master, slave = cluster_nodes
+    publish_health(master, ITEMS[0], True, 100)
+    slave.sync_from_cluster()  # 首次全量同步
+    assert slave.available_items == [ITEMS[0]]
+    publish_health(master, ITEMS[1], True, 50)  # 检测时间早于已同步的记录，仍按写入顺序读到
+    publish_health(master, ITEMS[0], False, 200)
+    slave.sync_from_cluster()
+    assert slave.available_items == [ITEMS[1]] and slave.unavailable_items == [ITEMS[0]]
+
+
+def test_cluster_sync_reads_all_when_updates_are_trimmed(cluster_nodes):
+    master, slave = cluster_nodes
+    publish_health(master, ITEMS[0], True, 100)
+    publish_health(master, ITEMS[1], True, 100)
+    slave.cluster_synced_id = '1-0'  # 已读位置之后的记录已被裁剪
+    slave.sync_from_cluster()
+    assert sorted(slave.available_items) == ITEMS[:2]
+
+
+def test_cluster_sync_merges_stats_from_other_nodes(cluster_nodes):
+    master, slave = cluster_nodes
+    slave.sync_stats_from_cluster()
+    master.get_stat(ITEMS[0]).update(0.2, True)
+    master.cluster_stat_items.add(ITEMS[0])
+    master.publish_to_cluster()
+    slave.sync_stats_from_cluster()
+    master.sync_stats_from_cluster()  # 忽略本节点发布的数据
+    assert slave.get_stat(ITEMS[0]).latency == 0.2
+    assert master.get_stat(ITEMS[0]).latency == 0.2
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from py12306.helpers.cdn import CdnStat
+
+
+@pytest.fixture
+def files(cdn, config, tmp_path):
+    config(CDN_ENABLED_AVAILABLE_ITEM_FILE=str(tmp_path / 'available.json'),
+           CDN_JOURNAL_FILE=str(tmp_path / 'available.journal'))
+    return tmp_path / 'available.json', tmp_path / 'available.journal'
+
+
+def test_restore_replays_journal_after_snapshot(cdn, files):
+    snapshot, journal = files
+    snapshot.write_text(json.dumps({'items': ['a', 'b'], 'fail_items': ['c'], 'last_check_at': '2026-10-18 08:00:00.000001',
+                                    'stats': {'a': CdnStat('a', latency=0.1).to_list()}}))
+    journal.write_text('\n'.join([
+        json.dumps(['b', 0, CdnStat('b', checked_at=10).to_list()]),
+        json.dumps(['c', 1, CdnStat('c', checked_at=20).to_list()]),
+        '["d", 1, [0.1',  # 程序中断时写入不完整的记录
+    ]))
+    assert cdn.restore_items()
+    assert sorted(cdn.available_items) == ['a', 'c'] and cdn.unavailable_items == ['b']
+    assert cdn.get_stat('a').latency == 0.1 and cdn.get_stat('c').checked_at == 20
+    assert cdn.journal_num == 2
+
+
+def test_restore_from_journal_only(cdn, files):
+    _, journal = files
+    journal.write_text(json.dumps(['a', 1, CdnStat('a').to_list()]) + '\n')
+    assert cdn.restore_items()
+    assert cdn.available_items == ['a']
+
+
+def test_restore_without_data(cdn, files):
+    assert not cdn.restore_items()
+    assert cdn.available_items == [] and cdn.unavailable_items == []
+
+
+def test_journal_is_compacted_into_snapshot(cdn, files):
+    snapshot, journal = files
+    cdn.journal_compact_num = 2
+    cdn.available_items = ['a']
+    cdn.append_journal('a', True, cdn.get_stat('a'))
+    assert not cdn.is_compact_needed()
+    cdn.append_journal('b', False, cdn.get_stat('b'))
+    cdn.unavailable_items = ['b']
+    assert cdn.is_compact_needed()
+    cdn.save_available_items()
+    assert journal.read_text() == '' and cdn.journal_num == 0
+    data = json.loads(snapshot.read_text())
+    assert data['items'] == ['a'] and data['fail_items'] == ['b'] and set(data['stats']) == {'a', 'b'}
+    cdn.journal.close()
+
+    restored = type(cdn).__new_original__(type(cdn))
+    restored.__init_original__()
+    assert restored.restore_items()
+    assert restored.available_items == ['a'] and restored.unavailable_items == ['b']
@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import pytest
+
+from py12306.helpers.cdn import CdnStat
+
+ITEMS = ['1.1.1.{}'.format(i) for i in range(6)]
+
+
+@pytest.fixture
+def revalidating(cdn, config, tmp_path, monkeypatch):
+    """
+    所有 cdn 检测完成，检测结果写入临时目录
+    """
+    config(CDN_JOURNAL_FILE=str(tmp_path / 'available.journal'))
+    cdn.items = list(ITEMS)
+    cdn.available_items = list(ITEMS)
+    cdn.is_finished = cdn.is_ready = True
+    cdn.safe_stay_time = 0
+    now = time.time()
+    for index, item in enumerate(ITEMS):  # 越靠前越早过期，后两个未过期
+        stat = cdn.get_stat(item)
+        stat.checked_at = now - 100 + index
+        stat.ttl = 10 * (index + 1) if index < 4 else 1000
+    return cdn
+
+
+def patch_status_codes(monkeypatch, cdn, status_codes):
+    async def request_status_code(item):
+        return status_codes.get(item, 200)
+
+    monkeypatch.setattr(cdn, 'request_status_code', request_status_code)
+
+
+def test_ttl_is_shortened_by_error_rate(cdn):
+    cdn.revalidate_ttl, cdn.ttl_jitter = 1000, 0
+    assert cdn.get_ttl(CdnStat('a'), True) == 1000
+    assert cdn.get_ttl(CdnStat('a', error_rate=0.4), True) == pytest.approx(600)
+    assert cdn.get_ttl(CdnStat('a', error_rate=1), True) == pytest.approx(1000 * cdn.min_ttl_ratio)
+    assert cdn.get_ttl(CdnStat('a', error_rate=1), False) == 1000  # 不可用的按完整有效期
+
+
+def test_ttl_jitter(cdn):
+    cdn.revalidate_ttl = 1000
+    ttls = [cdn.get_ttl(CdnStat('a'), True) for i in range(50)]
+    assert all(900 <= ttl <= 1100 for ttl in ttls) and len(set(ttls)) > 1
+
+
+def test_expired_items_earliest_first(revalidating):
+    assert revalidating.get_expired_items(3) == ITEMS[:3]
+    assert revalidating.get_expired_items(10) == ITEMS[:4]
+
+
+def test_revalidate_updates_items_and_ttl(revalidating, monkeypatch):
+    patch_status_codes(monkeypatch, revalidating, {ITEMS[1]: 502})
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(revalidating.revalidate_items(ITEMS[:2]))
+    finally:
+        loop.close()
+    assert ITEMS[1] not in revalidating.available_items and revalidating.unavailable_items == [ITEMS[1]]
+    assert revalidating.get_stat(ITEMS[0]).get_expire_at() > time.time()
+    assert revalidating.get_expired_items(10) == ITEMS[2:4]
+
+
+def test_revalidate_rate(revalidating, monkeypatch):
+    patch_status_codes(monkeypatch, revalidating, {})
+    revalidating.revalidate_rate = 0.5  # 每两秒检测一个
+    loop = asyncio.new_event_loop()
+    try:
+        revalidating.revalidate(loop)
+        assert len(revalidating.get_expired_items(10)) == 4
+        revalidating.revalidate(loop)
+        assert revalidating.get_expired_items(10) == ITEMS[1:4]
+    finally:
+        loop.close()
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from py12306.helpers.request import Request
+from py12306.query.engine import AsyncEngine
+
+
+class FakeJob:
+    def __init__(self, job_name, error=None):
+        self.job_name = job_name
+        self.error = error
+        self.is_alive = True
+        self.start_num = 0
+
+    async def start_async(self, executor):
+        self.start_num += 1
+        if self.error: raise self.error
+        await asyncio.sleep(10)
+
+
+class FakeQuery:
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.session = Request()
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def engine(config):
+    config(QUERY_ASYNC_WORKER_NUM=2)
+    engine = AsyncEngine(FakeQuery([]))
+    yield engine
+    for task in engine.tasks.values(): task.cancel()
+    engine.executor.shutdown(wait=False)
+
+
+def refresh(loop, engine):
+    async def run():
+        engine.refresh_tasks()
+        await asyncio.sleep(0)
+
+    loop.run_until_complete(run())
+
+
+def test_new_jobs_are_started(loop, engine):
+    jobs = [FakeJob('a'), FakeJob('b')]
+    engine.query.jobs = jobs
+    refresh(loop, engine)
+    assert set(engine.tasks) == {id(job) for job in jobs}
+    refresh(loop, engine)
+    assert [job.start_num for job in jobs] == [1, 1]
+
+
+def test_removed_jobs_are_cancelled(loop, engine):
+    job = FakeJob('a')
+    engine.query.jobs = [job]
+    refresh(loop, engine)
+    task = engine.tasks[id(job)]
+    engine.query.jobs = []
+    refresh(loop, engine)
+    assert not engine.tasks and task.cancelled()
+
+
+def test_stopped_jobs_are_not_started(loop, engine):
+    job = FakeJob('a')
+    job.is_alive = False
+    engine.query.jobs = [job]
+    refresh(loop, engine)
+    assert not engine.tasks and job.start_num == 0
+
+
+def test_failed_job_waits_before_restart(loop, engine):
+    job = FakeJob('a', RuntimeError('boom'))
+    engine.query.jobs = [job]
+    refresh(loop, engine)  # 启动后立即出错
+    refresh(loop, engine)  # 记录出错，等待重启
+    assert job.start_num == 1 and id(job) not in engine.tasks
+    assert engine.restarts[id(job)][0] == 1
+    engine.restarts[id(job)][1] = 0  # 重启时间已到
+    refresh(loop, engine)
+    assert job.start_num == 2
+
+
+def test_retry_time_doubles_and_is_capped(engine):
+    key, now = 1, 1000
+    engine.started_at[key] = now
+    retry_times = [engine.get_retry_time(key, now) for i in range(9)]
+    assert retry_times[:4] == [3, 6, 12, 24]
+    assert retry_times[-1] == engine.max_retry_time
+
+
+def test_retry_time_resets_after_running_long_enough(engine):
+    key, now = 1, 1000
+    engine.started_at[key] = now
+    engine.get_retry_time(key, now)
+    engine.get_retry_time(key, now)
+    assert engine.get_retry_time(key, now + engine.max_retry_time + 1) == engine.retry_time
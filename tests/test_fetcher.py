@@ -0,0 +1,207 @@
+import threading
+import time
+
+import pytest
+
+from py12306.helpers.request import Response
+from py12306.query.fetcher import QueryFetcher, RouteFetch
+from py12306.query.parser import TicketParser
+
+from helpers import make_content, make_response, make_row
+
+KEY = ('2026-10-21', 'VNP', 'AOH', 'leftTicket/query')
+
+
+def count_calls(monkeypatch, cls, name):
+    calls = []
+    method = getattr(cls, name)
+
+    def counted(*args, **kwargs):
+        calls.append(args)
+        return method(*args, **kwargs)
+
+    monkeypatch.setattr(cls, name, counted)
+    return calls
+
+
+def test_route_fetch_decodes_and_parses_once(monkeypatch):
+    json_calls = count_calls(monkeypatch, Response, 'json')
+    parse_calls = count_calls(monkeypatch, TicketParser, 'parse')
+    fetch = RouteFetch(KEY)
+    fetch.done(make_response(make_content([make_row('G1'), make_row('G2')])))
+    threads = [threading.Thread(target=fetch.get_batch) for i in range(8)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert len(fetch.get_results()) == 2
+    assert fetch.get_batch().train_numbers == ['G1', 'G2']
+    assert len(json_calls) == 1
+    assert len(parse_calls) == 1
+
+
+def test_route_fetch_empty_results():
+    fetch = RouteFetch(KEY)
+    fetch.done(make_response(b'{"data": {"result": []}}'))
+    assert fetch.get_results() is False
+    assert fetch.get_batch().size == 0
+
+
+def test_jobs_share_decoded_results(job, monkeypatch):
+    json_calls = count_calls(monkeypatch, Response, 'json')
+    fetch = RouteFetch(KEY)
+    fetch.done(make_response(make_content([make_row('G1')])))
+    job.handle_response(fetch)
+    job.handle_response(fetch)  # 其它任务复用同一请求
+    assert len(json_calls) == 1
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.released = threading.Event()
+        self.released.set()
+
+    def acquire(self, priority=0):
+        self.released.wait()
+        return True
+
+
+class FakeSession:
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        time.sleep(self.delay)
+        return make_response(make_content([make_row()]))
+
+
+class FakeQuery:
+    api_type = 'leftTicket/query'
+
+    def __init__(self, delay=0):
+        self.session = FakeSession(delay)
+        self.scheduler = FakeScheduler()
+
+
+def fetch_in_thread(fetcher, results, time_out=0.05):
+    def run():
+        results.append(fetcher.fetch(*KEY[:3], time_out))
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_for_owner(fetcher):
+    while not fetcher.fetches: time.sleep(0.001)
+
+
+@pytest.fixture
+def fetcher(config, monkeypatch):
+    config(CDN_ENABLED=0, QUERY_FETCH_FRESH_SECOND=0)
+    monkeypatch.setattr(QueryFetcher, 'wait_margin', 0)
+
+    def create(delay=0):
+        return QueryFetcher(FakeQuery(delay))
+
+    return create
+
+
+def test_concurrent_fetches_are_coalesced(fetcher):
+    query_fetcher = fetcher(delay=0.05)
+    results = []
+    threads = [fetch_in_thread(query_fetcher, results, time_out=1)]
+    wait_for_owner(query_fetcher)
+    threads += [fetch_in_thread(query_fetcher, results, time_out=1) for i in range(3)]
+    for thread in threads: thread.join()
+    assert len(query_fetcher.query.session.urls) == 1
+    assert sorted(is_shared for _, is_shared in results) == [False, True, True, True]
+    assert len({id(fetch) for fetch, _ in results}) == 1
+
+
+def test_different_routes_are_not_coalesced(fetcher):
+    query_fetcher = fetcher(delay=0.05)
+    results = []
+    threads = [fetch_in_thread(query_fetcher, results, time_out=1)]
+    wait_for_owner(query_fetcher)
+    results_other = []
+
+    def run():
+        results_other.append(query_fetcher.fetch(KEY[0], KEY[1], 'SHH', 1))
+
+    threads.append(threading.Thread(target=run))
+    threads[-1].start()
+    for thread in threads: thread.join()
+    assert len(query_fetcher.query.session.urls) == 2
+    assert results[0][0] is not results_other[0][0] and not results_other[0][1]
+
+
+def test_fresh_result_is_reused(fetcher, config):
+    config(QUERY_FETCH_FRESH_SECOND=60)
+    query_fetcher = fetcher()
+    first, _ = query_fetcher.fetch(*KEY[:3], 1)
+    second, is_shared = query_fetcher.fetch(*KEY[:3], 1)
+    assert second is first and is_shared
+    assert len(query_fetcher.query.session.urls) == 1
+
+
+def test_done_result_is_not_reused_without_fresh_second(fetcher):
+    query_fetcher = fetcher()
+    query_fetcher.fetch(*KEY[:3], 1)
+    _, is_shared = query_fetcher.fetch(*KEY[:3], 1)
+    assert not is_shared
+    assert len(query_fetcher.query.session.urls) == 2
+
+
+def test_waiter_timeout_starts_when_owner_sends(fetcher):
+    query_fetcher = fetcher(delay=0.02)
+    query_fetcher.query.scheduler.released.clear()  # 查询机会排队中
+    results = []
+    threads = [fetch_in_thread(query_fetcher, results)]
+    wait_for_owner(query_fetcher)
+    threads.append(fetch_in_thread(query_fetcher, results))
+    time.sleep(0.2)  # 超过等待时间
+    query_fetcher.query.scheduler.released.set()
+    for thread in threads: thread.join()
+    assert len(query_fetcher.query.session.urls) == 1
+    assert sorted(is_shared for _, is_shared in results) == [False, True]
+
+
+def test_waiter_falls_back_when_owner_request_is_slow(fetcher):
+    query_fetcher = fetcher(delay=0.3)
+    results = []
+    threads = [fetch_in_thread(query_fetcher, results)]
+    wait_for_owner(query_fetcher)
+    threads.append(fetch_in_thread(query_fetcher, results))
+    for thread in threads: thread.join()
+    assert len(query_fetcher.query.session.urls) == 2
+    assert [is_shared for _, is_shared in results] == [False, False]
+
+
+def test_waiter_falls_back_when_owner_fails(fetcher, monkeypatch):
+    query_fetcher = fetcher()
+    query_fetcher.query.scheduler.released.clear()
+    results = []
+    failed = []
+
+    def owner():
+        try:
+            query_fetcher.fetch(*KEY[:3], 1)
+        except RuntimeError:
+            failed.append(True)
+
+    def request(key, time_out):
+        if not failed and threading.current_thread() is owner_thread: raise RuntimeError('boom')
+        return False, make_response(make_content([make_row()]))
+
+    monkeypatch.setattr(query_fetcher, 'request', request)
+    owner_thread = threading.Thread(target=owner)
+    owner_thread.start()
+    wait_for_owner(query_fetcher)
+    waiter = fetch_in_thread(query_fetcher, results, time_out=1)
+    time.sleep(0.02)
+    query_fetcher.query.scheduler.released.set()
+    owner_thread.join()
+    waiter.join()
+    assert failed
+    assert results[0][1] is False and results[0][0].response is not None
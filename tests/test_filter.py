@@ -0,0 +1,52 @@
+from py12306.query.filter import JobFilter
+from py12306.query.parser import TicketBatch
+
+
+def make_batch(trains):
+    batch = TicketBatch()
+    for number, minute in trains:
+        batch.train_number_keys.append(number)
+        batch.left_minutes.append(minute)
+    batch.size = len(trains)
+    return batch
+
+
+BATCH = make_batch([('G1', 6 * 60), ('D2', 9 * 60), ('K3', 12 * 60), ('G4', 20 * 60)])
+
+
+def test_no_conditions_selects_all():
+    train_filter = JobFilter()
+    assert train_filter.is_number_valid is None
+    assert train_filter.select(BATCH) == [0, 1, 2, 3]
+
+
+def test_period_is_inclusive():
+    assert JobFilter(9 * 60, 12 * 60).select(BATCH) == [1, 2]
+    assert JobFilter(9 * 60 + 1, 20 * 60 - 1).select(BATCH) == [2]
+
+
+def test_allow_train_numbers_ignore_case_and_spaces():
+    assert JobFilter(allow_train_numbers=['g1', ' K3 ']).select(BATCH) == [0, 2]
+
+
+def test_except_train_numbers_take_precedence():
+    train_filter = JobFilter(allow_train_numbers=['G1', 'D2'], except_train_numbers=['d2'])
+    assert train_filter.select(BATCH) == [0, 2, 3]
+
+
+def test_train_types():
+    assert JobFilter(train_types=['g']).select(BATCH) == [0, 3]
+    assert JobFilter(train_types=['G', 'D'], allow_train_numbers=['G1', 'K3']).select(BATCH) == [0]
+    assert JobFilter(train_types=['G'], except_train_numbers=['G4']).select(BATCH) == [0]
+
+
+def test_period_and_numbers_combined():
+    assert JobFilter(8 * 60, 24 * 60, train_types=['G']).select(BATCH) == [3]
+
+
+def test_is_valid_matches_select():
+    train_filter = JobFilter(9 * 60, 20 * 60, except_train_numbers=['K3'])
+    selected = train_filter.select(BATCH)
+    expected = [index for index in range(BATCH.size) if
+                train_filter.is_valid(BATCH.train_number_keys[index], BATCH.left_minutes[index])]
+    assert selected == expected == [1, 3]
@@ -0,0 +1,62 @@
+import pytest
+
+from py12306.helpers.request import Response
+from py12306.helpers.type import SeatType
+from py12306.query.fetcher import RouteFetch
+
+from helpers import make_content, make_response, make_row
+
+SEAT = SeatType.dicts['二等座']
+
+
+@pytest.fixture
+def json_calls(monkeypatch):
+    calls = []
+    json = Response.json
+
+    def counted_json(self, *args, **kwargs):
+        calls.append(self)
+        return json(self, *args, **kwargs)
+
+    monkeypatch.setattr(Response, 'json', counted_json)
+    return calls
+
+
+def make_fetch(content, status_code=200):
+    fetch = RouteFetch(('2026-10-21', 'VNP', 'AOH', 'leftTicket/query'))
+    fetch.done(make_response(content, status_code))
+    return fetch
+
+
+def test_unchanged_response_is_not_decoded(job, config, json_calls):
+    config(QUERY_RESPONSE_DIFF_ENABLED=1)
+    content = make_content([make_row('G1', seats={SEAT: '无'})])
+    job.handle_response(make_fetch(content))
+    assert len(json_calls) == 1
+    job.handle_response(make_fetch(content))
+    assert len(json_calls) == 1
+
+
+def test_changed_response_is_decoded(job, config, json_calls):
+    config(QUERY_RESPONSE_DIFF_ENABLED=1)
+    job.handle_response(make_fetch(make_content([make_row('G1', seats={SEAT: '无'})])))
+    job.handle_response(make_fetch(make_content([make_row('G1', seats={SEAT: '5'})])))
+    assert len(json_calls) == 2
+
+
+def test_response_with_tickets_is_handled_again(job, config, json_calls, monkeypatch):
+    config(QUERY_RESPONSE_DIFF_ENABLED=1)
+    monkeypatch.setattr(type(job), 'handle_seats', lambda self, *args: setattr(self, 'order_try_num', 1))
+    content = make_content([make_row('G1', seats={SEAT: '5'})])
+    job.handle_response(make_fetch(content))
+    job.order_try_num = 0
+    job.handle_response(make_fetch(content))  # 尝试过下单的结果不记录
+    assert len(json_calls) == 2
+
+
+def test_failed_response_is_not_decoded(job, json_calls):
+    assert job.handle_response(make_fetch(b'', status_code=502)) is False
+    assert not json_calls
+    assert job.interval_additional == job.interval.get('min')
+    job.handle_response(make_fetch(make_content([make_row()])))
+    assert job.interval_additional == 0
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+
+import pytest
+
+from py12306.log.base import ContextVar, LogBuffer
+from py12306.log.common_log import CommonLog
+from py12306.log.query_log import QueryLog
+
+
+@pytest.fixture(autouse=True)
+def empty_logs():
+    """
+    清空其它测试在当前线程留下的日志
+    """
+    for log in (QueryLog, CommonLog): log().empty_logs()
+
+
+def test_take_swaps_out_lines():
+    buffer = LogBuffer('test')
+    buffer.append('a')
+    buffer.append('b')
+    lines = buffer.take()
+    buffer.append('c')
+    assert lines == ['a', 'b'] and buffer.take() == ['c'] and buffer.take() == []
+
+
+def test_threads_have_separate_buffers():
+    buffer = LogBuffer('test')
+    buffer.append('main')
+    taken = []
+    ready = threading.Barrier(4)
+
+    def run(name):
+        buffer.append(name)
+        ready.wait()  # 各线程同时持有未输出的日志
+        buffer.append(name)
+        taken.append(buffer.take())
+
+    threads = [threading.Thread(target=run, args=(str(i),)) for i in range(4)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert sorted(taken) == [[str(i), str(i)] for i in range(4)]
+    assert buffer.take() == ['main']
+
+
+@pytest.mark.skipif(not ContextVar, reason='python 3.7 以上每个协程单独缓冲')
+def test_coroutines_have_separate_buffers():
+    buffer = LogBuffer('test')
+
+    async def run(name):
+        buffer.append(name)
+        await asyncio.sleep(0)
+        buffer.append(name)
+        return buffer.take()
+
+    async def main():
+        return await asyncio.gather(*[run(str(i)) for i in range(3)])
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(main()) == [[str(i), str(i)] for i in range(3)]
+    finally:
+        loop.close()
+
+
+def test_log_classes_have_separate_buffers():
+    QueryLog.add_log('query')
+    CommonLog.add_log('common')
+    CommonLog.add_quick_log('quick')
+    assert QueryLog().take_logs() == ['query']
+    assert CommonLog().take_logs() == ['quick']  # 有 quick_log 时只输出 quick_log
+    assert CommonLog().take_logs() == ['common']
+
+
+def test_empty_logs():
+    QueryLog.add_log('a').add_quick_log('b')
+    QueryLog().empty_logs()
+    assert QueryLog().get_logs() == []
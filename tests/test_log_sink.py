@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from py12306.log.sink import LogSink
+
+
+@pytest.fixture
+def sink(config, tmp_path):
+    """
+    独立的 LogSink 实例
+    """
+    path = tmp_path / 'logs' / 'runtime.log'
+    config(OUT_PUT_LOG_TO_FILE_PATH=str(path), OUT_PUT_LOG_TO_FILE_MAX_SIZE=0, OUT_PUT_LOG_TO_FILE_BACKUP_COUNT=2,
+           OUT_PUT_LOG_TO_FILE_FLUSH_SIZE=1024, OUT_PUT_LOG_TO_FILE_FLUSH_INTERVAL=0.05,
+           OUT_PUT_LOG_TO_FILE_QUEUE_SIZE=2)
+    instance = LogSink.__new_original__(LogSink)
+    instance.__init_original__()
+    yield instance
+    instance.close()
+    instance.close_file()
+
+
+def read(path):
+    return path.read_text(encoding='utf-8') if path.exists() else None
+
+
+def test_write_through_thread(sink, tmp_path):
+    sink.write('第一行\n')
+    sink.write('第二行\n', LogSink.PRIORITY_LOW)
+    sink.close()
+    assert read(tmp_path / 'logs' / 'runtime.log') == '第一行\n第二行\n'
+    assert not sink.is_running
+
+
+def test_rotate_by_size(sink, config, tmp_path):
+    config(OUT_PUT_LOG_TO_FILE_MAX_SIZE=10)
+    for content in ('a' * 10 + '\n', 'b' * 10 + '\n', 'c' * 10 + '\n', 'd\n'):
+        sink.write_content(content)
+    sink.flush()
+    path = tmp_path / 'logs' / 'runtime.log'
+    assert read(path) == 'd\n'
+    assert read(path.with_name('runtime.log.1')) == 'c' * 10 + '\n'
+    assert read(path.with_name('runtime.log.2')) == 'b' * 10 + '\n'
+    assert not path.with_name('runtime.log.3').exists()  # 只保留 2 个
+
+
+def test_rotate_without_backup(sink, config, tmp_path):
+    config(OUT_PUT_LOG_TO_FILE_MAX_SIZE=10, OUT_PUT_LOG_TO_FILE_BACKUP_COUNT=0)
+    sink.write_content('a' * 10 + '\n')
+    sink.write_content('b\n')
+    sink.flush()
+    assert read(tmp_path / 'logs' / 'runtime.log') == 'b\n'
+    assert os.listdir(str(tmp_path / 'logs')) == ['runtime.log']
+
+
+def test_reopen_after_file_is_moved(sink, tmp_path):
+    path = tmp_path / 'logs' / 'runtime.log'
+    sink.write_content('old\n')
+    sink.flush()
+    os.replace(str(path), str(path) + '.moved')  # logrotate
+    sink.flush()
+    sink.write_content('new\n')
+    sink.flush()
+    assert read(path) == 'new\n'
+
+
+def test_low_priority_is_dropped_when_queue_is_full(sink, tmp_path):
+    sink.is_running = True  # 不启动写入线程，队列不会被取出
+    for i in range(4): sink.write('查询日志\n', LogSink.PRIORITY_LOW)
+    assert sink.dropped_num == 2
+    sink.queue.queue.clear()
+    sink.write_content('其它日志\n')
+    sink.flush()
+    assert read(tmp_path / 'logs' / 'runtime.log') == LogSink.MESSAGE_DROPPED.format(2) + '其它日志\n'
+    sink.is_running = False
+
+
+def test_unwritable_path_falls_back_to_console(sink, config, tmp_path, capsys):
+    (tmp_path / 'file').write_text('')
+    config(OUT_PUT_LOG_TO_FILE_PATH=str(tmp_path / 'file' / 'runtime.log'))
+    sink.write_content('日志\n')
+    sink.write_content('日志\n')
+    out = capsys.readouterr().out
+    assert out.count('无法写入') == 1 and out.count('日志\n') == 2
@@ -0,0 +1,63 @@
+from py12306.helpers.type import SeatType
+from py12306.query.filter import JobFilter
+from py12306.query.parser import TicketParser
+
+from helpers import make_row
+
+
+def test_parse_columns():
+    batch = TicketParser.parse([
+        make_row('G1', '08:00', {SeatType.dicts['二等座']: '有', SeatType.dicts['一等座']: '5'}),
+        make_row('d2', '23:30', {SeatType.dicts['二等座']: '无'}, can_buy='N'),
+    ])
+    assert batch.size == 2
+    assert batch.train_numbers == ['G1', 'd2']
+    assert batch.train_number_keys == ['G1', 'D2']
+    assert batch.left_minutes == [8 * 60, 23 * 60 + 30]
+    assert batch.can_buys == [True, False]
+    assert batch.seats[SeatType.dicts['二等座']] == [TicketParser.SEAT_NUM_PLENTY, 0]
+    assert batch.seats[SeatType.dicts['一等座']] == [5, 0]
+    assert batch.seats[SeatType.dicts['硬座']] == [0, 0]
+
+
+def test_parse_order_text_must_be_available():
+    batch = TicketParser.parse([make_row(order_text='列车停运')])
+    assert batch.can_buys == [False]
+
+
+def test_short_rows_are_dropped_and_warned_once(monkeypatch, capsys):
+    monkeypatch.setattr(TicketParser, 'is_short_row_warned', False)
+    batch = TicketParser.parse([make_row('G1'), 'a|b|c', ''])
+    assert batch.train_numbers == ['G1']
+    assert '2 / 3' in capsys.readouterr().out
+    TicketParser.parse(['a|b|c'])
+    assert capsys.readouterr().out == ''
+
+
+def test_digests_follow_ticket_fields():
+    seat = SeatType.dicts['二等座']
+    first = TicketParser.parse([make_row(seats={seat: '5'}), make_row('G2', seats={seat: '5'})])
+    second = TicketParser.parse([make_row(seats={seat: '5'}), make_row('G2', seats={seat: '4'})])
+    assert first.get_digests()[0] == second.get_digests()[0]
+    assert first.get_digests()[1] != second.get_digests()[1]
+
+
+def test_decode_seat_num():
+    assert TicketParser.decode_seat_num('有') == TicketParser.SEAT_NUM_PLENTY
+    assert TicketParser.decode_seat_num('12') == 12
+    assert TicketParser.decode_seat_num('无') == 0
+    assert TicketParser.decode_seat_num('*') == 0
+    assert TicketParser.decode_seat_num('--') == 0
+
+
+def test_decode_minute():
+    assert TicketParser.decode_minute('00:00') == 0
+    assert TicketParser.decode_minute('08:05') == 8 * 60 + 5
+    assert TicketParser.decode_minute('24:00') == JobFilter.DAY_MINUTES
+
+
+def test_decode_minute_invalid_uses_default():
+    assert TicketParser.decode_minute('8点') == 0
+    assert TicketParser.decode_minute('', JobFilter.DAY_MINUTES) == JobFilter.DAY_MINUTES
+    assert TicketParser.decode_minute(None, JobFilter.DAY_MINUTES) == JobFilter.DAY_MINUTES
+    assert TicketParser.decode_minute('8点', 100) == 100  # 错误的值不缓存
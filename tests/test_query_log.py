@@ -0,0 +1,92 @@
+import json
+import threading
+
+import pytest
+
+from py12306.cluster.cluster import Cluster
+from py12306.log.query_log import QueryLog
+
+
+@pytest.fixture
+def query_log(config, monkeypatch, tmp_path):
+    """
+    独立的 QueryLog 实例，查询记录保存到临时目录
+    """
+    config(QUERY_DATA_SAVE_INTERVAL=60)
+    instance = QueryLog.__new_original__(QueryLog)
+    instance.__init_original__()
+    instance.data = {'query_count': 0, 'last_time': ''}
+    instance.data_path = str(tmp_path / 'status.json')
+    monkeypatch.setattr(QueryLog, '__it__', instance, raising=False)
+    return instance
+
+
+def read_count(query_log):
+    with open(query_log.data_path) as f:
+        return json.load(f)['query_count']
+
+
+def test_counts_are_saved_in_batches(query_log):
+    query_log.refresh_data()  # 第一次查询立即保存
+    assert read_count(query_log) == 1
+    for i in range(4): query_log.refresh_data()
+    assert read_count(query_log) == 1 and query_log.unsaved_count == 4
+    QueryLog.save_data()
+    assert read_count(query_log) == 5 and query_log.unsaved_count == 0
+
+
+def test_save_interval(query_log, config):
+    config(QUERY_DATA_SAVE_INTERVAL=0)  # 每次查询都保存
+    for i in range(3): query_log.refresh_data()
+    assert read_count(query_log) == 3
+
+
+def test_failed_save_keeps_count(query_log, tmp_path):
+    for i in range(3): query_log.refresh_data()
+    path, query_log.data_path = query_log.data_path, str(tmp_path / 'missing' / 'status.json')
+    with pytest.raises(OSError):
+        QueryLog.save_data()
+    assert query_log.unsaved_count == 2
+    query_log.refresh_data()
+    query_log.data_path = path
+    QueryLog.save_data()
+    assert read_count(query_log) == 4 and query_log.unsaved_count == 0
+
+
+def test_save_without_wait_skips_when_saving(query_log):
+    query_log.saved_at = float('inf')
+    query_log.refresh_data()
+    saving, done = threading.Event(), threading.Event()
+
+    def hold():
+        with query_log.save_lock:
+            saving.set()
+            done.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    saving.wait()
+    QueryLog.save_data(wait=False)  # 其它线程正在保存，交给下次保存
+    assert query_log.unsaved_count == 1
+    done.set()
+    thread.join()
+
+
+def test_count_is_restored(query_log, monkeypatch):
+    with open(query_log.data_path, 'w') as f:
+        json.dump({'query_count': 42, 'last_time': '2026-10-18 08:00:00'}, f)
+    monkeypatch.setattr(QueryLog, 'print_data_restored', lambda self: None)
+    QueryLog.init_data()
+    assert query_log.data['query_count'] == 42
+
+
+def test_cluster_counts_are_added(query_log, monkeypatch):
+    fakeredis = pytest.importorskip('fakeredis')
+    from py12306.config import Config
+    monkeypatch.setattr(Config, 'is_cluster_enabled', staticmethod(lambda: True))
+    query_log.cluster = type('FakeCluster', (), {'session': fakeredis.FakeRedis(decode_responses=True)})()
+    query_log.cluster.session.set(Cluster.KEY_QUERY_COUNT, 10)  # 其它节点的次数
+    for i in range(3): query_log.refresh_data()
+    QueryLog.save_data()
+    assert query_log.data['query_count'] == 13
+    assert query_log.cluster.session.get(Cluster.KEY_QUERY_COUNT) == '13'
@@ -0,0 +1,61 @@
+import io
+
+import requests
+from urllib3 import HTTPResponse
+
+from py12306.app import Dict
+from py12306.helpers.request import Request, Response, ResponseAdapter
+
+
+def test_get_by_path():
+    data = Dict({'data': {'result': ['a'], 'flag': '1'}, 'status': True})
+    assert data.get('data.result') == ['a']
+    assert data.get('status') is True
+    assert data.get('data/flag', sep='/') == '1'
+
+
+def test_missing_path_returns_default():
+    data = Dict({'data': {'result': []}})
+    assert data.get('data.map') is None
+    assert data.get('data.map', {}) == {} and isinstance(data.get('data.map', {'a': 1}), Dict)
+    assert data.get('messages.0', []) == []
+
+
+def test_non_dict_value_on_path_is_returned():
+    assert Dict({'data': ''}).get('data.result') == ''
+
+
+def test_path_is_parsed_once():
+    Dict({}).get('a.b.c')
+    Dict({}).get('a/b', sep='/')
+    assert Dict.paths['a.b.c'] == ('a', 'b', 'c')
+    assert Dict.paths[('a/b', '/')] == ('a', 'b')
+
+
+def test_nested_dict_is_converted_once():
+    data = Dict({'data': {'map': {'VNP': '北京南'}}})
+    first = data['data']
+    assert isinstance(first, Dict) and data['data'] is first
+    assert data.get('data.map') is data.get('data.map')
+
+
+def make_raw_response(body, status=200):
+    return HTTPResponse(body=io.BytesIO(body), status=status, headers={}, preload_content=False)
+
+
+def test_adapter_builds_response():
+    request = requests.Request('GET', 'https://kyfw.12306.cn/otn/leftTicket/query').prepare()
+    response = ResponseAdapter().build_response(request, make_raw_response(b'{"data": {"result": ["a"]}}'))
+    assert type(response) is Response
+    assert response.json().get('data.result') == ['a']
+
+
+def test_session_mounts_adapter():
+    assert isinstance(Request().get_adapter('https://kyfw.12306.cn'), ResponseAdapter)
+
+
+def test_invalid_json_returns_default():
+    response = Response()
+    response._content = b'<html>'
+    assert response.json() == {} and isinstance(response.json(), Dict)
+    assert response.json(default={'a': 1}).get('a') == 1
@@ -0,0 +1,169 @@
+import datetime
+import threading
+import time
+
+import pytest
+
+from py12306.query.scheduler import QueryScheduler, TokenBucket
+
+
+def test_token_bucket_starts_full_and_refills():
+    bucket = TokenBucket(2)
+    now = bucket.updated_at
+    assert bucket.capacity == 2
+    for i in range(2):
+        assert bucket.wait_time(now) == 0
+        bucket.consume()
+    assert bucket.wait_time(now) == pytest.approx(0.5)
+    assert bucket.wait_time(now + 0.25) == pytest.approx(0.25)
+    assert bucket.wait_time(now + 0.5) == 0
+
+
+def test_token_bucket_does_not_exceed_capacity():
+    bucket = TokenBucket(10, capacity=3)
+    bucket.refill(bucket.updated_at + 100)
+    assert bucket.tokens == 3
+
+
+def test_token_bucket_low_rate_keeps_one_token():
+    bucket = TokenBucket(0.5)
+    assert bucket.capacity == 1
+    bucket.consume()
+    assert bucket.wait_time(bucket.updated_at) == pytest.approx(2)
+
+
+@pytest.fixture
+def scheduler(config):
+    def create(max_qps=0, endpoint_max_qps=None, cdn_max_qps=0):
+        config(QUERY_MAX_QPS=max_qps, QUERY_ENDPOINT_MAX_QPS=endpoint_max_qps or {}, QUERY_CDN_MAX_QPS=cdn_max_qps)
+        return QueryScheduler()
+
+    return create
+
+
+def test_disabled_scheduler_never_blocks(scheduler):
+    query_scheduler = scheduler()
+    assert not query_scheduler.is_enabled()
+    start_at = time.monotonic()
+    for i in range(100):
+        assert query_scheduler.acquire()
+    assert time.monotonic() - start_at < 0.1
+
+
+def test_acquire_respects_global_rate(scheduler):
+    query_scheduler = scheduler(max_qps=20)
+    start_at = time.monotonic()
+    for i in range(25):  # 20 个初始令牌，之后每 0.05 秒一个
+        query_scheduler.acquire()
+    assert 0.2 <= time.monotonic() - start_at < 1
+
+
+def test_endpoint_bucket(scheduler):
+    query_scheduler = scheduler(endpoint_max_qps={QueryScheduler.ENDPOINT_LEFT_TICKET: 1})
+    assert query_scheduler.is_enabled()
+    assert query_scheduler.try_acquire()
+    assert not query_scheduler.try_acquire()
+    assert query_scheduler.try_acquire(endpoint='other')
+
+
+def test_acquire_by_priority(scheduler):
+    query_scheduler = scheduler(max_qps=5)
+    for i in range(5):
+        query_scheduler.acquire()
+    order = []
+
+    def acquire(name, priority):
+        query_scheduler.acquire(priority)
+        order.append(name)
+
+    threads = [threading.Thread(target=acquire, args=('low', 0))]
+    threads[0].start()
+    while len(query_scheduler.waiters) < 1: time.sleep(0.001)
+    threads.append(threading.Thread(target=acquire, args=('high', 10)))
+    threads[1].start()
+    while len(query_scheduler.waiters) < 2: time.sleep(0.001)
+    for thread in threads: thread.join(2)
+    assert order == ['high', 'low']
+
+
+def test_try_acquire_does_not_jump_the_queue(scheduler):
+    query_scheduler = scheduler(max_qps=100)
+    query_scheduler.waiters.append([0, 0])
+    assert not query_scheduler.try_acquire()
+
+
+def test_try_acquire_takes_cdn_token(scheduler):
+    query_scheduler = scheduler(max_qps=100, cdn_max_qps=1)
+    assert query_scheduler.try_acquire(cdn='a')
+    assert not query_scheduler.try_acquire(cdn='a')
+    assert query_scheduler.try_acquire(cdn='b')
+    assert not query_scheduler.try_acquire_cdn('a')
+
+
+def test_try_acquire_cdn_without_limit(scheduler):
+    query_scheduler = scheduler()
+    assert all(query_scheduler.try_acquire_cdn('a') for i in range(10))
+    assert query_scheduler.try_acquire_cdn(None)
+
+
+def test_pick_cdn_skips_exhausted(scheduler):
+    query_scheduler = scheduler(cdn_max_qps=1)
+    assert query_scheduler.try_acquire_cdn('a')
+    candidates = iter(['a', 'b'])
+    assert query_scheduler.pick_cdn(lambda: next(candidates)) == 'b'
+
+
+def test_pick_cdn_waits_when_all_exhausted(scheduler):
+    query_scheduler = scheduler(cdn_max_qps=10)
+    for i in range(10):
+        query_scheduler.try_acquire_cdn('a')
+    start_at = time.monotonic()
+    assert query_scheduler.pick_cdn(lambda: 'a') == 'a'
+    assert time.monotonic() - start_at >= 0.05
+    assert not query_scheduler.try_acquire_cdn('a')  # 等待到的令牌已被使用
+
+
+@pytest.fixture
+def sale_stage(config, monkeypatch):
+    """
+    出发站 08:00 起售，预售期 15 天
+    """
+    from py12306.helpers.station import StationSaleTime
+    from py12306.query import scheduler as scheduler_module
+    config(QUERY_SALE_BURST_ENABLED=1, QUERY_SALE_PRESALE_DAYS=15, QUERY_SALE_BURST_WINDOW={'before': 10, 'after': 300})
+    monkeypatch.setattr(StationSaleTime, 'get_sale_minute_by_key',
+                        classmethod(lambda cls, key, default=None: 8 * 60 if key == 'BJP' else default))
+
+    def get(now, dates, station_code='BJP'):
+        monkeypatch.setattr(scheduler_module, 'time_now', lambda: datetime.datetime.strptime(now, '%Y-%m-%d %H:%M:%S'))
+        return QueryScheduler().get_sale_stage(station_code, dates)
+
+    return get
+
+
+def test_sale_stage_burst_within_window(sale_stage):
+    assert sale_stage('2026-10-07 07:59:55', ['2026-10-21']) == QueryScheduler.SALE_STAGE_BURST
+    assert sale_stage('2026-10-07 08:05:00', ['2026-10-21']) == QueryScheduler.SALE_STAGE_BURST
+
+
+def test_sale_stage_idle_before_sale(sale_stage):
+    assert sale_stage('2026-10-07 07:59:00', ['2026-10-21']) == QueryScheduler.SALE_STAGE_IDLE
+    assert sale_stage('2026-10-06 12:00:00', ['2026-10-21']) == QueryScheduler.SALE_STAGE_IDLE
+
+
+def test_sale_stage_normal_after_window(sale_stage):
+    assert sale_stage('2026-10-07 08:05:01', ['2026-10-21']) == QueryScheduler.SALE_STAGE_NORMAL
+
+
+def test_sale_stage_of_multiple_dates(sale_stage):
+    now = '2026-10-07 08:01:00'
+    assert sale_stage(now, ['2026-10-20', '2026-10-21', '2026-10-22']) == QueryScheduler.SALE_STAGE_BURST
+    assert sale_stage(now, ['2026-10-20', '2026-10-22']) == QueryScheduler.SALE_STAGE_NORMAL  # 已起售的日期可以正常查询
+    assert sale_stage(now, ['2026-10-22', '2026-10-23']) == QueryScheduler.SALE_STAGE_IDLE
+
+
+def test_sale_stage_normal_without_sale_time(sale_stage, config):
+    assert sale_stage('2026-10-07 08:00:00', ['2026-10-21'], station_code='XXX') == QueryScheduler.SALE_STAGE_NORMAL
+    assert sale_stage('2026-10-07 08:00:00', ['bad-date']) == QueryScheduler.SALE_STAGE_NORMAL
+    config(QUERY_SALE_BURST_ENABLED=0)
+    assert sale_stage('2026-10-07 08:00:00', ['2026-10-21']) == QueryScheduler.SALE_STAGE_NORMAL
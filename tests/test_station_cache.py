@@ -0,0 +1,90 @@
+import json
+import os
+
+import pytest
+
+from py12306.helpers.station_cache import StationCache
+
+STATIONS = '@bjb|北京北|VAP|beijingbei|bjb|0@bji|北京|BJP|beijing|bj|1@sha|上海|SHH|shanghai|sh|2'
+SALES = [
+    {'station_telecode': 'BJP', 'sale_time': '0800', 'start_date': '20260101', 'stop_date': '20260630'},
+    {'station_telecode': 'BJP', 'sale_time': '0930', 'start_date': '20260701', 'stop_date': ''},
+    {'station_telecode': 'SHH', 'sale_time': '1330', 'start_date': '', 'stop_date': ''},
+    {'station_telecode': 'XX', 'sale_time': '1000'},  # 无效记录
+]
+
+
+@pytest.fixture
+def files(tmp_path, config):
+    station_file, sale_file, cache_file = tmp_path / 'stations.txt', tmp_path / 'sales.txt', tmp_path / 'station.cache'
+    station_file.write_text(STATIONS, encoding='utf-8')
+    sale_file.write_text(json.dumps(SALES), encoding='utf-8')
+    config(STATION_FILE=str(station_file), STATION_SALE_TIME_FILE=str(sale_file), STATION_CACHE_FILE=str(cache_file))
+    return station_file, sale_file, cache_file
+
+
+def test_build_and_open(files):
+    _, _, cache_file = files
+    data = StationCache.build()
+    assert cache_file.read_bytes() == data
+    cache = StationCache.open(str(cache_file))
+    assert cache is not None
+    assert [row[1] for row in cache.station_rows] == ['北京北', '北京', '上海']
+    assert cache.station_rows[1] == ['bji', '北京', 'BJP', 'beijing', 'bj', '1']
+    assert cache.sale_num == 3
+
+
+def test_sale_minute_lookup(files):
+    cache = StationCache(StationCache.build())
+    assert cache.get_sale_minute('BJP', 20260315) == 8 * 60
+    assert cache.get_sale_minute('BJP', 20261001) == 9 * 60 + 30
+    assert cache.get_sale_minute('SHH', 20300101) == 13 * 60 + 30
+    assert cache.get_sale_minute('VAP', 20260315) is None
+    assert cache.get_sale_minute('XX', 20260315) is None
+
+
+def test_open_rejects_changed_source(files):
+    station_file, _, cache_file = files
+    StationCache.build()
+    station_file.write_text(STATIONS + '@tjn|天津|TJP|tianjin|tj|3', encoding='utf-8')
+    assert StationCache.open(str(cache_file)) is None
+    assert [row[1] for row in StationCache.load().station_rows][-1] == '天津'
+    assert StationCache.open(str(cache_file)) is not None  # 已重建
+
+
+def test_open_rejects_other_version(files, monkeypatch):
+    _, _, cache_file = files
+    StationCache.build()
+    monkeypatch.setattr(StationCache, 'VERSION', StationCache.VERSION + 1)
+    assert StationCache.open(str(cache_file)) is None
+
+
+def test_open_rejects_bad_magic(files):
+    _, _, cache_file = files
+    data = bytearray(StationCache.build())
+    data[:8] = b'NOTCACHE'
+    cache_file.write_bytes(bytes(data))
+    assert StationCache.open(str(cache_file)) is None
+
+
+def test_open_rejects_truncated_header(files):
+    _, _, cache_file = files
+    cache_file.write_bytes(StationCache.build()[:StationCache.HEADER.size - 1])
+    assert StationCache.open(str(cache_file)) is None
+
+
+def test_open_missing_or_empty(files):
+    _, _, cache_file = files
+    assert StationCache.open(str(cache_file)) is None
+    cache_file.write_bytes(b'')
+    assert StationCache.open(str(cache_file)) is None
+
+
+def test_build_without_sources(files):
+    station_file, sale_file, _ = files
+    os.remove(str(station_file))
+    os.remove(str(sale_file))
+    cache = StationCache(StationCache.build())
+    assert cache.station_rows == []
+    assert cache.sale_num == 0
+    assert cache.get_sale_minute('BJP', 20260315) is None